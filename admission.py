@@ -0,0 +1,226 @@
+import math
+import threading
+import time
+from collections import deque
+
+# Priority lanes, highest priority first
+LANE_INTERACTIVE = 'interactive'
+LANE_BULK = 'bulk'
+LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, int(math.ceil(self.retry_after))))
+
+
+class Ticket:
+    """A reserved place in a lane; waits for and then holds a model slot.
+
+    A reserved ticket counts towards the lane and session caps but only
+    joins its lane's queue when ``wait()`` is called, i.e. once its work is
+    ready for the model.
+    """
+
+    def __init__(self, controller, session_id, lane):
+        self.controller = controller
+        self.session_id = session_id
+        self.lane = lane
+        self.state = 'reserved'  # reserved -> waiting -> running -> released
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+
+    def wait(self, timeout=None, cancel_event=None):
+        """Block until this ticket owns a model slot"""
+        self.controller._wait_for_slot(self, timeout, cancel_event)
+        return self
+
+    def release(self):
+        """Give the slot (or the queue position) back; safe to call twice"""
+        self.controller._release(self)
+
+    def __enter__(self):
+        if self.state in ('reserved', 'waiting'):
+            self.wait()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class AdmissionController:
+    """Bounded, prioritized admission in front of the model.
+
+    ``slots`` requests may use the model at once. Everything else waits in a
+    per-lane FIFO; when a slot frees up the head of the highest priority
+    non-empty lane gets it, so interactive chat always goes ahead of bulk log
+    analysis. Lanes and sessions have caps, and requests beyond them are
+    rejected up front with an estimated wait instead of queueing forever.
+    Reserved tickets whose work is not ready for the model yet (e.g. a job
+    still scanning its file) count towards the caps, but hold no place in
+    the FIFO and do not make the model look busy to ``idle()``.
+    """
+
+    def __init__(self, slots=1, max_queue=None, session_limits=None, initial_service_time=20.0):
+        self.slots = slots
+        self.max_queue = max_queue or {LANE_INTERACTIVE: 16, LANE_BULK: 64}
+        self.session_limits = session_limits or {LANE_INTERACTIVE: 2, LANE_BULK: 4}
+        self._cond = threading.Condition()
+        self._queues = {lane: deque() for lane in LANES}
+        self._reserved = {lane: 0 for lane in LANES}  # Reserved tickets not yet waiting
+        self._running = 0
+        self._per_session = {}
+        # Exponentially weighted average of how long a request holds a slot
+        self._service_time = {lane: initial_service_time for lane in LANES}
+        self.rejected = {lane: 0 for lane in LANES}
+        self.admitted = {lane: 0 for lane in LANES}
+
+    def reserve(self, session_id, lane):
+        """Take a place in ``lane`` or raise AdmissionRejected"""
+        if lane not in self._queues:
+            raise ValueError(f'Unknown lane: {lane}')
+        with self._cond:
+            key = (session_id, lane)
+            if self._per_session.get(key, 0) >= self.session_limits.get(lane, 1):
+                self.rejected[lane] += 1
+                raise AdmissionRejected(
+                    f'Too many concurrent {lane} requests for this session',
+                    self._service_time[lane])
+            if self._queued(lane) >= self.max_queue.get(lane, 0):
+                self.rejected[lane] += 1
+                raise AdmissionRejected(
+                    f'Server is busy ({lane} queue is full)',
+                    self._estimate_wait(lane))
+            ticket = Ticket(self, session_id, lane)
+            self._reserved[lane] += 1
+            self._per_session[key] = self._per_session.get(key, 0) + 1
+            self.admitted[lane] += 1
+            return ticket
+
+    def admit(self, session_id, lane, timeout=None):
+        """Reserve and wait for a slot; use as ``with controller.admit(...):``"""
+        return self.reserve(session_id, lane).wait(timeout)
+
+    def estimated_wait(self, lane):
+        with self._cond:
+            return self._estimate_wait(lane)
+
+    def queue_depth(self, lane=None):
+        with self._cond:
+            if lane is not None:
+                return self._queued(lane)
+            return sum(self._queued(lane) for lane in LANES)
+
+    def idle(self):
+        """True if no request is using or waiting for the model"""
+        with self._cond:
+            return self._running == 0 and not any(self._queues.values())
+
+    def stats(self):
+        with self._cond:
+            return {
+                'slots': self.slots,
+                'running': self._running,
+                'lanes': {
+                    lane: {
+                        'queued': self._queued(lane),
+                        'max_queue': self.max_queue.get(lane, 0),
+                        'estimated_wait': round(self._estimate_wait(lane), 1),
+                        'avg_service_time': round(self._service_time[lane], 2),
+                        'admitted': self.admitted[lane],
+                        'rejected': self.rejected[lane],
+                    }
+                    for lane in LANES
+                }
+            }
+
+    def _estimate_wait(self, lane):
+        """Expected seconds before a new request in ``lane`` gets a slot (caller holds the lock)"""
+        ahead = self._running
+        seconds = self._running * self._service_time[lane]
+        for other in LANES:
+            queued = self._queued(other)
+            ahead += queued
+            seconds += queued * self._service_time[other]
+            if other == lane:
+                break
+        if ahead < self.slots:
+            return 0.0
+        return seconds / self.slots
+
+    def _queued(self, lane):
+        """Tickets reserved or waiting in ``lane`` (caller holds the lock)"""
+        return len(self._queues[lane]) + self._reserved[lane]
+
+    def _next_ticket(self):
+        """The ticket that should get the next free slot (caller holds the lock)"""
+        for lane in LANES:
+            if self._queues[lane]:
+                return self._queues[lane][0]
+        return None
+
+    def _wait_for_slot(self, ticket, timeout, cancel_event):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if ticket.state == 'reserved':
+                # Ready for the model: join the lane's queue from here
+                self._reserved[ticket.lane] -= 1
+                self._queues[ticket.lane].append(ticket)
+                ticket.state = 'waiting'
+            while not (self._running < self.slots and self._next_ticket() is ticket):
+                if ticket.state != 'waiting':
+                    raise AdmissionRejected('Request was released before it started', 0)
+                if cancel_event is not None and cancel_event.is_set():
+                    self._drop(ticket)
+                    raise AdmissionRejected('Request was cancelled while queued', 0)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._drop(ticket)
+                    raise AdmissionRejected('Timed out waiting for the model', self._estimate_wait(ticket.lane))
+                # Wake periodically so cancellation is noticed
+                self._cond.wait(0.5 if remaining is None else min(0.5, remaining))
+            self._queues[ticket.lane].popleft()
+            self._running += 1
+            ticket.state = 'running'
+            ticket.started_at = time.monotonic()
+
+    def _release(self, ticket):
+        with self._cond:
+            if ticket.state == 'running':
+                self._running -= 1
+                elapsed = time.monotonic() - ticket.started_at
+                self._service_time[ticket.lane] = 0.8 * self._service_time[ticket.lane] + 0.2 * elapsed
+                self._forget(ticket)
+            elif ticket.state == 'waiting':
+                self._drop(ticket)
+            elif ticket.state == 'reserved':
+                self._reserved[ticket.lane] -= 1
+                self._forget(ticket)
+            ticket.state = 'released'
+            self._cond.notify_all()
+
+    def _drop(self, ticket):
+        """Remove a waiting ticket from its lane (caller holds the lock)"""
+        try:
+            self._queues[ticket.lane].remove(ticket)
+        except ValueError:
+            pass
+        self._forget(ticket)
+        ticket.state = 'released'
+        self._cond.notify_all()
+
+    def _forget(self, ticket):
+        key = (ticket.session_id, ticket.lane)
+        count = self._per_session.get(key, 0) - 1
+        if count > 0:
+            self._per_session[key] = count
+        else:
+            self._per_session.pop(key, None)
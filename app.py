@@ -1,35 +1,75 @@
-
 import os
-import sys
 import torch
 from flask import Flask, render_template, request, jsonify, session
 from flask_cors import CORS
-from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig, StoppingCriteria, StoppingCriteriaList
-import warnings
-import logging
 import secrets
 from datetime import datetime
 import json
-import re
-from werkzeug.utils import secure_filename
 import hashlib
-
-# Suppress warnings
-warnings.filterwarnings("ignore")
-logging.getLogger("transformers").setLevel(logging.ERROR)
-
-# Suppress torch distributed warnings on Windows/MacOS
-os.environ["TORCH_DISTRIBUTED_DEBUG"] = "OFF"
-if sys.platform in ["win32", "darwin"]:
-    os.environ["RANK"] = "-1"
-    os.environ["WORLD_SIZE"] = "1"
-    os.environ["MASTER_ADDR"] = "127.0.0.1"
-    os.environ["MASTER_PORT"] = "29500"
+from werkzeug.utils import secure_filename
+import time
+import threading
+from flask import Response, g
+import metrics
+import tracing
+from engine import Phi3Chatbot
+from jobs import JobQueue, JobQueueFull
+from dump_analyzer import analyze_dump, detect_dump_format
+from log_analyzer import DETECTION_RULES, LogAnalyzer
+from timeline import correlate
+from chunked_upload import ChunkedUploadManager, UploadError
+from session_store import SessionStore
+from upload_registry import BlobStore, UploadRegistry
+from upload_retention import QuotaExceeded, RetentionManager
+from bts_client import BTSClient, BTSError
+from bug_index import FACETS, MAX_LIMIT
+from bug_similarity import BugSimilarityIndex, findings_to_text
+from admission import AdmissionController, AdmissionRejected, LANE_INTERACTIVE, LANE_BULK
+from memory_governor import MemoryGovernor, detect_memory_limit
+from io_pool import CancellableReader, IOBusy, IOPool, IOTimeout
+from explanation_cache import ExplanationCache
+from conversation_summary import ConversationSummarizer
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['MAX_UPLOAD_BYTES'] = 20 * 1024 ** 3  # Largest file accepted through chunked uploads
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024  # Default chunk size; must stay under MAX_CONTENT_LENGTH
+app.config['UPLOAD_QUOTA_TOTAL_BYTES'] = 50 * 1024 ** 3  # Disk space for all uploads (after deduplication)
+app.config['UPLOAD_QUOTA_SESSION_BYTES'] = 20 * 1024 ** 3  # Upload space per session
+app.config['UPLOAD_MAX_AGE'] = 24 * 3600  # Seconds an unused file of an inactive session is kept
+app.config['UPLOAD_SWEEP_INTERVAL'] = 60  # Seconds between retention sweeps
+app.config['JOB_WORKERS'] = 2  # Concurrent background analysis jobs
+app.config['JOB_MAX_PENDING'] = 32  # Queued jobs beyond the running ones
+app.config['MODEL_SLOTS'] = 1  # Requests allowed to use the model at once
+app.config['ADMISSION_MAX_QUEUE'] = {LANE_INTERACTIVE: 16, LANE_BULK: 64}
+app.config['ADMISSION_SESSION_LIMITS'] = {LANE_INTERACTIVE: 2, LANE_BULK: 4}
+app.config['CHAT_MAX_WAIT'] = 120  # Seconds a chat request may wait for the model
+app.config['PROFILE_FOLDER'] = 'profiles'
+app.config['CORRELATE_MAX_FILES'] = 8  # Files one correlated analysis may merge
+app.config['CORRELATE_BEFORE'] = 60  # Seconds of context kept before the first failure
+app.config['CORRELATE_AFTER'] = 300  # Seconds followed after the first failure
+app.config['CORRELATE_WINDOW_LINES'] = 400  # Merged lines kept around the first failure
+app.config['PREFIX_CACHE_FOLDER'] = 'prefix_cache'  # Prefilled KV state of the shared prompt prefix
+app.config['EXPLANATION_CACHE_ENTRIES'] = 2000  # Explanations of distinct failures kept for reuse
+app.config['EXPLANATION_CACHE_BYTES'] = 16 * 1024 * 1024  # Memory cap across cached explanations
+app.config['EXPLANATION_CACHE_PATH'] = os.environ.get('EXPLANATION_CACHE_PATH')  # JSON file to persist them
+app.config['BTS_API_URL'] = os.environ.get('BTS_API_URL', 'http://localhost:3001/api')
+app.config['BTS_CACHE_TTL'] = 30  # Seconds the cached bug list is served before revalidating
+# Blocking I/O runs on its own lanes, apart from the model and job workers
+app.config['IO_WORKERS'] = {'fs': 4, 'bts': 8}  # Threads per lane
+app.config['IO_MAX_PENDING'] = {'fs': 8, 'bts': 32}  # Operations queued per lane before new ones are refused
+app.config['IO_TIMEOUT'] = {'fs': 120, 'bts': 15}  # Seconds a request waits for one operation
+app.config['SESSION_MAX_COUNT'] = 1000  # Conversation histories kept in memory
+app.config['SESSION_IDLE_TTL'] = 6 * 3600  # Seconds before an idle conversation is dropped
+app.config['SESSION_MAX_BYTES'] = 64 * 1024 * 1024  # Memory cap across all conversations
+app.config['SESSION_DB_PATH'] = os.environ.get('SESSION_DB_PATH')  # SQLite file to persist conversations
+app.config['SUMMARY_TRIGGER_TOKENS'] = 1536  # Recent-turn tokens above which older turns are summarized
+app.config['SUMMARY_INTERVAL'] = 2  # Seconds between checks for an idle model to summarize on
+app.config['ADMIN_TOKEN'] = None  # If unset, admin endpoints only accept local requests
+app.config['MEMORY_LIMIT_BYTES'] = int(os.environ.get('MEMORY_LIMIT_BYTES', 0)) or None  # Default: cgroup limit or RAM
+app.config['MEMORY_POLL_INTERVAL'] = 5  # Seconds between memory governor checks
 CORS(app)
 
 # Create uploads folder if it doesn't exist
@@ -41,399 +81,211 @@ ALLOWED_EXTENSIONS = {'txt', 'log', 'dmp', 'dump', 'err', 'out', 'crash', 'trace
 # Global variable to store the chatbot instance
 chatbot = None
 
+def create_upload_services(folder):
+    """Build the upload registry, chunked upload manager and retention manager for ``folder``"""
+    registry = UploadRegistry(BlobStore(folder))
+    retention = RetentionManager(
+        registry,
+        max_total_bytes=app.config['UPLOAD_QUOTA_TOTAL_BYTES'],
+        max_session_bytes=app.config['UPLOAD_QUOTA_SESSION_BYTES'],
+        max_age=app.config['UPLOAD_MAX_AGE'],
+        sweep_interval=app.config['UPLOAD_SWEEP_INTERVAL'],
+        # Conversations still held in memory count as active sessions
+        active_owners=lambda: set(chatbot.conversations) if chatbot else set()
+    )
+    # Resumable uploads for files larger than a single request allows
+    chunked = ChunkedUploadManager(
+        registry.blob_store,
+        registry,
+        max_bytes=app.config['MAX_UPLOAD_BYTES'],
+        chunk_size=app.config['UPLOAD_CHUNK_SIZE'],
+        max_chunk_size=app.config['UPLOAD_CHUNK_SIZE'],
+        reserve_space=retention.reserve
+    )
+    retention.chunked_uploads = chunked
+    return registry, chunked, retention
+
+# Server-side registry of uploaded files, backed by a content-addressed blob store,
+# with quotas and a background sweeper keeping disk usage bounded
+upload_registry, chunked_uploads, retention = create_upload_services(app.config['UPLOAD_FOLDER'])
+
+# Similar-bug search over the BTS bug list
+similar_bugs_index = BugSimilarityIndex()
+
+def create_bts_client(base_url):
+    client = BTSClient(base_url, ttl=app.config['BTS_CACHE_TTL'])
+    # Keep the similarity index in step with every change to the bug list
+    client.listeners.append(lambda index: similar_bugs_index.sync(index.bugs))
+    return client
+
+# Keep-alive, caching client for the BTS backend
+bts_client = create_bts_client(app.config['BTS_API_URL'])
+
+# Thread lanes for server-side file reads and BTS calls, with per-operation timeouts
+io_pool = IOPool()
+for lane in ('fs', 'bts'):
+    io_pool.add_lane(lane, max_workers=app.config['IO_WORKERS'][lane],
+                     max_pending=app.config['IO_MAX_PENDING'][lane], timeout=app.config['IO_TIMEOUT'][lane])
+
+# Model explanations reused for every log that fails the same way
+explanation_cache = ExplanationCache(
+    max_entries=app.config['EXPLANATION_CACHE_ENTRIES'],
+    max_bytes=app.config['EXPLANATION_CACHE_BYTES'],
+    path=app.config['EXPLANATION_CACHE_PATH']
+)
+
+# Background queue for long-running analysis jobs
+job_queue = JobQueue(max_workers=app.config['JOB_WORKERS'], max_pending=app.config['JOB_MAX_PENDING'])
+
+# Admission control in front of the model: interactive chat goes ahead of bulk analysis
+admission = AdmissionController(
+    slots=app.config['MODEL_SLOTS'],
+    max_queue=app.config['ADMISSION_MAX_QUEUE'],
+    session_limits=app.config['ADMISSION_SESSION_LIMITS']
+)
+
+# Tracks what each subsystem holds and sheds load in steps as memory runs short
+memory_governor = MemoryGovernor(
+    app.config['MEMORY_LIMIT_BYTES'] or detect_memory_limit(),
+    cuda_limit_bytes=torch.cuda.get_device_properties(0).total_memory if torch.cuda.is_available() else None,
+    interval=app.config['MEMORY_POLL_INTERVAL'],
+    cuda_usage=lambda: torch.cuda.memory_reserved() if torch.cuda.is_available() else None
+)
+memory_governor.register(
+    'model',
+    usage=lambda: sum(p.numel() * p.element_size() for p in chatbot.model.parameters()) if chatbot else 0
+)
+# The prefix state is loaded again once pressure is gone (see Phi3Chatbot.generate_response)
+memory_governor.register(
+    'prefix_cache',
+    usage=lambda: chatbot.prefix_cache.memory_bytes() if getattr(chatbot, 'prefix_cache', None) else 0,
+    release=lambda keep: chatbot.prefix_cache.clear() if getattr(chatbot, 'prefix_cache', None) else None
+)
+# Conversations are user data, never dropped for memory: SessionStore bounds them itself.
+# Under pressure, only snapshots queued for the write-behind store are written out.
+memory_governor.register(
+    'sessions',
+    usage=lambda: chatbot.conversations.total_bytes if chatbot else 0,
+    release=lambda keep: chatbot.conversations.flush() if chatbot else None
+)
+memory_governor.register(
+    'explanation_cache',
+    usage=lambda: explanation_cache.total_bytes,
+    budget=app.config['EXPLANATION_CACHE_BYTES'],
+    release=lambda keep: explanation_cache.shrink(int(explanation_cache.total_bytes * keep))
+)
+memory_governor.register('bts_cache', release=lambda keep: bts_client.clear())
+memory_governor.register(
+    'cuda_cache',
+    usage=lambda: torch.cuda.memory_reserved() - torch.cuda.memory_allocated() if torch.cuda.is_available() else 0,
+    release=lambda keep: torch.cuda.empty_cache() if torch.cuda.is_available() else None
+)
+
+def compact_conversation(session_id):
+    """Fold the older turns of a long conversation into its summary, holding a bulk-lane model slot"""
+    if chatbot is None:
+        return False
+    try:
+        ticket = admission.reserve(session_id, LANE_BULK)
+    except AdmissionRejected:
+        return False
+    with ticket:
+        return chatbot.compact_session(session_id)
+
+# Summarizes long conversations whenever nothing else needs the model
+conversation_summarizer = ConversationSummarizer(
+    compact_conversation, admission.idle, interval=app.config['SUMMARY_INTERVAL'])
+
+# Gauges computed when /metrics is scraped
+metrics.QUEUE_DEPTH.set_function(lambda: {
+    'model_interactive': admission.queue_depth(LANE_INTERACTIVE),
+    'model_bulk': admission.queue_depth(LANE_BULK),
+    'jobs': job_queue.pending_count(),
+    'summaries': conversation_summarizer.pending_count(),
+})
+metrics.ACTIVE_SESSIONS.set_function(lambda: len(chatbot.conversations) if chatbot else None)
+metrics.UPLOAD_STORAGE_BYTES.set_function(lambda: {
+    'stored': upload_registry.stored_bytes,
+    'logical': upload_registry.stats()['logical_bytes'],
+    'reserved': chunked_uploads.reserved_bytes(),
+})
+metrics.UPLOAD_FILES.set_function(lambda: upload_registry.stats()['files'])
+metrics.MEMORY_PRESSURE_LEVEL.set_function(lambda: memory_governor.level)
+metrics.IO_IN_FLIGHT.set_function(io_pool.in_flight)
+metrics.EXPLANATION_CACHE_HIT_RATIO.set_function(explanation_cache.hit_rate)
+metrics.MEMORY_SUBSYSTEM_BYTES.set_function(memory_governor.usage_by_subsystem)
+
+def cuda_memory_bytes():
+    if not torch.cuda.is_available():
+        return None
+    return {'allocated': torch.cuda.memory_allocated(), 'reserved': torch.cuda.memory_reserved()}
+
+metrics.CUDA_MEMORY_BYTES.set_function(cuda_memory_bytes)
+
+# On-demand profiling of the next N requests/jobs
+profiler = tracing.ProfilerCapture(app.config['PROFILE_FOLDER'])
+
+# Requests that are never profiled (polling, scraping, admin). Routes that
+# only enqueue an analysis job are skipped too, so the capture goes to the job.
+UNPROFILED_PREFIXES = ('/metrics', '/jobs/', '/admin/', '/static/', '/analyze/')
+
+def create_session_store():
+    """Build the conversation store from app.config"""
+    return SessionStore(
+        max_sessions=app.config['SESSION_MAX_COUNT'],
+        idle_ttl=app.config['SESSION_IDLE_TTL'],
+        max_bytes=app.config['SESSION_MAX_BYTES'],
+        db_path=app.config['SESSION_DB_PATH']
+    )
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-class StopOnTokens(StoppingCriteria):
-    def __init__(self, stop_token_ids):
-        self.stop_token_ids = stop_token_ids
+def busy_response(error):
+    """429 response for a rejected admission, with Retry-After and the estimated wait"""
+    response = jsonify({'error': str(error), 'retry_after': round(error.retry_after, 1)})
+    response.status_code = 429
+    response.headers['Retry-After'] = error.retry_after_header
+    return response
 
-    def __call__(self, input_ids, scores, **kwargs):
-        for stop_id in self.stop_token_ids:
-            if input_ids[0][-1] == stop_id:
-                return True
-        return False
+def debug_requested():
+    """Whether the client asked for trace spans in the response"""
+    flag = request.args.get('debug') or request.headers.get('X-Debug-Trace')
+    return bool(flag) and flag.lower() in ('1', 'true', 'yes')
 
-class LogAnalyzer:
-    """Analyze error logs and crash dumps"""
-    
-    @staticmethod
-    def extract_key_info(content, max_lines=200):
-        """Extract key information from log content"""
-        lines = content.split('\n')[:max_lines]  # Limit lines to prevent token overflow
-        
-        # Patterns to look for
-        patterns = {
-            'errors': re.compile(r'(error|exception|fail|crash|fatal|critical)', re.IGNORECASE),
-            'warnings': re.compile(r'(warning|warn)', re.IGNORECASE),
-            'stack_traces': re.compile(r'(traceback|stack trace|at .+\(.+:\d+\)|Exception in thread)', re.IGNORECASE),
-            'timestamps': re.compile(r'(\d{4}-\d{2}-\d{2}|\d{2}:\d{2}:\d{2}|\d{2}/\d{2}/\d{4})'),
-            'memory': re.compile(r'(memory|heap|stack overflow|out of memory|oom)', re.IGNORECASE),
-            'segfault': re.compile(r'(segmentation fault|sigsegv|access violation)', re.IGNORECASE),
-            'null_pointer': re.compile(r'(null pointer|nullptr|nullreferenceexception)', re.IGNORECASE),
-            'file_paths': re.compile(r'([A-Za-z]:\\[\w\\\.-]+|/[\w/\.-]+)'),
-            'ip_addresses': re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b'),
-            'urls': re.compile(r'https?://[^\s]+'),
-        }
-        
-        findings = {
-            'total_lines': len(lines),
-            'errors': [],
-            'warnings': [],
-            'stack_traces': [],
-            'timestamps': [],
-            'critical_issues': [],
-            'file_paths': [],  # Changed from set to list
-            'summary': ''
-        }
-        
-        # Use a set temporarily for deduplication
-        file_paths_set = set()
-        
-        # Analyze each line
-        for i, line in enumerate(lines):
-            line_lower = line.lower()
-            
-            # Check for errors
-            if patterns['errors'].search(line):
-                findings['errors'].append({'line': i+1, 'content': line.strip()[:200]})  # Limit line length
-                
-                # Check for specific critical issues
-                if patterns['segfault'].search(line):
-                    findings['critical_issues'].append(f"Segmentation fault detected at line {i+1}")
-                elif patterns['null_pointer'].search(line):
-                    findings['critical_issues'].append(f"Null pointer exception at line {i+1}")
-                elif patterns['memory'].search(line):
-                    findings['critical_issues'].append(f"Memory issue detected at line {i+1}")
-            
-            # Check for warnings
-            elif patterns['warnings'].search(line):
-                findings['warnings'].append({'line': i+1, 'content': line.strip()[:200]})
-            
-            # Check for stack traces
-            if patterns['stack_traces'].search(line):
-                # Try to capture the full stack trace
-                stack_trace = [line]
-                for j in range(i+1, min(i+20, len(lines))):
-                    if lines[j].strip() and (lines[j].startswith(' ') or lines[j].startswith('\t') or 'at ' in lines[j]):
-                        stack_trace.append(lines[j])
-                    else:
-                        break
-                findings['stack_traces'].append('\n'.join(stack_trace)[:500])  # Limit stack trace length
-            
-            # Extract timestamps
-            timestamp_match = patterns['timestamps'].search(line)
-            if timestamp_match and len(findings['timestamps']) < 5:  # Limit timestamps
-                findings['timestamps'].append(timestamp_match.group())
-            
-            # Extract file paths
-            file_match = patterns['file_paths'].search(line)
-            if file_match:
-                file_paths_set.add(file_match.group())
-        
-        # Convert set to list for JSON serialization
-        findings['file_paths'] = list(file_paths_set)[:10]  # Limit to 10 paths
-        
-        # Limit the number of errors and warnings to prevent overflow
-        findings['errors'] = findings['errors'][:20]
-        findings['warnings'] = findings['warnings'][:20]
-        findings['stack_traces'] = findings['stack_traces'][:5]
-        
-        # Create summary
-        if findings['errors']:
-            findings['summary'] = f"Found {len(findings['errors'])} error(s)"
-            if findings['critical_issues']:
-                findings['summary'] += f" including {len(findings['critical_issues'])} critical issue(s)"
-        elif findings['warnings']:
-            findings['summary'] = f"Found {len(findings['warnings'])} warning(s), no errors detected"
-        else:
-            findings['summary'] = "No obvious errors or warnings found in the log"
-        
-        return findings
+def admin_allowed():
+    """Admin endpoints need the configured token, or a local request if none is set"""
+    token = app.config.get('ADMIN_TOKEN')
+    if token:
+        return secrets.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+    return request.remote_addr in ('127.0.0.1', '::1')
 
-class Phi3Chatbot:
-    def __init__(self, model_name="microsoft/Phi-3-mini-4k-instruct"):
-        """Initialize the Phi-3 chatbot with GPU support"""
-        print("Loading Phi-3 model... This may take a few minutes on first run.")
-        
-        # Check if CUDA is available
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        if self.device == "cpu":
-            print("WARNING: CUDA not available. Running on CPU. This will be slower.")
-        else:
-            print(f"Using GPU: {torch.cuda.get_device_name(0)}")
-            print(f"CUDA Version: {torch.version.cuda}")
-        
-        # Load tokenizer
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            model_name,
-            trust_remote_code=True
-        )
-        
-        # Configure model loading with explicit attention implementation
-        model_kwargs = {
-            "trust_remote_code": True,
-            "low_cpu_mem_usage": True,
-            "attn_implementation": "eager"
-        }
-        
-        if self.device == "cuda":
-            # Use 4-bit quantization for better memory efficiency
-            bnb_config = BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_quant_type="nf4",
-                bnb_4bit_compute_dtype=torch.float16,
-                bnb_4bit_use_double_quant=True
-            )
-            
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                quantization_config=bnb_config,
-                device_map="auto",
-                torch_dtype=torch.float16,
-                **model_kwargs
-            )
-        else:
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                device_map="auto",
-                torch_dtype=torch.float32,
-                **model_kwargs
-            )
-        
-        # Set up stopping criteria - only stop on specific end tokens
-        stop_tokens = ["<|end|>", "<|user|>"]
-        stop_token_ids = []
-        for token in stop_tokens:
-            if token in self.tokenizer.get_vocab():
-                stop_token_ids.append(self.tokenizer.convert_tokens_to_ids(token))
-        
-        self.stop_criteria = StoppingCriteriaList([StopOnTokens(stop_token_ids)])
-        
-        # Generation parameters - increased for better completeness
-        self.max_new_tokens = 400
-        self.temperature = 0.3
-        
-        # Session storage for conversation histories
-        self.conversations = {}
-        
-        # Log analyzer
-        self.log_analyzer = LogAnalyzer()
-        
-        print("Model loaded successfully!")
-        print("Note: Using eager attention implementation for compatibility.\n")
-    
-    def format_prompt(self, user_input, conversation_history):
-        """Format the prompt using Phi-3 instruction format"""
-        system_prompt = "You are a helpful assistant specializing in debugging and log analysis. Provide clear, complete answers. Always finish your thoughts and complete all sentences properly. Do not stop mid-sentence."
-        
-        messages = [f"<|system|>\n{system_prompt}<|end|>\n"]
-        
-        # Add conversation history (last 3 turns)
-        for turn in conversation_history[-3:]:
-            messages.append(f"<|user|>\n{turn['user']}<|end|>\n")
-            messages.append(f"<|assistant|>\n{turn['assistant']}<|end|>\n")
-        
-        messages.append(f"<|user|>\n{user_input}<|end|>\n<|assistant|>\n")
-        prompt = "".join(messages)
-        
-        return prompt
-    
-    def generate_response(self, prompt):
-        """Generate response using the model with better completion handling"""
-        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=2048)
-        inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
-        
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=self.max_new_tokens,
-                    temperature=self.temperature,
-                    top_p=0.95,
-                    do_sample=True,
-                    stopping_criteria=self.stop_criteria,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    eos_token_id=self.tokenizer.eos_token_id,
-                    min_new_tokens=50,
-                )
-        
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=False)
-        return response
-    
-    def clean_response(self, response, prompt):
-        """Extract and clean the assistant's response with better completion detection"""
-        if prompt in response:
-            response = response.split(prompt)[-1]
-        
-        if "<|assistant|>" in response:
-            response = response.split("<|assistant|>")[-1]
-        
-        # Remove any ending tags
-        for tag in ["<|end|>", "<|user|>", "<|assistant|>", "<|system|>"]:
-            if tag in response:
-                response = response.split(tag)[0]
-        
-        response = response.strip()
-        
-        # Check if response seems truncated and try to complete it
-        if response:
-            # Check if the response ends properly
-            last_char = response[-1] if response else ''
-            sentence_endings = '.!?:;"\''
-            
-            # If it doesn't end with proper punctuation and seems cut off
-            if last_char not in sentence_endings and len(response.split()) > 10:
-                # Check if it ends mid-word
-                if response and response[-1].isalnum():
-                    # Find the last complete sentence
-                    sentences = re.split(r'(?<=[.!?])\s+', response)
-                    if len(sentences) > 1:
-                        # Keep only complete sentences
-                        response = ' '.join(sentences[:-1])
-                        if not response[-1] in sentence_endings:
-                            response += '.'
-                else:
-                    # Just add a period if it's missing
-                    response += '.'
-        
-        # Remove any hashtags, @ mentions, or obvious role-playing elements
-        if '#' in response or '@' in response or '|' in response:
-            lines = response.split('\n')
-            cleaned_lines = []
-            for line in lines:
-                if not (line.strip().startswith('#') or 
-                       line.strip().startswith('@') or 
-                       '|' in line):
-                    cleaned_lines.append(line)
-            response = '\n'.join(cleaned_lines).strip()
-        
+@app.before_request
+def start_request_instrumentation():
+    if debug_requested():
+        g.trace, g.trace_token = tracing.start_trace(f'{request.method} {request.path}')
+    if not request.path.startswith(UNPROFILED_PREFIXES):
+        g.profile = profiler.begin(f'{request.method}_{request.path}')
+
+@app.after_request
+def attach_trace(response):
+    """Add the request trace to JSON responses when debug was requested"""
+    token = g.pop('trace_token', None)
+    if token is None:
         return response
-    
-    def analyze_log_file(self, file_content, filename):
-        """Analyze a log file and generate insights"""
-        try:
-            # Extract key information from the log
-            findings = self.log_analyzer.extract_key_info(file_content)
-            
-            # Create a structured prompt for analysis
-            analysis_prompt = f"""Analyze this error log file '{filename}' and provide debugging guidance.
-
-Summary of findings:
-- Total lines analyzed: {findings['total_lines']}
-- Errors found: {len(findings['errors'])}
-- Warnings found: {len(findings['warnings'])}
-- Critical issues: {', '.join(findings['critical_issues'][:5]) if findings['critical_issues'] else 'None detected'}
-
-Key errors (showing first 3):
-{chr(10).join([f"Line {e['line']}: {e['content']}" for e in findings['errors'][:3]])}
-
-Stack traces found: {len(findings['stack_traces'])}
-{findings['stack_traces'][0] if findings['stack_traces'] else 'No stack traces found'}
-
-Based on this analysis, provide:
-1. A brief summary of the main issues
-2. The likely root cause
-3. Specific debugging steps to resolve the issues
-4. Any additional recommendations
-
-Keep your response concise and actionable."""
-            
-            # Generate analysis using the model
-            session_id = 'log_analysis'
-            if session_id not in self.conversations:
-                self.conversations[session_id] = []
-            
-            response = self.chat(analysis_prompt, session_id)
-            
-            # Prepare safe findings for JSON serialization
-            safe_findings = {
-                'summary': findings['summary'],
-                'error_count': len(findings['errors']),
-                'warning_count': len(findings['warnings']),
-                'critical_issues': findings['critical_issues'][:5],  # Limit to 5
-                'has_stack_traces': len(findings['stack_traces']) > 0
-            }
-            
-            return {
-                'raw_findings': safe_findings,
-                'analysis': response,
-                'filename': filename
-            }
-            
-        except Exception as e:
-            print(f"Error in analyze_log_file: {str(e)}")
-            return {
-                'raw_findings': {'summary': 'Error during analysis', 'error_count': 0},
-                'analysis': f"I encountered an error while analyzing the log file: {str(e)}. Please try again with a smaller file or check the file format.",
-                'filename': filename
-            }
-    
-    def chat(self, user_input, session_id):
-        """Process user input and return response with retry logic"""
-        try:
-            # Get or create conversation history for this session
-            if session_id not in self.conversations:
-                self.conversations[session_id] = []
-            
-            conversation_history = self.conversations[session_id]
-            
-            # Format prompt
-            prompt = self.format_prompt(user_input, conversation_history)
-            
-            # Try up to 3 times to get a complete response
-            best_response = ""
-            for attempt in range(3):
-                # Generate response
-                raw_response = self.generate_response(prompt)
-                
-                # Clean response
-                response = self.clean_response(raw_response, prompt)
-                
-                # Keep the longest response
-                if len(response) > len(best_response):
-                    best_response = response
-                
-                # If response seems complete, use it
-                if response and response[-1] in '.!?":;)\']':
-                    best_response = response
-                    break
-                
-                # Otherwise, try with more tokens
-                if attempt < 2:
-                    self.max_new_tokens = min(self.max_new_tokens + 100, 600)
-            
-            # Reset to default token count
-            self.max_new_tokens = 400
-            
-            # Use the best response we got
-            response = best_response if best_response else "I apologize, but I had trouble generating a complete response. Please try asking your question again."
-            
-            # Add to conversation history
-            conversation_history.append({
-                'user': user_input,
-                'assistant': response,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Keep history size manageable
-            if len(conversation_history) > 10:
-                self.conversations[session_id] = conversation_history[-10:]
-            
-            return response
-            
-        except Exception as e:
-            return f"I apologize, but I encountered an error: {str(e)}"
-    
-    def clear_session(self, session_id):
-        """Clear conversation history for a session"""
-        if session_id in self.conversations:
-            self.conversations[session_id] = []
-    
-    def get_session_history(self, session_id):
-        """Get conversation history for a session"""
-        return self.conversations.get(session_id, [])
+    trace = tracing.end_trace(token)
+    if response.is_json:
+        data = response.get_json(silent=True)
+        if isinstance(data, dict):
+            data['trace'] = trace.to_dict()
+            response.set_data(json.dumps(data))
+    return response
+
+@app.teardown_request
+def finish_request_profile(exc):
+    handle = g.pop('profile', None)
+    if handle is not None:
+        profiler.end(handle)
 
 @app.route('/')
 def index():
@@ -450,8 +302,14 @@ def chat():
     if not user_message:
         return jsonify({'error': 'No message provided'}), 400
     
-    # Get response from chatbot
-    response = chatbot.chat(user_message, session_id)
+    # Wait for the model in the interactive lane
+    try:
+        with tracing.span('wait_for_model'):
+            ticket = admission.admit(session_id, LANE_INTERACTIVE, timeout=app.config['CHAT_MAX_WAIT'])
+        with ticket:
+            response = chatbot.chat(user_message, session_id)
+    except AdmissionRejected as e:
+        return busy_response(e)
     
     return jsonify({
         'response': response,
@@ -468,71 +326,362 @@ def upload_file():
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
-        # Create unique filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = secure_filename(file.filename)
-        unique_filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        # Save file
-        file.save(filepath)
-        
-        # Get file info
-        file_size = os.path.getsize(filepath)
         
-        # Store file info in session
-        if 'uploaded_files' not in session:
-            session['uploaded_files'] = []
+        # Stream into the blob store, hashing as we write; identical content is stored once
+        session_id = session.get('session_id', 'default')
+        record, deduplicated = upload_registry.add_stream(session_id, filename, file.stream)
         
-        file_info = {
-            'id': hashlib.md5(unique_filename.encode()).hexdigest()[:8],
-            'filename': filename,
-            'filepath': filepath,
-            'size': file_size,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        session['uploaded_files'].append(file_info)
-        session.modified = True
+        # Make room by evicting this session's (then idle sessions') older files
+        if not retention.enforce(session_id, keep=record.id):
+            upload_registry.remove(record.id)
+            return jsonify({'error': 'Upload quota exceeded'}), 413
         
         return jsonify({
             'status': 'success',
-            'file': file_info
+            'file': record.to_dict(),
+            'deduplicated': deduplicated
         })
     
     return jsonify({'error': 'Invalid file type'}), 400
 
-@app.route('/analyze/<file_id>', methods=['POST'])
-def analyze_file(file_id):
-    if 'uploaded_files' not in session:
-        return jsonify({'error': 'No files uploaded'}), 404
+@app.route('/upload/init', methods=['POST'])
+def init_chunked_upload():
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+    
+    try:
+        upload = chunked_uploads.init(
+            session.get('session_id', 'default'),
+            filename,
+            data.get('size'),
+            chunk_size=data.get('chunk_size'),
+            sha256=data.get('sha256')
+        )
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    except QuotaExceeded as e:
+        return jsonify({'error': str(e)}), 413
+    return jsonify(upload.to_dict()), 201
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    try:
+        upload = chunked_uploads.get(upload_id, owner=session.get('session_id', 'default'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify(upload.to_dict())
+
+@app.route('/upload/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    # The body is the raw chunk; it is streamed to disk, never buffered whole
+    try:
+        upload = chunked_uploads.write_chunk(
+            upload_id,
+            index,
+            request.stream,
+            owner=session.get('session_id', 'default'),
+            sha256=request.headers.get('X-Chunk-SHA256')
+        )
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify(upload.to_dict())
+
+@app.route('/upload/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    try:
+        record, deduplicated = chunked_uploads.complete(upload_id, owner=session.get('session_id', 'default'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({
+        'status': 'success',
+        'file': record.to_dict(),
+        'deduplicated': deduplicated
+    })
+
+@app.route('/upload/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    try:
+        chunked_uploads.abort(upload_id, owner=session.get('session_id', 'default'))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({'status': 'aborted'})
+
+def run_analysis_job(job, file_info, ticket, debug=False):
+    """Background job body: read the file and run the model analysis"""
+    with profiler.capture(f"analyze_{file_info.filename}"):
+        if not debug:
+            return _analyze_uploaded_file(job, file_info, ticket)
+        with tracing.traced(f"analyze {file_info.filename}") as trace:
+            result = _analyze_uploaded_file(job, file_info, ticket)
+        result['trace'] = trace.to_dict()
+        return result
+
+def bts_call(fn, *args):
+    """Run a BTS client call on the BTS I/O lane; a full lane or timeout surfaces as BTSError"""
+    try:
+        return io_pool.run('bts', fn, *args)
+    except IOBusy as e:
+        raise BTSError(str(e), e.status, 'busy')
+    except IOTimeout as e:
+        raise BTSError(str(e), e.status, 'timeout')
+
+def find_similar_bugs(text, k=5):
+    """Top-k similar BTS bugs for ``text``; empty when the BTS is unreachable"""
+    try:
+        bts_call(bts_client.index)  # Refreshes the bug list, and with it the similarity index, when stale
+    except BTSError:
+        if not len(similar_bugs_index):
+            return []
+    return similar_bugs_index.query(text, k=k)
+
+def upload_findings(record):
+    """Findings for an uploaded file, pinned while it is read: a dump summary, the findings from upload, or a scan"""
+    if not upload_registry.pin(record.id):
+        raise FileNotFoundError(record.filepath)
+    try:
+        if detect_dump_format(record.filepath):
+            return analyze_dump(record.filepath)
+        if record.findings is not None:
+            return record.findings
+        return LogAnalyzer.scan_file(record.filepath)
+    finally:
+        upload_registry.unpin(record.id)
+
+def _analyze_uploaded_file(job, file_info, ticket):
+    # Binary dumps get a structured summary instead of a line scan
+    dump_format = detect_dump_format(file_info.filepath)
+    if dump_format:
+        job.set_stage('reading_dump', 0.1)
+        with tracing.span('analyze_dump', format=dump_format):
+            findings = analyze_dump(file_info.filepath)
+    # Only the head of the log is analyzed, so never read the whole file
+    elif file_info.findings is not None:
+        findings = file_info.findings
+    else:
+        job.set_stage('scanning', 0.1)
+        with tracing.span('scan_file'):
+            findings = LogAnalyzer.scan_file(file_info.filepath)
+    job.raise_if_cancelled()
+    
+    # Possible duplicates in the tracker; cheap, so done before queueing for the model
+    with tracing.span('similar_bugs'):
+        similar_bugs = find_similar_bugs(findings_to_text(findings))
     
-    # Find the file
-    file_info = None
-    for f in session['uploaded_files']:
-        if f['id'] == file_id:
-            file_info = f
-            break
+    # A failure explained before needs no model time
+    analysis_result = chatbot.cached_analysis(findings, file_info.filename)
+    if analysis_result is not None:
+        ticket.release()  # The model is not needed; free the lane place now
+    else:
+        # Only now is the job ready for the model: join the bulk lane's queue
+        job.set_stage('waiting_for_model', 0.15)
+        try:
+            with tracing.span('wait_for_model'):
+                ticket.wait(cancel_event=job.cancel_event)
+        except AdmissionRejected:
+            job.raise_if_cancelled()
+            raise
+        
+        # Analyze the log file
+        with ticket, tracing.span('analyze_log_file'):
+            analysis_result = chatbot.analyze_log_file(
+                None,
+                file_info.filename,
+                progress=job.set_stage,
+                cancel_event=job.cancel_event,
+                findings=findings,
+                check_cache=False
+            )
     
+    return {
+        'status': 'success',
+        'analysis': analysis_result['analysis'],
+        'findings': analysis_result['raw_findings'],
+        'similar_bugs': similar_bugs,
+        'filename': file_info.filename,
+        'cached': analysis_result.get('cached', False)
+    }
+
+@app.route('/analyze/<file_id>', methods=['POST'])
+def analyze_file(file_id):
+    session_id = session.get('session_id', 'default')
+    file_info = upload_registry.get(file_id, owner=session_id)
     if not file_info:
         return jsonify({'error': 'File not found'}), 404
     
     try:
-        # Read file content
-        with open(file_info['filepath'], 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-          # Analyze the log file
-        analysis_result = chatbot.analyze_log_file(content, file_info['filename'])
-        
-        return jsonify({
-            'status': 'success',
-            'analysis': analysis_result['analysis'],
-            'findings': analysis_result['raw_findings'],
-            'filename': file_info['filename']
-        })
-    except Exception as e:
-        print(f"Error in analyze endpoint: {str(e)}")
-        return jsonify({'error': f'Error analyzing file: {str(e)}'}), 500
+        memory_governor.admit()
+        ticket = admission.reserve(session_id, LANE_BULK)
+    except AdmissionRejected as e:
+        return busy_response(e)
+    
+    # Keep the file on disk until the job is done with it
+    upload_registry.pin(file_id)
+    try:
+        job = job_queue.submit('analyze', run_analysis_job, file_info, ticket,
+                               debug=debug_requested(), owner=session_id)
+    except JobQueueFull as e:
+        ticket.release()
+        upload_registry.unpin(file_id)
+        return jsonify({'error': str(e)}), 429
+    # Free the admission slot and the pin however the job ends, including cancellation while queued
+    job.add_done_callback(lambda finished_job: ticket.release())
+    job.add_done_callback(lambda finished_job: upload_registry.unpin(file_id))
+    
+    return jsonify({
+        'status': 'queued',
+        'job_id': job.id,
+        'status_url': f'/jobs/{job.id}',
+        'filename': file_info.filename,
+        'estimated_wait': round(admission.estimated_wait(LANE_BULK), 1)
+    }), 202
+
+def run_correlated_job(job, files, ticket, before, after, debug=False):
+    """Background job body: merge several logs by time and analyze them together"""
+    with profiler.capture('analyze_correlated'):
+        if not debug:
+            return _analyze_correlated_files(job, files, ticket, before, after)
+        with tracing.traced(f"analyze {len(files)} correlated files") as trace:
+            result = _analyze_correlated_files(job, files, ticket, before, after)
+        result['trace'] = trace.to_dict()
+        return result
+
+def _analyze_correlated_files(job, files, ticket, before, after):
+    # Streamed k-way merge; reading stops once the window around the first failure is complete
+    job.set_stage('merging', 0.1)
+    with tracing.span('correlate', files=len(files)):
+        correlation = correlate([(f.filepath, f.filename) for f in files], before=before, after=after,
+                                max_window_lines=memory_governor.window_lines(app.config['CORRELATE_WINDOW_LINES']))
+    job.raise_if_cancelled()
+    
+    with tracing.span('similar_bugs'):
+        similar_bugs = find_similar_bugs(findings_to_text(correlation['findings']))
+    
+    # Only now is the job ready for the model: join the bulk lane's queue
+    job.set_stage('waiting_for_model', 0.15)
+    try:
+        with tracing.span('wait_for_model'):
+            ticket.wait(cancel_event=job.cancel_event)
+    except AdmissionRejected:
+        job.raise_if_cancelled()
+        raise
+    
+    # One generation for all files
+    file_summaries = {f.filename: f.findings['summary'] for f in files if f.findings}
+    with ticket, tracing.span('analyze_correlated'):
+        analysis_result = chatbot.analyze_correlated(
+            correlation,
+            file_summaries,
+            progress=job.set_stage,
+            cancel_event=job.cancel_event
+        )
+    
+    window = correlation['window']
+    return {
+        'status': 'success',
+        'analysis': analysis_result['analysis'],
+        'findings': analysis_result['raw_findings'],
+        'first_failure': correlation['first_failure'],
+        'window': {key: window[key] for key in ('start', 'end', 'line_counts')},
+        'timeline': window['lines'],
+        'lines_read': correlation['lines_read'],
+        'similar_bugs': similar_bugs,
+        'filenames': correlation['files']
+    }
+
+@app.route('/analyze/correlated', methods=['POST'])
+def analyze_correlated():
+    session_id = session.get('session_id', 'default')
+    data = request.get_json(silent=True) or {}
+    file_ids = data.get('file_ids')
+    if (not isinstance(file_ids, list) or not all(isinstance(file_id, str) for file_id in file_ids)
+            or not 2 <= len(set(file_ids)) <= app.config['CORRELATE_MAX_FILES']):
+        return jsonify({'error': f"file_ids must list 2 to {app.config['CORRELATE_MAX_FILES']} uploaded files"}), 400
+    file_ids = list(dict.fromkeys(file_ids))
+    try:
+        before = float(data.get('before', app.config['CORRELATE_BEFORE']))
+        after = float(data.get('after', app.config['CORRELATE_AFTER']))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'before and after must be numbers of seconds'}), 400
+    
+    files = []
+    for file_id in file_ids:
+        file_info = upload_registry.get(file_id, owner=session_id)
+        if not file_info:
+            return jsonify({'error': f'File not found: {file_id}'}), 404
+        files.append(file_info)
+    
+    try:
+        memory_governor.admit()
+        ticket = admission.reserve(session_id, LANE_BULK)
+    except AdmissionRejected as e:
+        return busy_response(e)
+    
+    for file_id in file_ids:
+        upload_registry.pin(file_id)
+    
+    def unpin_all(finished_job=None):
+        for file_id in file_ids:
+            upload_registry.unpin(file_id)
+    
+    try:
+        job = job_queue.submit('analyze_correlated', run_correlated_job, files, ticket, before, after,
+                               debug=debug_requested(), owner=session_id)
+    except JobQueueFull as e:
+        ticket.release()
+        unpin_all()
+        return jsonify({'error': str(e)}), 429
+    job.add_done_callback(lambda finished_job: ticket.release())
+    job.add_done_callback(unpin_all)
+    
+    return jsonify({
+        'status': 'queued',
+        'job_id': job.id,
+        'status_url': f'/jobs/{job.id}',
+        'filenames': [f.filename for f in files],
+        'estimated_wait': round(admission.estimated_wait(LANE_BULK), 1)
+    }), 202
+
+def _get_owned_job(job_id):
+    """Look up a job, hiding jobs that belong to other sessions"""
+    job = job_queue.get(job_id)
+    if job is None or job.owner != session.get('session_id', 'default'):
+        return None
+    return job
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = _get_owned_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = _get_owned_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if not job_queue.cancel(job_id):
+        return jsonify({'error': f'Job already {job.status}'}), 409
+    return jsonify(job.to_dict())
+
+def fetch_into_store(session_id, file_path, filename, cancel_event):
+    """Stream a server-side log into the blob store; re-fetching unchanged files stores nothing new"""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(file_path)
+    if not os.path.isfile(file_path):
+        raise IsADirectoryError(file_path)
+    retention.reserve(session_id, os.path.getsize(file_path))
+    with open(file_path, 'rb') as f:
+        return upload_registry.add_stream(
+            session_id,
+            filename,
+            CancellableReader(f, cancel_event),
+            source='auto-fetched',
+            original_path=file_path
+        )
 
 @app.route('/fetch-log', methods=['POST'])
 def fetch_log():
@@ -548,50 +697,30 @@ def fetch_log():
         if not any(file_path.lower().endswith(ext) for ext in ['.log', '.txt', '.err', '.out', '.crash', '.trace', '.dmp', '.dump']):
             return jsonify({'error': 'Invalid file type'}), 400
         
-        # Check if file exists and is readable
-        if not os.path.exists(file_path):
+        # Stat and copy on the file I/O lane, so a slow mount cannot hold this thread past the timeout
+        session_id = session.get('session_id', 'default')
+        cancel_event = threading.Event()
+        try:
+            record, deduplicated = io_pool.run('fs', fetch_into_store, session_id, file_path, filename, cancel_event)
+        except FileNotFoundError:
             return jsonify({'error': f'File not found: {file_path}'}), 404
-        
-        if not os.path.isfile(file_path):
+        except IsADirectoryError:
             return jsonify({'error': f'Path is not a file: {file_path}'}), 400
-        
-        # Read the file
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+        except (IOBusy, IOTimeout) as e:
+            cancel_event.set()  # Stop the copy at its next chunk
+            return jsonify({'error': str(e)}), e.status
+        except QuotaExceeded as e:
+            return jsonify({'error': str(e)}), 413
         except PermissionError:
             return jsonify({'error': f'Permission denied reading file: {file_path}'}), 403
         except Exception as e:
             return jsonify({'error': f'Error reading file: {str(e)}'}), 500
         
-        # Create a file entry similar to uploaded files
-        file_id = hashlib.md5(f"{file_path}{datetime.now().isoformat()}".encode()).hexdigest()
-        
-        # Save to uploads folder for analysis
-        safe_filename = secure_filename(filename)
-        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{safe_filename}")
-        
-        with open(upload_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        file_info = {
-            'id': file_id,
-            'filename': filename,
-            'filepath': upload_path,
-            'size': len(content.encode('utf-8')),
-            'source': 'auto-fetched',
-            'original_path': file_path
-        }
-        
-        # Add to session
-        if 'uploaded_files' not in session:
-            session['uploaded_files'] = []
-        session['uploaded_files'].append(file_info)
-        
         return jsonify({
             'status': 'success',
             'message': f'Successfully fetched log file from {file_path}',
-            'file': file_info
+            'file': record.to_dict(),
+            'deduplicated': deduplicated
         })
         
     except Exception as e:
@@ -608,7 +737,7 @@ def clear():
 def history():
     session_id = session.get('session_id', 'default')
     history = chatbot.get_session_history(session_id)
-    return jsonify({'history': history})
+    return jsonify({'history': history, 'summary': chatbot.get_session_summary(session_id)})
 
 @app.route('/settings', methods=['POST'])
 def settings():
@@ -635,56 +764,167 @@ def status():
         'device': chatbot.device,
         'temperature': chatbot.temperature,
         'max_tokens': chatbot.max_new_tokens,
-        'model': 'Phi-3-mini-4k-instruct'
+        'model': 'Phi-3-mini-4k-instruct',
+        'admission': admission.stats(),
+        'memory': memory_governor.stats(),
+        'sessions': chatbot.conversations.stats(),
+        'summarizer': conversation_summarizer.stats(),
+        'chunked_uploads': chunked_uploads.stats(),
+        'uploads': {**upload_registry.stats(), **retention.stats()},
+        'bts_cache': bts_client.stats(),
+        'io': io_pool.stats(),
+        'explanation_cache': explanation_cache.stats(),
+        'similarity_index': similar_bugs_index.stats(),
+        'prefix_cache': chatbot.prefix_cache.stats() if getattr(chatbot, 'prefix_cache', None) else None
     })
 
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """Arm the profiler for the next N requests/jobs, or report its status"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            profiler.arm(int(data.get('requests', 1)), data.get('mode', 'cprofile'))
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        except ImportError:
+            return jsonify({'error': 'torch.profiler is not available'}), 400
+    
+    return jsonify(profiler.status())
+
+@app.route('/admin/rules', methods=['GET', 'POST'])
+def admin_rules():
+    """Loaded detection rule packs with per-rule hits and cost; POST reloads them now"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    if request.method == 'POST':
+        DETECTION_RULES.reload(force=True)
+    
+    return jsonify(DETECTION_RULES.status())
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.REGISTRY.render(), mimetype=metrics.CONTENT_TYPE)
+
 @app.route('/bts/bugs', methods=['GET'])
 def get_bugs():
-    """Proxy endpoint to fetch bugs from BTS backend"""
-    import requests
+    """Filtered, sorted page of bugs from the cached BTS bug list"""
+    filters = {}
+    for facet in FACETS:
+        values = [v for value in request.args.getlist(facet) for v in value.split(',') if v]
+        if values:
+            filters[facet] = values
+    q = request.args.get('q', '').strip()
+    sort = request.args.get('sort') or None
     try:
-        # Make request to BTS backend
-        response = requests.get('http://localhost:3001/api/bugs', timeout=10)
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            return jsonify({'error': f'BTS API returned status {response.status_code}'}), response.status_code
-    except requests.exceptions.ConnectionError:
-        return jsonify({'error': 'Cannot connect to BTS backend. Make sure it is running on port 3001.'}), 503
-    except requests.exceptions.Timeout:
-        return jsonify({'error': 'BTS backend request timed out.'}), 504
-    except Exception as e:
-        return jsonify({'error': f'Error connecting to BTS: {str(e)}'}), 500
+        page = max(1, int(request.args.get('page', 1)))
+        limit = max(1, min(int(request.args.get('limit', 50)), MAX_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'page and limit must be integers'}), 400
+    
+    try:
+        index = bts_call(bts_client.index)
+    except BTSError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    # The page only changes with the data or the query, so browsers can revalidate for free
+    query_key = json.dumps([sorted(filters.items()), q.lower(), sort, page, limit])
+    etag = f"{index.version}-{hashlib.sha1(query_key.encode()).hexdigest()[:12]}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        try:
+            bugs, total = index.query(filters, q=q, sort=sort, page=page, limit=limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        response = jsonify({
+            'bugs': bugs,
+            'total': total,
+            'page': page,
+            'limit': limit,
+            'pages': (total + limit - 1) // limit
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/bts/similar', methods=['POST'])
+def similar_bugs():
+    """Bugs similar to free text, LogAnalyzer findings or an uploaded file"""
+    data = request.get_json(silent=True) or {}
+    try:
+        k = max(1, min(int(data.get('k', 5)), 50))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k must be an integer'}), 400
+    
+    if data.get('text'):
+        text = data['text']
+    elif isinstance(data.get('findings'), dict):
+        text = findings_to_text(data['findings'])
+    elif data.get('file_id'):
+        record = upload_registry.get(data['file_id'], owner=session.get('session_id', 'default'))
+        if not record:
+            return jsonify({'error': 'File not found'}), 404
+        # Read on the file I/O lane, so a large file cannot hold this thread past the timeout
+        try:
+            text = findings_to_text(io_pool.run('fs', upload_findings, record))
+        except FileNotFoundError:
+            return jsonify({'error': 'File not found'}), 404
+        except (IOBusy, IOTimeout) as e:
+            return jsonify({'error': str(e)}), e.status
+    else:
+        return jsonify({'error': 'Provide text, findings or file_id'}), 400
+    
+    try:
+        bts_call(bts_client.index)
+    except BTSError as e:
+        if not len(similar_bugs_index):
+            return jsonify({'error': str(e)}), e.status
+    started = time.perf_counter()
+    results = similar_bugs_index.query(text, k=k)
+    return jsonify({
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
 
 @app.route('/bts/bugs/<bug_id>', methods=['GET'])
 def get_bug(bug_id):
     """Proxy endpoint to fetch a specific bug from BTS backend"""
-    import requests
     try:
-        # Get all bugs and find the specific one
-        response = requests.get('http://localhost:3001/api/bugs', timeout=10)
-        if response.status_code == 200:
-            bugs = response.json()
-            bug = next((b for b in bugs if b['id'] == bug_id), None)
-            if bug:
-                return jsonify(bug)
-            else:
-                return jsonify({'error': f'Bug with ID {bug_id} not found'}), 404
-        else:
-            return jsonify({'error': f'BTS API returned status {response.status_code}'}), response.status_code
-    except requests.exceptions.ConnectionError:
-        return jsonify({'error': 'Cannot connect to BTS backend. Make sure it is running on port 3001.'}), 503
-    except requests.exceptions.Timeout:
-        return jsonify({'error': 'BTS backend request timed out.'}), 504
-    except Exception as e:
-        return jsonify({'error': f'Error connecting to BTS: {str(e)}'}), 500
+        bug = bts_call(bts_client.get_bug, bug_id)
+    except BTSError as e:
+        return jsonify({'error': str(e)}), e.status
+    if bug is None:
+        return jsonify({'error': f'Bug with ID {bug_id} not found'}), 404
+    return jsonify(bug)
+
+def start_background_services():
+    """Start the upload sweeper, memory governor and conversation summarizer threads.
+
+    Called when the server starts, not on import, so importing the app (e.g.
+    in tests or the load-test harness) starts no threads.
+    """
+    retention.start()
+    memory_governor.start()
+    conversation_summarizer.start()
 
 if __name__ == '__main__':
     print("Initializing Phi-3 Web Chatbot with Log Analysis...")
     print("="*50)
     
     try:
-        chatbot = Phi3Chatbot()
+        chatbot = Phi3Chatbot(session_store=create_session_store(),
+                              prefix_cache_dir=app.config['PREFIX_CACHE_FOLDER'])
+        chatbot.memory_governor = memory_governor
+        chatbot.explanation_cache = explanation_cache
+        chatbot.summarizer = conversation_summarizer
+        chatbot.summary_trigger_tokens = app.config['SUMMARY_TRIGGER_TOKENS']
+        start_background_services()
         print("\n" + "="*50)
         print("Starting web server...")
         print("Open your browser and go to: http://localhost:5000")
@@ -0,0 +1,200 @@
+"""Benchmark response post-processing on long log-analysis prompts.
+
+Compares three ways of turning generated token IDs into the cleaned answer:
+
+- legacy: decode prompt + output together, then search for the prompt and
+  the chat tags in the full text (the old ``clean_response``)
+- sliced: decode only the new tokens and clean them in one pass
+- streaming: detokenize token by token and clean as the text arrives (what
+  ``Phi3Chatbot.stream_response`` does)
+
+Each response is checked to be identical across the three. Prompts are
+analysis prompts for a generated log plus a few turns of history, so their
+length is in the range the web app sends. Runs offline with a byte-level BPE
+tokenizer trained on the spot.
+
+    python -m benchmarks.bench_detokenize --responses 200 --history-turns 3 --json detok.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.tiny_model import SAMPLE_ANSWER, SAMPLE_LOG, train_tokenizer
+from detokenize import IncrementalDetokenizer, ResponseCleaner, clean_generated_text
+from log_analyzer import LogAnalyzer, build_analysis_prompt
+
+SYSTEM_PROMPT = "You are a helpful assistant specializing in debugging and log analysis. Provide clear, complete answers. Always finish your thoughts and complete all sentences properly. Do not stop mid-sentence."
+
+
+def legacy_clean_response(response, prompt):
+    """``Phi3Chatbot.clean_response`` as it was before single-pass cleaning"""
+    if prompt in response:
+        response = response.split(prompt)[-1]
+
+    if "<|assistant|>" in response:
+        response = response.split("<|assistant|>")[-1]
+
+    # Remove any ending tags
+    for tag in ["<|end|>", "<|user|>", "<|assistant|>", "<|system|>"]:
+        if tag in response:
+            response = response.split(tag)[0]
+
+    response = response.strip()
+
+    # Check if response seems truncated and try to complete it
+    if response:
+        # Check if the response ends properly
+        last_char = response[-1] if response else ''
+        sentence_endings = '.!?:;"\''
+
+        # If it doesn't end with proper punctuation and seems cut off
+        if last_char not in sentence_endings and len(response.split()) > 10:
+            # Check if it ends mid-word
+            if response and response[-1].isalnum():
+                # Find the last complete sentence
+                sentences = re.split(r'(?<=[.!?])\s+', response)
+                if len(sentences) > 1:
+                    # Keep only complete sentences
+                    response = ' '.join(sentences[:-1])
+                    if not response[-1] in sentence_endings:
+                        response += '.'
+            else:
+                # Just add a period if it's missing
+                response += '.'
+
+    # Remove any hashtags, @ mentions, or obvious role-playing elements
+    if '#' in response or '@' in response or '|' in response:
+        lines = response.split('\n')
+        cleaned_lines = []
+        for line in lines:
+            if not (line.strip().startswith('#') or
+                   line.strip().startswith('@') or
+                   '|' in line):
+                cleaned_lines.append(line)
+        response = '\n'.join(cleaned_lines).strip()
+
+    return response
+
+
+def make_prompt(rng, log_lines, history_turns):
+    """A chat-formatted analysis prompt for a generated log, after some history"""
+    sample = SAMPLE_LOG.splitlines()
+    log = '\n'.join(f'{rng.choice(sample)} request={rng.randrange(10 ** 6)}' for _ in range(log_lines))
+    findings = LogAnalyzer.extract_key_info(log, max_lines=log_lines)
+    messages = [f"<|system|>\n{SYSTEM_PROMPT}<|end|>\n"]
+    for _ in range(history_turns):
+        messages.append(f"<|user|>\n{build_analysis_prompt(findings, 'previous.log')}<|end|>\n")
+        messages.append(f"<|assistant|>\n{SAMPLE_ANSWER}<|end|>\n")
+    messages.append(f"<|user|>\n{build_analysis_prompt(findings, 'nightly.log')}<|end|>\n<|assistant|>\n")
+    return ''.join(messages)
+
+
+def make_response(rng, words):
+    """Answer-like text; some are cut off, carry chat tags or filtered lines"""
+    text = ' '.join(rng.choice(words) for _ in range(rng.randint(20, 300)))
+    if rng.random() < 0.3:
+        text = text.replace(' 2. ', '\n# Heading\n2. ', 1)
+    if rng.random() < 0.2:
+        text += '\n| a | b |\n@mention'
+    if rng.random() < 0.5:
+        text += rng.choice(['<|end|>', '<|end|><|user|>\nnext question', '<|assistant|>\nRestarted answer.'])
+    return text
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def run_benchmark(responses=200, log_lines=200, history_turns=3, repeat=3, seed=0):
+    rng = random.Random(seed)
+    tokenizer = train_tokenizer()
+    words = re.findall(r'\S+', SAMPLE_ANSWER) + ['.', 'and', 'the']
+    timings = {'legacy': [], 'sliced': [], 'streaming': []}
+    mismatches = 0
+    prompt_tokens = []
+    for _ in range(responses):
+        prompt = make_prompt(rng, log_lines, history_turns)
+        prompt_ids = tokenizer(prompt)['input_ids']
+        output_ids = tokenizer(make_response(rng, words))['input_ids']
+        ids = prompt_ids + output_ids
+        prompt_tokens.append(len(prompt_ids))
+
+        def legacy():
+            return legacy_clean_response(tokenizer.decode(ids, skip_special_tokens=False), prompt)
+
+        def sliced():
+            return clean_generated_text(tokenizer.decode(ids[len(prompt_ids):], skip_special_tokens=False))
+
+        def streaming():
+            detokenizer = IncrementalDetokenizer(tokenizer)
+            cleaner = ResponseCleaner()
+            for token_id in ids[len(prompt_ids):]:
+                cleaner.feed(detokenizer.feed([token_id]))
+            cleaner.feed(detokenizer.flush())
+            return cleaner.finish()
+
+        results = {}
+        for name, function in (('legacy', legacy), ('sliced', sliced), ('streaming', streaming)):
+            results[name], seconds = timed(function, repeat)
+            timings[name].append(seconds)
+        if not results['legacy'] == results['sliced'] == results['streaming']:
+            mismatches += 1
+
+    report = {
+        'responses': responses,
+        'prompt_tokens_mean': round(statistics.mean(prompt_tokens)),
+        'mismatches': mismatches,
+        'methods': {},
+    }
+    for name, values in timings.items():
+        report['methods'][name] = {
+            'mean_ms': round(statistics.mean(values) * 1000, 3),
+            'p50_ms': round(statistics.median(values) * 1000, 3),
+            'max_ms': round(max(values) * 1000, 3),
+        }
+    legacy_mean = report['methods']['legacy']['mean_ms']
+    for name in ('sliced', 'streaming'):
+        report['methods'][name]['speedup'] = round(legacy_mean / report['methods'][name]['mean_ms'], 2)
+    return report
+
+
+def print_report(report):
+    print(f"{report['responses']} responses, mean prompt {report['prompt_tokens_mean']} tokens, "
+          f"{report['mismatches']} mismatched outputs")
+    print(f"{'method':<10} {'mean ms':>10} {'p50 ms':>10} {'max ms':>10} {'speedup':>8}")
+    for name, row in report['methods'].items():
+        print(f"{name:<10} {row['mean_ms']:>10} {row['p50_ms']:>10} {row['max_ms']:>10} "
+              f"{row.get('speedup', 1.0):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark response detokenization and cleaning.')
+    parser.add_argument('--responses', type=int, default=200, help='Prompt/response pairs to process')
+    parser.add_argument('--log-lines', type=int, default=200, help='Lines in each generated log')
+    parser.add_argument('--history-turns', type=int, default=3, help='Turns of history before the prompt')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed repetitions per response')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write the report to this file')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.responses, args.log_lines, args.history_turns, args.repeat, args.seed)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if report['mismatches']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
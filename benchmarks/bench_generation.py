@@ -0,0 +1,336 @@
+"""Benchmark Phi3Chatbot.generate_response across prompt lengths and model settings.
+
+Sweeps prompt length (the system prompt alone up to a 2048-token log
+analysis prompt), ``max_new_tokens``, dtype, quantization and attention
+implementation. Each case records prefill time, time to first token, decode
+throughput and peak memory (CUDA allocations on a GPU, sampled RSS on CPU),
+taking the median over repeated runs after a warm-up.
+
+Runs offline: ``--model tiny`` (the default) uses a random-weight model of
+the Phi-3 shape with a tokenizer trained on the spot, and ``--model <name or
+path>`` loads a locally cached checkpoint without touching the network.
+With ``--baseline`` the report is compared case by case against an earlier
+one, and ``--max-regression`` turns slowdowns into a non-zero exit status:
+
+    python -m benchmarks.bench_generation --json gen.json
+    python -m benchmarks.bench_generation --model microsoft/Phi-3-mini-4k-instruct \\
+        --lengths system,512,2048 --max-new-tokens 128 --baseline gen.json --max-regression 10
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+import transformers
+from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+
+import metrics
+import tracing
+from benchmarks.tiny_model import SAMPLE_LOG, tiny_causal_lm, train_tokenizer
+from engine import Phi3Chatbot
+from log_analyzer import LogAnalyzer, build_analysis_prompt
+
+DTYPES = {'float32': torch.float32, 'bfloat16': torch.bfloat16, 'float16': torch.float16}
+QUANTIZATIONS = ('none', '4bit', '8bit')
+# generate_response truncates prompts to this many tokens
+MAX_PROMPT_TOKENS = 2048
+# (metric, True if higher is better) compared against a baseline
+COMPARED = (('prefill_ms', False), ('ttft_ms', False), ('decode_tokens_per_second', True),
+            ('peak_memory_bytes', False))
+
+
+class PeakMemory:
+    """Peak CUDA allocations, or on CPU the highest RSS sampled every few milliseconds"""
+
+    def __init__(self, device, interval=0.005):
+        self.device = device
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.device == 'cuda':
+            torch.cuda.synchronize()
+            torch.cuda.reset_peak_memory_stats()
+        else:
+            self.peak = metrics.process_rss_bytes()
+            self._thread = threading.Thread(target=self._sample, name='bench-rss', daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.device == 'cuda':
+            torch.cuda.synchronize()
+            self.peak = torch.cuda.max_memory_allocated()
+        else:
+            self._stop.set()
+            self._thread.join()
+        return False
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = metrics.process_rss_bytes()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+
+def make_prompt(chatbot, length, rng):
+    """A chat-formatted prompt of about ``length`` tokens, or the system prompt alone for 'system'.
+
+    Longer prompts are a log analysis prompt followed by an excerpt of the
+    log, cut so the whole prompt has at most ``length`` tokens. Lengths too
+    short for the analysis prompt get the excerpt alone.
+    """
+    if length == 'system':
+        return chatbot.format_prompt('', [])
+    sample = SAMPLE_LOG.splitlines()
+    log = '\n'.join(f'{rng.choice(sample)} request={rng.randrange(10 ** 6)}' for _ in range(length // 4))
+    analysis = build_analysis_prompt(LogAnalyzer.extract_key_info(log), 'bench.log') + '\n\nLog excerpt:\n'
+    if count_tokens(chatbot, chatbot.format_prompt(analysis, [])) >= length:
+        analysis = 'Log excerpt:\n'
+    excerpt_ids = chatbot.tokenizer(log, add_special_tokens=False)['input_ids']
+    budget = length - count_tokens(chatbot, chatbot.format_prompt(analysis, []))
+    while True:
+        excerpt = chatbot.tokenizer.decode(excerpt_ids[:max(0, budget)])
+        prompt = chatbot.format_prompt(analysis + excerpt, [])
+        excess = count_tokens(chatbot, prompt) - length
+        if excess <= 0 or budget <= 0:
+            return prompt
+        budget -= excess
+
+
+def count_tokens(chatbot, text):
+    return len(chatbot.tokenizer(text)['input_ids'])
+
+
+def measure(chatbot, prompt, seed):
+    """One generate_response call: returns its timings, token counts and peak memory"""
+    torch.manual_seed(seed)
+    with PeakMemory(chatbot.device) as memory, tracing.traced('bench') as trace:
+        chatbot.generate_response(prompt)
+    spans = {span['name']: span for span in trace.to_dict()['spans']}
+    prefill, decode = spans['prefill'], spans['decode']
+    new_tokens = decode['attrs']['new_tokens']
+    decode_seconds = decode['duration_ms'] / 1000
+    return {
+        'prompt_tokens': prefill['attrs']['prompt_tokens'],
+        'cached_tokens': prefill['attrs']['cached_tokens'],
+        'generated_tokens': new_tokens,
+        'prefill_ms': prefill['duration_ms'],
+        # From the generate_response call: tokenization, prefix lookup and prefill
+        'ttft_ms': round(prefill['start_ms'] + prefill['duration_ms'], 3),
+        'decode_tokens_per_second': (new_tokens - 1) / decode_seconds if new_tokens > 1 and decode_seconds else None,
+        'peak_memory_bytes': memory.peak,
+    }
+
+
+def summarize_runs(runs):
+    """Median of each measurement over ``runs``"""
+    summary = {'runs': len(runs)}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = round(statistics.median(values), 3) if values else None
+    for key in ('prompt_tokens', 'cached_tokens', 'generated_tokens', 'peak_memory_bytes'):
+        if summary[key] is not None:
+            summary[key] = int(summary[key])
+    return summary
+
+
+def load_model(source, dtype, quantization, attention, device):
+    """Load ``source`` (a local checkpoint directory or cached model name) with these settings"""
+    kwargs = {'torch_dtype': DTYPES[dtype], 'attn_implementation': attention,
+              'local_files_only': True, 'trust_remote_code': True}
+    if quantization != 'none':
+        if device != 'cuda':
+            raise RuntimeError(f'{quantization} quantization needs a CUDA device')
+        kwargs['quantization_config'] = BitsAndBytesConfig(
+            load_in_4bit=quantization == '4bit', load_in_8bit=quantization == '8bit',
+            bnb_4bit_quant_type='nf4', bnb_4bit_compute_dtype=DTYPES[dtype], bnb_4bit_use_double_quant=True)
+        kwargs['device_map'] = 'auto'
+    model = AutoModelForCausalLM.from_pretrained(source, **kwargs)
+    if quantization == 'none':
+        model = model.to(device)
+    return model.eval()
+
+
+def run_benchmark(model='tiny', lengths=('system', 512, 1024, 2048), max_new_tokens=(64, 256),
+                  dtypes=('float32',), quantizations=('none',), attentions=('eager', 'sdpa'),
+                  repeat=3, warmup=1, device=None, prefix_cache=False, seed=0):
+    """Run the sweep and return the report dict"""
+    device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+    workdir = None
+    if model == 'tiny':
+        # Saved once so every setting is loaded the same way as a real checkpoint
+        workdir = tempfile.mkdtemp(prefix='bench_generation_')
+        tokenizer = train_tokenizer()
+        tiny_causal_lm(tokenizer, seed=seed).save_pretrained(workdir)
+        source = workdir
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(model, local_files_only=True, trust_remote_code=True)
+        source = model
+
+    cases = []
+    try:
+        for dtype in dtypes:
+            for quantization in quantizations:
+                for attention in attentions:
+                    settings = {'dtype': dtype, 'quantization': quantization, 'attention': attention}
+                    try:
+                        loaded = load_model(source, dtype, quantization, attention, device)
+                    except Exception as e:
+                        cases.extend({'length': length, 'max_new_tokens': limit, **settings,
+                                      'skipped': f'{type(e).__name__}: {str(e)[:200]}'}
+                                     for length in lengths for limit in max_new_tokens)
+                        continue
+                    chatbot = Phi3Chatbot(model=loaded, tokenizer=tokenizer)
+                    if not prefix_cache:
+                        chatbot.prefix_cache = None
+                    for length in lengths:
+                        prompt = make_prompt(chatbot, length, random.Random(seed))
+                        for limit in max_new_tokens:
+                            chatbot.max_new_tokens = limit
+                            for run in range(warmup):
+                                measure(chatbot, prompt, seed + run)
+                            runs = [measure(chatbot, prompt, seed + run) for run in range(repeat)]
+                            cases.append({'length': length, 'max_new_tokens': limit, **settings,
+                                          **summarize_runs(runs)})
+                    del chatbot, loaded
+                    if device == 'cuda':
+                        torch.cuda.empty_cache()
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'model': model,
+        'device': torch.cuda.get_device_name(0) if device == 'cuda' else platform.processor() or 'cpu',
+        'threads': torch.get_num_threads(),
+        'torch': torch.__version__,
+        'transformers': transformers.__version__,
+        'repeat': repeat,
+        'prefix_cache': prefix_cache,
+        'cases': cases,
+    }
+
+
+def case_key(case):
+    return (str(case['length']), case['max_new_tokens'], case['dtype'], case['quantization'], case['attention'])
+
+
+def compare(report, baseline, max_regression=None):
+    """Per-case changes against ``baseline``; ``max_regression`` (percent) flags slowdowns"""
+    previous = {case_key(case): case for case in baseline['cases'] if 'skipped' not in case}
+    changes, regressions = [], []
+    for case in report['cases']:
+        before = previous.get(case_key(case))
+        if before is None or 'skipped' in case:
+            continue
+        row = {'case': case_key(case)}
+        for name, higher_is_better in COMPARED:
+            old, new = before.get(name), case.get(name)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            row[name] = {'baseline': old, 'current': new, 'change_pct': round(change, 1)}
+            worse = -change if higher_is_better else change
+            if max_regression is not None and worse > max_regression:
+                regressions.append(f"{'/'.join(map(str, row['case']))}: {name} {change:+.1f}%")
+        changes.append(row)
+    return {
+        'baseline_model': baseline.get('model'),
+        'baseline_device': baseline.get('device'),
+        'cases': changes,
+        'regressions': regressions,
+    }
+
+
+def print_report(report):
+    print(f"{report['model']} on {report['device']} ({report['threads']} threads), "
+          f"torch {report['torch']}, transformers {report['transformers']}")
+    print(f"{'prompt':>7} {'new':>5} {'dtype':>9} {'quant':>5} {'attention':>10} {'tokens':>7} "
+          f"{'prefill ms':>11} {'ttft ms':>9} {'decode tok/s':>13} {'peak MB':>9}")
+    for case in report['cases']:
+        head = (f"{case['length']:>7} {case['max_new_tokens']:>5} {case['dtype']:>9} {case['quantization']:>5} "
+                f"{case['attention']:>10}")
+        if 'skipped' in case:
+            print(f"{head} skipped: {case['skipped']}")
+            continue
+        peak = case['peak_memory_bytes'] / (1024 * 1024) if case['peak_memory_bytes'] else 0
+        decode = case['decode_tokens_per_second'] or 0
+        print(f"{head} {case['prompt_tokens']:>7} {case['prefill_ms']:>11.1f} {case['ttft_ms']:>9.1f} "
+              f"{decode:>13.1f} {peak:>9.1f}")
+    comparison = report.get('comparison')
+    if comparison:
+        print(f"\nAgainst baseline ({comparison['baseline_model']} on {comparison['baseline_device']}):")
+        for row in comparison['cases']:
+            changes = ', '.join(f"{name} {row[name]['change_pct']:+.1f}%" for name, _ in COMPARED if name in row)
+            print(f"  {'/'.join(map(str, row['case']))}: {changes}")
+        for line in comparison['regressions']:
+            print(f"REGRESSION {line}")
+
+
+def parse_list(value, cast=str):
+    return tuple(cast(item) for item in value.split(',') if item)
+
+
+def parse_length(value):
+    return value if value == 'system' else min(int(value), MAX_PROMPT_TOKENS)
+
+
+def main():
+    gpu = torch.cuda.is_available()
+    parser = argparse.ArgumentParser(description='Benchmark generate_response across prompt lengths and settings.')
+    parser.add_argument('--model', default='tiny', help="'tiny' or a locally cached model name or path")
+    parser.add_argument('--lengths', default='system,512,1024,2048',
+                        help="Prompt lengths in tokens; 'system' is the system prompt alone")
+    parser.add_argument('--max-new-tokens', default='64,256')
+    parser.add_argument('--dtypes', default='float16' if gpu else 'float32,bfloat16',
+                        help=f"Comma-separated: {', '.join(DTYPES)}")
+    parser.add_argument('--quantization', default='none,4bit' if gpu else 'none',
+                        help=f"Comma-separated: {', '.join(QUANTIZATIONS)} (4bit and 8bit need CUDA)")
+    parser.add_argument('--attention', default='eager,sdpa', help='Attention implementations to compare')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed runs per case')
+    parser.add_argument('--device', choices=('cpu', 'cuda'))
+    parser.add_argument('--prefix-cache', action='store_true', help='Reuse the cached system prompt prefill')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write the report to this file')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    parser.add_argument('--max-regression', type=float,
+                        help='Exit with status 1 if a metric is this many percent worse than the baseline')
+    args = parser.parse_args()
+
+    dtypes = parse_list(args.dtypes)
+    quantizations = parse_list(args.quantization)
+    unknown = [value for value in dtypes if value not in DTYPES] + \
+              [value for value in quantizations if value not in QUANTIZATIONS]
+    if unknown:
+        parser.error(f"unknown dtype or quantization: {', '.join(unknown)}")
+
+    report = run_benchmark(args.model, parse_list(args.lengths, parse_length),
+                           parse_list(args.max_new_tokens, int), dtypes, quantizations,
+                           parse_list(args.attention), args.repeat, args.warmup, args.device,
+                           args.prefix_cache, args.seed)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'] = compare(report, json.load(f), args.max_regression)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if report.get('comparison', {}).get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
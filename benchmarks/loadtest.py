@@ -0,0 +1,359 @@
+"""Offline end-to-end load test for the web server.
+
+Starts the Flask app on an ephemeral local port with a stub model (or, via
+--model, a random-weight tiny model or a real local one), a fake BTS backend,
+and many simulated browser sessions that drive /chat, /upload + /analyze and
+/bts/bugs concurrently. Reports p50/p95/p99 latency, throughput and error
+rates per operation. Nothing leaves the machine and no GPU is needed.
+
+    python -m benchmarks.loadtest --sessions 20 --iterations 5 --token-latency 0.01
+    python -m benchmarks.loadtest --model tiny --sessions 4 --iterations 2
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from benchmarks.stub_model import StubChatbot
+
+SAMPLE_LOG = """2025-05-26 10:00:01 INFO Service starting
+2025-05-26 10:00:02 WARNING Config value missing, using default
+2025-05-26 10:00:03 ERROR Database connection failed: timeout after 30s
+Traceback (most recent call last):
+  File "/srv/app/db.py", line 42, in connect
+    raise ConnectionError("timeout")
+2025-05-26 10:00:04 FATAL Out of memory while allocating buffer
+"""
+
+
+def make_bugs(count):
+    """Synthetic BTS bug list"""
+    statuses = ['new', 'open', 'in-progress', 'resolved', 'closed']
+    priorities = ['low', 'medium', 'high', 'critical']
+    categories = ['Audio', 'Video', 'Network', 'Kernel', 'Storage']
+    return [{
+        'id': f'BUG-LOAD-{i}',
+        'title': f'Synthetic bug {i} in {categories[i % len(categories)]}',
+        'description': f'Crash number {i} when running the load test.\n' * 5,
+        'status': statuses[i % len(statuses)],
+        'priority': priorities[i % len(priorities)],
+        'category': categories[i % len(categories)],
+        'createdAt': '2025-05-26T10:00:00.000Z',
+        'tags': ['load-test'],
+    } for i in range(count)]
+
+
+class FakeBTS:
+    """Minimal stand-in for the BTS backend's GET /api/bugs endpoints.
+
+    With ``single_fetch=False`` it behaves like an older backend without
+    ``GET /api/bugs/<id>``. Request paths are recorded in ``requests``.
+    """
+
+    def __init__(self, bugs, latency=0.0, single_fetch=True):
+        self.bugs = bugs
+        self.latency = latency
+        self.single_fetch = single_fetch
+        self.requests = []
+        body = json.dumps(bugs).encode()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        by_id = {bug['id']: json.dumps(bug).encode() for bug in bugs}
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests.append(self.path)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if self.path == '/api/bugs' and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                if self.path == '/api/bugs':
+                    payload, status = body, 200
+                elif self.path.startswith('/api/bugs/') and not fake.single_fetch:
+                    payload, status = b'<pre>Cannot GET</pre>', 404
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'text/html')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                elif self.path.startswith('/api/bugs/') and self.path[len('/api/bugs/'):] in by_id:
+                    payload, status = by_id[self.path[len('/api/bugs/'):]], 200
+                else:
+                    payload, status = b'{"error": "Not found"}', 404
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                if payload is body:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/api'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class AppServer:
+    """Run the Flask app on an ephemeral port in a background thread"""
+
+    def __init__(self, flask_app):
+        # Per-request access logs would swamp the report
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Recorder:
+    """Thread-safe collection of (operation, latency, ok, status) samples"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+
+    def record(self, operation, latency, ok, status):
+        with self._lock:
+            self.samples[operation].append((latency, ok))
+            if not ok:
+                self.errors[operation][str(status)] += 1
+
+    def report(self, wall_time):
+        operations = {}
+        total = 0
+        for operation, samples in sorted(self.samples.items()):
+            latencies = [latency for latency, _ in samples]
+            failures = sum(1 for _, ok in samples if not ok)
+            total += len(samples)
+            operations[operation] = {
+                'requests': len(samples),
+                'errors': failures,
+                'error_rate': round(failures / len(samples), 4),
+                'error_statuses': dict(self.errors[operation]),
+                'throughput_rps': round(len(samples) / wall_time, 3) if wall_time else None,
+                'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+                'max_ms': round(max(latencies) * 1000, 2),
+            }
+        return {
+            'wall_time_s': round(wall_time, 3),
+            'total_requests': total,
+            'throughput_rps': round(total / wall_time, 3) if wall_time else None,
+            'operations': operations,
+        }
+
+
+def simulate_session(base_url, recorder, iterations, mix, rng, job_timeout):
+    """One browser-like session doing a random mix of operations"""
+    http = requests.Session()
+    http.get(f'{base_url}/')
+    operations = [name for name, weight in mix.items() for _ in range(weight)]
+
+    def timed(operation, fn):
+        start = time.perf_counter()
+        try:
+            ok, status = fn()
+        except requests.RequestException as e:
+            ok, status = False, type(e).__name__
+        recorder.record(operation, time.perf_counter() - start, ok, status)
+        return ok
+
+    def do_chat():
+        r = http.post(f'{base_url}/chat', json={'message': 'Why does my service crash on startup?'})
+        return r.status_code == 200, r.status_code
+
+    def do_bts():
+        r = http.get(f'{base_url}/bts/bugs')
+        return r.status_code == 200, r.status_code
+
+    def do_analyze():
+        files = {'file': ('loadtest.log', SAMPLE_LOG.encode(), 'text/plain')}
+        r = http.post(f'{base_url}/upload', files=files)
+        if r.status_code != 200:
+            return False, f'upload_{r.status_code}'
+        file_id = r.json()['file']['id']
+        r = http.post(f'{base_url}/analyze/{file_id}')
+        if r.status_code != 202:
+            return False, r.status_code
+        status_url = base_url + r.json()['status_url']
+        deadline = time.monotonic() + job_timeout
+        while time.monotonic() < deadline:
+            job = http.get(status_url).json()
+            if job['status'] == 'completed':
+                return True, 200
+            if job['status'] in ('failed', 'cancelled'):
+                return False, job['status']
+            time.sleep(0.05)
+        return False, 'job_timeout'
+
+    actions = {'chat': do_chat, 'bts': do_bts, 'analyze': do_analyze}
+    for _ in range(iterations):
+        operation = rng.choice(operations)
+        timed(operation, actions[operation])
+
+
+def run_load_test(sessions=10, iterations=5, mix=None, token_latency=0.01, response_tokens=50,
+                  prefill_latency=0.05, bts_bugs=500, bts_latency=0.0, model=None, seed=0,
+                  job_timeout=300):
+    """Run the load test in-process and return the report dict"""
+    mix = mix or {'chat': 3, 'analyze': 1, 'bts': 2}
+    if model == 'tiny':
+        # Real generation (tokenizer, prefix cache, streaming) at toy-model cost
+        from benchmarks.tiny_model import tiny_causal_lm, train_tokenizer
+        tokenizer = train_tokenizer()
+        chatbot = app_module.Phi3Chatbot(model=tiny_causal_lm(tokenizer, seed=seed), tokenizer=tokenizer)
+        chatbot.max_new_tokens = response_tokens  # Random weights never stop on their own
+    elif model:
+        chatbot = app_module.Phi3Chatbot(model_name=model)
+    else:
+        chatbot = StubChatbot(token_latency=token_latency, response_tokens=response_tokens,
+                              prefill_latency=prefill_latency)
+
+    upload_dir = tempfile.mkdtemp(prefix='loadtest_uploads_')
+    saved = {key: app_module.app.config.get(key) for key in ('UPLOAD_FOLDER', 'BTS_API_URL')}
+    saved_chatbot = app_module.chatbot
+    saved_bts_client = app_module.bts_client
+    saved_uploads = (app_module.upload_registry, app_module.chunked_uploads, app_module.retention)
+    bts = FakeBTS(make_bugs(bts_bugs), latency=bts_latency).start()
+    app_module.chatbot = chatbot
+    (app_module.upload_registry, app_module.chunked_uploads,
+     app_module.retention) = app_module.create_upload_services(upload_dir)
+    app_module.app.config['UPLOAD_FOLDER'] = upload_dir
+    app_module.app.config['BTS_API_URL'] = bts.url
+    app_module.bts_client = app_module.create_bts_client(bts.url)
+    server = AppServer(app_module.app).start()
+
+    recorder = Recorder()
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            futures = [pool.submit(simulate_session, server.url, recorder, iterations, mix,
+                                   random.Random(seed + i), job_timeout)
+                       for i in range(sessions)]
+            for future in futures:
+                future.result()
+        wall_time = time.perf_counter() - started
+    finally:
+        server.stop()
+        bts.stop()
+        app_module.chatbot = saved_chatbot
+        app_module.bts_client = saved_bts_client
+        app_module.upload_registry, app_module.chunked_uploads, app_module.retention = saved_uploads
+        app_module.app.config.update(saved)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    report = recorder.report(wall_time)
+    report['config'] = {
+        'sessions': sessions,
+        'iterations': iterations,
+        'mix': mix,
+        'model': model or 'stub',
+        'token_latency': token_latency,
+        'response_tokens': response_tokens,
+        'prefill_latency': prefill_latency,
+        'bts_bugs': bts_bugs,
+        'bts_latency': bts_latency,
+    }
+    return report
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('chat', 'analyze', 'bts'):
+            raise argparse.ArgumentTypeError(f'Unknown operation: {name}')
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def print_report(report):
+    print(f"Requests: {report['total_requests']} in {report['wall_time_s']}s "
+          f"({report['throughput_rps']} req/s)")
+    print(f"{'operation':<10} {'count':>6} {'err%':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in report['operations'].items():
+        print(f"{name:<10} {stats['requests']:>6} {stats['error_rate'] * 100:>6.1f} {stats['throughput_rps']:>8} "
+              f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+        if stats['error_statuses']:
+            print(f"{'':<10} errors: {stats['error_statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load test for the chatbot web server')
+    parser.add_argument('--sessions', type=int, default=10, help='Concurrent simulated sessions')
+    parser.add_argument('--iterations', type=int, default=5, help='Operations per session')
+    parser.add_argument('--mix', type=parse_mix, default=None,
+                        help='Weighted operation mix, e.g. chat=3,analyze=1,bts=2')
+    parser.add_argument('--token-latency', type=float, default=0.01, help='Stub seconds per generated token')
+    parser.add_argument('--response-tokens', type=int, default=50, help='Stub tokens per response (generation limit with --model tiny)')
+    parser.add_argument('--prefill-latency', type=float, default=0.05, help='Stub seconds per prompt')
+    parser.add_argument('--bts-bugs', type=int, default=500, help='Bugs served by the fake BTS')
+    parser.add_argument('--bts-latency', type=float, default=0.0, help='Fake BTS response delay')
+    parser.add_argument('--model', default=None, help="'tiny' or a local model path to use instead of the stub")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', default=None, help='Write the report to this file')
+    args = parser.parse_args()
+
+    report = run_load_test(
+        sessions=args.sessions, iterations=args.iterations, mix=args.mix,
+        token_latency=args.token_latency, response_tokens=args.response_tokens,
+        prefill_latency=args.prefill_latency, bts_bugs=args.bts_bugs,
+        bts_latency=args.bts_latency, model=args.model, seed=args.seed
+    )
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import time
+from datetime import datetime
+
+from log_analyzer import LogAnalyzer, summarize_findings
+from session_store import SessionStore
+
+
+class StubChatbot:
+    """Drop-in stand-in for Phi3Chatbot that simulates generation latency.
+
+    Each generation sleeps ``prefill_latency`` plus ``token_latency`` for each
+    of ``response_tokens`` tokens, so the web tier and schedulers see a
+    realistic service time without a model or GPU. Log analysis still runs the
+    real LogAnalyzer scan.
+    """
+
+    def __init__(self, token_latency=0.01, response_tokens=100, prefill_latency=0.05):
+        self.device = 'stub'
+        self.token_latency = token_latency
+        self.response_tokens = response_tokens
+        self.prefill_latency = prefill_latency
+        self.max_new_tokens = 400
+        self.temperature = 0.3
+        self.conversations = SessionStore()
+        self.log_analyzer = LogAnalyzer()
+
+    def _generate(self, cancel_event=None):
+        time.sleep(self.prefill_latency)
+        produced = 0
+        for produced in range(1, self.response_tokens + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            time.sleep(self.token_latency)
+        return ' '.join(['token'] * produced) + '.'
+
+    def chat(self, user_input, session_id, cancel_event=None):
+        response = self._generate(cancel_event)
+        history = self.conversations.get(session_id, [])
+        history.append({'user': user_input, 'assistant': response, 'timestamp': datetime.now().isoformat()})
+        self.conversations[session_id] = history[-10:]
+        return response
+
+    def cached_analysis(self, findings, filename):
+        return None
+
+    def analyze_log_file(self, file_content, filename, progress=None, cancel_event=None, findings=None,
+                         check_cache=True):
+        if findings is None:
+            if progress:
+                progress('scanning', 0.2)
+            findings = self.log_analyzer.extract_key_info(file_content)
+        if progress:
+            progress('generating', 0.4)
+        response = self._generate(cancel_event)
+        return {
+            'raw_findings': summarize_findings(findings),
+            'analysis': response,
+            'filename': filename
+        }
+
+    def analyze_correlated(self, correlation, file_summaries=None, progress=None, cancel_event=None):
+        if progress:
+            progress('generating', 0.4)
+        response = self._generate(cancel_event)
+        return {
+            'raw_findings': summarize_findings(correlation['findings']),
+            'analysis': response,
+            'filenames': correlation['files']
+        }
+
+    def generate_batch(self, user_inputs):
+        # A batch costs one prefill plus one decode pass, like the real model
+        return [self._generate() for _ in user_inputs[:1]] * len(user_inputs)
+
+    def clear_session(self, session_id):
+        if session_id in self.conversations:
+            self.conversations[session_id] = []
+
+    def get_session_history(self, session_id):
+        return self.conversations.get(session_id, [])
+
+    def get_session_summary(self, session_id):
+        return None
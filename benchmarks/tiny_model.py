@@ -0,0 +1,67 @@
+"""Small offline tokenizers and models for benchmarks and tests.
+
+Nothing is downloaded: the tokenizer is a byte-level BPE trained in about a
+second on sample log text, with the Phi-3 chat tags as special tokens, so
+byte fallback, multi-byte characters and tag handling all behave like the
+real thing. The model is a randomly initialized, scaled-down Phi-3 (a
+Llama, which Phi-3 is derived from, on transformers releases without Phi-3).
+"""
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import AutoModelForCausalLM, PreTrainedTokenizerFast
+
+try:
+    from transformers import Phi3Config as TinyConfig
+except ImportError:  # transformers < 4.40
+    from transformers import LlamaConfig as TinyConfig
+
+CHAT_TAGS = ['<|system|>', '<|end|>', '<|user|>', '<|assistant|>']
+EOS_TOKEN = '<|endoftext|>'
+
+SAMPLE_LOG = """2025-05-26 10:00:01 INFO Service starting
+2025-05-26 10:00:02 WARNING Config value missing, using default
+2025-05-26 10:00:03 ERROR Database connection failed: timeout after 30s
+Traceback (most recent call last):
+  File "/srv/app/db.py", line 42, in connect
+    raise ConnectionError("timeout")
+ConnectionError: timeout
+2025-05-26 10:00:04 CRITICAL Worker 3 crashed: Segmentation fault (core dumped)
+2025-05-26 10:00:05 ERROR Out of memory: failed to allocate 4096 bytes
+"""
+
+SAMPLE_ANSWER = """The main issue is a database connection timeout after 30s, followed by
+repeated worker crashes. The likely root cause is connection pool exhaustion.
+1. Check the pool size in db.py and the connection limit on the server.
+2. Run `netstat -an | grep 5432` to count open connections.
+3. Retry with exponential backoff instead of failing the request.
+Café → naïve ✓ déjà vu — résumé: 日本語のログ, emoji 🚀 are handled too.
+"""
+
+
+def train_tokenizer(corpus=None, vocab_size=2000):
+    """Byte-level BPE tokenizer trained on ``corpus`` (lines of text)"""
+    corpus = corpus or (SAMPLE_LOG + SAMPLE_ANSWER).splitlines() * 20
+    backend = Tokenizer(models.BPE())
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    backend.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=vocab_size, special_tokens=[EOS_TOKEN] + CHAT_TAGS,
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet(), show_progress=False)
+    backend.train_from_iterator(corpus, trainer)
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, eos_token=EOS_TOKEN,
+                                        additional_special_tokens=CHAT_TAGS,
+                                        clean_up_tokenization_spaces=False)
+    tokenizer.model_input_names = ['input_ids', 'attention_mask']
+    return tokenizer
+
+
+def tiny_causal_lm(tokenizer, hidden_size=256, layers=4, heads=8, max_positions=4096,
+                   attn_implementation='eager', dtype=torch.float32, seed=0):
+    """Random-weight Phi-3-style model for ``tokenizer``, with Phi-3-mini's
+    proportions (MLP 8/3 of the hidden size, no grouped KV heads) and context"""
+    torch.manual_seed(seed)
+    config = TinyConfig(vocab_size=len(tokenizer), hidden_size=hidden_size, intermediate_size=hidden_size * 8 // 3,
+                        num_hidden_layers=layers, num_attention_heads=heads, num_key_value_heads=heads,
+                        max_position_embeddings=max_positions, pad_token_id=tokenizer.eos_token_id,
+                        bos_token_id=tokenizer.eos_token_id, eos_token_id=tokenizer.eos_token_id)
+    model = AutoModelForCausalLM.from_config(config, attn_implementation=attn_implementation, torch_dtype=dtype)
+    return model.eval()
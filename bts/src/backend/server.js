@@ -45,6 +45,20 @@ app.get('/api/bugs', async (req, res) => {
   }
 });
 
+// Get a single bug
+app.get('/api/bugs/:id', async (req, res) => {
+  try {
+    const bugs = await readBugs();
+    const bug = bugs.find(bug => bug.id === req.params.id);
+    if (!bug) {
+      return res.status(404).json({ error: 'Bug not found' });
+    }
+    res.json(bug);
+  } catch (error) {
+    res.status(500).json({ error: 'Failed to read bug' });
+  }
+});
+
 // Create new bug
 app.post('/api/bugs', async (req, res) => {
   try {
@@ -0,0 +1,188 @@
+import hashlib
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from bug_index import BugIndex
+
+
+class BTSError(Exception):
+    """A failed BTS backend call; carries the HTTP status to return to our client"""
+
+    def __init__(self, message, status=500, reason='other'):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+class BTSClient:
+    """Pooled, caching client for the BTS backend API.
+
+    All calls share one keep-alive ``requests.Session``. The bug list is kept
+    in memory as a ``BugIndex`` and is considered fresh for ``ttl`` seconds;
+    after that it is revalidated with ``If-None-Match``, so an unchanged
+    database costs a 304 instead of the full payload. For a further
+    ``stale_ttl`` seconds the stale copy is still served while a background
+    thread revalidates it. Single bugs are served from the index, or fetched
+    directly with ``GET /bugs/<id>`` when the index is stale and the backend
+    supports it.
+    """
+
+    def __init__(self, base_url, timeout=10, ttl=30.0, stale_ttl=300.0, pool_size=10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.supports_single_fetch = None  # Unknown until the backend has been asked once
+        self._snapshot = None
+        self._etag = None
+        self._fetched_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._revalidating = False
+        self.listeners = []  # Called with each new BugIndex, e.g. to update derived indexes
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def fresh(self):
+        snapshot, age = self._cached()
+        return snapshot is not None and age < self.ttl
+
+    def index(self):
+        """The current BugIndex; stale copies are served while revalidating in the background"""
+        snapshot, age = self._cached()
+        if snapshot is not None and age < self.ttl:
+            self.hits += 1
+            return snapshot
+        if snapshot is not None and age < self.ttl + self.stale_ttl:
+            self.hits += 1
+            self._revalidate_in_background()
+            return snapshot
+        self.misses += 1
+        return self.refresh()
+
+    def list_bugs(self):
+        """All bugs, refreshed when the cached copy is older than ``ttl``"""
+        return self.index().bugs
+
+    def get_bug(self, bug_id):
+        """One bug by ID, or None if the backend does not have it"""
+        snapshot, age = self._cached()
+        fresh = snapshot is not None and age < self.ttl
+        if fresh:
+            bug = snapshot.by_id.get(bug_id)
+            if bug is not None:
+                self.hits += 1
+                return bug
+        self.misses += 1
+        if self.supports_single_fetch is not False:
+            found, bug = self._fetch_one(bug_id)
+            if found is not None:
+                return bug
+        # Backend has no single-bug route; fall back to the (conditional) list fetch
+        return self.refresh(force=not fresh).by_id.get(bug_id)
+
+    def refresh(self, force=False):
+        """Revalidate the cached list; concurrent callers share one request.
+        Returns the BugIndex as of the refresh."""
+        fetched_at = self._fetched_at
+        with self._refresh_lock:
+            if self._fetched_at != fetched_at and not force and self._snapshot is not None:
+                return self._snapshot  # Another thread refreshed while we waited
+            headers = {'If-None-Match': self._etag} if self._etag and self._snapshot is not None else {}
+            response = self._request('list', f'{self.base_url}/bugs', headers=headers)
+            if response.status_code == 304:
+                self._fetched_at = time.monotonic()
+                return self._snapshot
+            self._raise_for_status('list', response)
+            # Index once per change; queries then never touch the raw list
+            self._snapshot = BugIndex(response.json(), version=hashlib.sha1(response.content).hexdigest()[:16])
+            self._etag = response.headers.get('ETag')
+            self._fetched_at = time.monotonic()
+            for listener in self.listeners:
+                listener(self._snapshot)
+            return self._snapshot
+
+    def invalidate(self):
+        self._fetched_at = float('-inf')
+
+    def clear(self):
+        """Drop the cached bug list; the next call fetches it again in full"""
+        with self._refresh_lock:
+            self._snapshot = None
+            self._etag = None
+            self._fetched_at = 0.0
+
+    def stats(self):
+        snapshot, age = self._cached()
+        return {
+            'cached_bugs': len(snapshot) if snapshot is not None else 0,
+            'age': round(age, 1) if snapshot is not None else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'single_fetch': self.supports_single_fetch,
+        }
+
+    def _cached(self):
+        """The cached BugIndex (or None) and its age, read once so that a
+        concurrent ``clear()`` cannot swap it out between check and use"""
+        snapshot = self._snapshot
+        return snapshot, time.monotonic() - self._fetched_at
+
+    def _fetch_one(self, bug_id):
+        """Returns (found, bug); found is None when the backend lacks the route"""
+        response = self._request('detail', f'{self.base_url}/bugs/{quote(str(bug_id), safe="")}')
+        if response.status_code == 404:
+            # Our backend answers an unknown ID with a JSON error; a backend
+            # without the route answers with Express's HTML 404 page
+            if 'json' in response.headers.get('Content-Type', ''):
+                self.supports_single_fetch = True
+                return False, None
+            self.supports_single_fetch = False
+            return None, None
+        self._raise_for_status('detail', response)
+        self.supports_single_fetch = True
+        return True, response.json()
+
+    def _revalidate_in_background(self):
+        if self._revalidating:
+            return
+        self._revalidating = True
+
+        def run():
+            try:
+                self.refresh()
+            except BTSError:
+                pass  # Keep serving the stale copy; the next request retries
+            finally:
+                self._revalidating = False
+
+        threading.Thread(target=run, name='bts-revalidate', daemon=True).start()
+
+    def _request(self, endpoint, url, headers=None):
+        try:
+            with metrics.BTS_REQUEST_SECONDS.labels(endpoint).time():
+                return self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.ConnectionError:
+            metrics.BTS_ERRORS.labels(endpoint, 'connection').inc()
+            raise BTSError('Cannot connect to BTS backend. Make sure it is running on port 3001.', 503, 'connection')
+        except requests.exceptions.Timeout:
+            metrics.BTS_ERRORS.labels(endpoint, 'timeout').inc()
+            raise BTSError('BTS backend request timed out.', 504, 'timeout')
+        except requests.exceptions.RequestException as e:
+            metrics.BTS_ERRORS.labels(endpoint, 'other').inc()
+            raise BTSError(f'Error connecting to BTS: {str(e)}')
+
+    def _raise_for_status(self, endpoint, response):
+        if response.status_code != 200:
+            reason = f'http_{response.status_code}'
+            metrics.BTS_ERRORS.labels(endpoint, reason).inc()
+            raise BTSError(f'BTS API returned status {response.status_code}', response.status_code, reason)
@@ -0,0 +1,93 @@
+import hashlib
+import json
+
+# Fields that can be filtered with an exact (case-insensitive) match
+FACETS = ('status', 'priority', 'category')
+
+PRIORITY_RANK = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+
+SORT_KEYS = {
+    'createdAt': lambda bug: bug.get('createdAt') or '',
+    'priority': lambda bug: PRIORITY_RANK.get(str(bug.get('priority', '')).lower(), len(PRIORITY_RANK)),
+    'status': lambda bug: str(bug.get('status') or '').lower(),
+    'severity': lambda bug: str(bug.get('severity') or ''),
+    'title': lambda bug: str(bug.get('title') or '').lower(),
+    'id': lambda bug: str(bug.get('id') or ''),
+}
+
+MAX_LIMIT = 500
+
+
+class BugIndex:
+    """Immutable, query-ready snapshot of the bug list.
+
+    Built once per refresh: facet values map to sets of positions, each bug's
+    searchable text is lower-cased up front, and sort orders are computed on
+    first use and kept. A query intersects facet sets, then substring-matches
+    the remaining candidates, then slices a precomputed order.
+    """
+
+    def __init__(self, bugs, version=None):
+        self.bugs = bugs
+        self.version = version or hashlib.sha1(json.dumps(bugs, sort_keys=True).encode()).hexdigest()[:16]
+        self.by_id = {}
+        self.facets = {facet: {} for facet in FACETS}
+        self._text = []
+        for position, bug in enumerate(bugs):
+            self.by_id[bug.get('id')] = bug
+            for facet in FACETS:
+                value = str(bug.get(facet) or '').lower()
+                self.facets[facet].setdefault(value, set()).add(position)
+            tags = ' '.join(str(tag) for tag in bug.get('tags') or ())
+            self._text.append(' '.join(
+                str(bug.get(field) or '') for field in ('id', 'title', 'description', 'assignedTo')
+            ).lower() + ' ' + tags.lower())
+        self._orders = {}
+
+    def __len__(self):
+        return len(self.bugs)
+
+    def facet_counts(self):
+        return {facet: {value: len(positions) for value, positions in values.items() if value}
+                for facet, values in self.facets.items()}
+
+    def query(self, filters=None, q=None, sort=None, page=1, limit=50):
+        """Returns (matching bugs on the page, total matches).
+
+        ``filters`` maps a facet to a list of accepted values; ``q`` must match
+        every whitespace-separated term as a substring; ``sort`` is a key from
+        SORT_KEYS, prefixed with ``-`` for descending.
+        """
+        candidates = None
+        for facet, values in (filters or {}).items():
+            if facet not in self.facets:
+                raise ValueError(f'Cannot filter on {facet}')
+            matched = set()
+            for value in values:
+                matched |= self.facets[facet].get(value.lower(), set())
+            candidates = matched if candidates is None else candidates & matched
+
+        terms = q.lower().split() if q else []
+        if terms:
+            pool = range(len(self.bugs)) if candidates is None else candidates
+            candidates = {p for p in pool if all(term in self._text[p] for term in terms)}
+
+        order = self._order(sort)
+        if candidates is not None:
+            order = [p for p in order if p in candidates]
+        total = len(order)
+        limit = max(1, min(int(limit), MAX_LIMIT))
+        start = (max(1, int(page)) - 1) * limit
+        return [self.bugs[p] for p in order[start:start + limit]], total
+
+    def _order(self, sort):
+        if not sort:
+            return range(len(self.bugs))
+        if sort not in self._orders:
+            key = sort.lstrip('-')
+            if key not in SORT_KEYS:
+                raise ValueError(f'Cannot sort by {key}')
+            keyfn = SORT_KEYS[key]
+            self._orders[sort] = sorted(range(len(self.bugs)), key=lambda p: keyfn(self.bugs[p]),
+                                        reverse=sort.startswith('-'))
+        return self._orders[sort]
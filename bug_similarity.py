@@ -0,0 +1,153 @@
+import hashlib
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9_]{2,}')
+
+STOPWORDS = frozenset('''
+a an and are as at be but by for from has have if in into is it its no not of on or so such
+that the their then there these they this to was were when which while will with after before
+during expected actual result steps reproduce environment additional information system version
+'''.split())
+
+# Terms in more than this fraction of bugs carry little signal and their
+# posting lists are the longest, so queries skip them
+MAX_DOC_FREQUENCY = 0.5
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS and not t.isdigit()]
+
+
+def bug_text(bug):
+    return f"{bug.get('title') or ''}\n{bug.get('title') or ''}\n{bug.get('description') or ''}"
+
+
+def findings_to_text(findings):
+    """Query text for LogAnalyzer findings: the lines most likely to name the failure"""
+    parts = [findings.get('summary', '')]
+    parts.extend(findings.get('critical_issues', [])[:5])
+    parts.extend(e['content'] if isinstance(e, dict) else str(e) for e in findings.get('errors', [])[:10])
+    parts.extend(trace.split('\n')[0] for trace in findings.get('stack_traces', [])[:3])
+    return '\n'.join(parts)
+
+
+class BugSimilarityIndex:
+    """Incrementally maintained TF-IDF inverted index over BTS bugs.
+
+    Each bug is stored as a length-normalized sublinear-TF vector in per-term
+    posting lists, so adding, changing or removing a bug only touches that
+    bug's terms. IDF is applied at query time from current document
+    frequencies. A query only walks the posting lists of its own terms and
+    skips very common ones, so its cost depends on how many bugs share the
+    query's rarer terms, not on the size of the tracker.
+    """
+
+    def __init__(self):
+        self._postings = {}  # term -> {bug_id: weight}
+        self._doc_terms = {}  # bug_id -> terms, for removal
+        self._doc_hashes = {}  # bug_id -> content hash, to skip unchanged bugs
+        self._meta = {}  # bug_id -> fields returned with results
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def sync(self, bugs):
+        """Bring the index in line with a full bug list; returns (added, updated, removed)"""
+        added = updated = 0
+        with self._lock:
+            seen = set()
+            for bug in bugs:
+                bug_id = bug.get('id')
+                if bug_id is None:
+                    continue
+                seen.add(bug_id)
+                existed = bug_id in self._doc_terms
+                if self.upsert(bug):
+                    if existed:
+                        updated += 1
+                    else:
+                        added += 1
+            stale = [bug_id for bug_id in self._doc_terms if bug_id not in seen]
+            for bug_id in stale:
+                self.remove(bug_id)
+        return added, updated, len(stale)
+
+    def upsert(self, bug):
+        """Index or re-index one bug; returns False if it was unchanged"""
+        bug_id = bug.get('id')
+        text = bug_text(bug)
+        digest = hashlib.sha1(text.encode('utf-8', 'ignore')).hexdigest()
+        with self._lock:
+            self._meta[bug_id] = {key: bug.get(key) for key in ('id', 'title', 'status', 'priority', 'category')}
+            if self._doc_hashes.get(bug_id) == digest:
+                return False
+            self.remove(bug_id, keep_meta=True)
+            counts = Counter(tokenize(text))
+            weights = {term: 1 + math.log(count) for term, count in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self._postings.setdefault(term, {})[bug_id] = weight / norm
+            self._doc_terms[bug_id] = list(weights)
+            self._doc_hashes[bug_id] = digest
+            return True
+
+    def remove(self, bug_id, keep_meta=False):
+        with self._lock:
+            for term in self._doc_terms.pop(bug_id, ()):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(bug_id, None)
+                    if not postings:
+                        del self._postings[term]
+            self._doc_hashes.pop(bug_id, None)
+            if not keep_meta:
+                self._meta.pop(bug_id, None)
+
+    def query(self, text, k=5, min_score=0.05, exclude=()):
+        """Top ``k`` bugs by cosine similarity to ``text``"""
+        counts = Counter(tokenize(text))
+        if not counts:
+            return []
+        with self._lock:
+            total = len(self._doc_terms)
+            if not total:
+                return []
+            query_weights = {}
+            for term, count in counts.items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                if total >= 20 and df / total > MAX_DOC_FREQUENCY:
+                    continue
+                idf = math.log((total + 1) / (df + 1)) + 1
+                query_weights[term] = (1 + math.log(count)) * idf
+            norm = math.sqrt(sum(w * w for w in query_weights.values())) or 1.0
+
+            scores = {}
+            for term, weight in query_weights.items():
+                # Doc vectors hold TF only; apply the term's IDF on this side too
+                idf = weight / (1 + math.log(counts[term]))
+                contribution = weight / norm * idf
+                for bug_id, doc_weight in self._postings[term].items():
+                    scores[bug_id] = scores.get(bug_id, 0.0) + contribution * doc_weight
+            best = heapq.nlargest(k + len(exclude), scores.items(), key=lambda item: item[1])
+            results = []
+            for bug_id, score in best:
+                if bug_id in exclude:
+                    continue
+                # Squash to [0, 1); raw scores grow with IDF
+                score = score / (1 + score)
+                if score < min_score or len(results) >= k:
+                    break
+                results.append(dict(self._meta[bug_id], score=round(score, 4)))
+            return results
+
+    def stats(self):
+        with self._lock:
+            return {'bugs': len(self._doc_terms), 'terms': len(self._postings)}
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from log_analyzer import LogScanner
+
+READ_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised for an invalid chunked upload request; carries an HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUpload:
+    """An upload in progress: a preallocated temp file filled chunk by chunk.
+
+    Chunks may arrive in any order and be retried. The leading run of
+    contiguous chunks is hashed and scanned as soon as it is complete, so the
+    digest and the analyzer findings are ready (or nearly) when the last chunk
+    lands.
+    """
+
+    def __init__(self, owner, filename, size, chunk_size, temp_path, sha256=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.temp_path = temp_path
+        self.expected_sha256 = sha256
+        self.chunk_count = max(1, -(-size // chunk_size))
+        self.received = set()
+        self.last_activity = time.monotonic()
+        self.lock = threading.Lock()
+        self.scanner = LogScanner()
+        self._writing = set()
+        self._hasher = hashlib.sha256()
+        self._hashed_chunks = 0
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    @property
+    def bytes_received(self):
+        return sum(self.chunk_length(index) for index in self.received)
+
+    def missing(self):
+        return [index for index in range(self.chunk_count) if index not in self.received]
+
+    def to_dict(self):
+        with self.lock:
+            received = sorted(self.received)
+            return {
+                'upload_id': self.id,
+                'filename': self.filename,
+                'size': self.size,
+                'chunk_size': self.chunk_size,
+                'chunk_count': self.chunk_count,
+                'received': received,
+                'missing': self.missing(),
+                'bytes_received': self.bytes_received,
+                'hashed_bytes': min(self.size, self._hashed_chunks * self.chunk_size),
+                'preview': self.scanner.snapshot(),
+            }
+
+    def _advance(self):
+        """Hash and scan newly contiguous leading chunks (caller holds the lock)"""
+        if self._hashed_chunks not in self.received:
+            return
+        with open(self.temp_path, 'rb') as f:
+            f.seek(self._hashed_chunks * self.chunk_size)
+            while self._hashed_chunks in self.received:
+                remaining = self.chunk_length(self._hashed_chunks)
+                while remaining > 0:
+                    data = f.read(min(READ_SIZE, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    self._hasher.update(data)
+                    self.scanner.feed_bytes(data)
+                self._hashed_chunks += 1
+
+
+class ChunkedUploadManager:
+    """Resumable uploads for files too large for a single request.
+
+    Protocol: ``init`` reserves a temp file of the announced size, each chunk
+    is written straight to its offset as the request body streams in, and
+    ``complete`` moves the finished file into the blob store and registers it.
+    A client that loses its connection asks for the upload's status and
+    resends only the missing chunks. Uploads idle for ``stale_after`` seconds
+    are discarded.
+    """
+
+    def __init__(self, blob_store, registry, max_bytes=20 * 1024 ** 3,
+                 chunk_size=8 * 1024 * 1024, max_chunk_size=8 * 1024 * 1024,
+                 stale_after=24 * 3600, reserve_space=None):
+        self.blob_store = blob_store
+        self.registry = registry
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.stale_after = stale_after
+        self.reserve_space = reserve_space  # Called as reserve_space(owner, size); may raise to refuse
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def init(self, owner, filename, size, chunk_size=None, sha256=None):
+        self.prune()
+        try:
+            size = int(size)
+            chunk_size = int(chunk_size or self.chunk_size)
+        except (TypeError, ValueError):
+            raise UploadError('size and chunk_size must be integers')
+        if size <= 0:
+            raise UploadError('size must be positive')
+        if size > self.max_bytes:
+            raise UploadError(f'File exceeds the {self.max_bytes} byte limit', status=413)
+        if not 0 < chunk_size <= self.max_chunk_size:
+            raise UploadError(f'chunk_size must be between 1 and {self.max_chunk_size}')
+        if self.reserve_space is not None:
+            self.reserve_space(owner, size)
+
+        temp_path = self.blob_store.new_temp_path()
+        with open(temp_path, 'r+b') as f:
+            f.truncate(size)  # Sparse on most filesystems; reserves the offsets
+        upload = ChunkedUpload(owner, filename, size, chunk_size, temp_path,
+                               sha256=sha256.lower() if sha256 else None)
+        with self._lock:
+            self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, upload_id, owner=None):
+        upload = self._uploads.get(upload_id)
+        if upload is None or (owner is not None and upload.owner != owner):
+            raise UploadError('Upload not found', status=404)
+        return upload
+
+    def write_chunk(self, upload_id, index, stream, owner=None, sha256=None):
+        """Stream one chunk from ``stream`` to its offset in the temp file"""
+        upload = self.get(upload_id, owner)
+        if not 0 <= index < upload.chunk_count:
+            raise UploadError(f'Chunk index must be between 0 and {upload.chunk_count - 1}')
+        expected = upload.chunk_length(index)
+        with upload.lock:
+            if index in upload.received:
+                # A retry of a chunk we already have, e.g. after a lost response
+                _drain(stream)
+                upload.last_activity = time.monotonic()
+                return upload
+            if index in upload._writing:
+                raise UploadError(f'Chunk {index} is already being written', status=409)
+            upload._writing.add(index)
+
+        try:
+            hasher = hashlib.sha256()
+            written = 0
+            with open(upload.temp_path, 'r+b') as f:
+                f.seek(index * upload.chunk_size)
+                while True:
+                    data = stream.read(READ_SIZE)
+                    if not data:
+                        break
+                    written += len(data)
+                    if written > expected:
+                        raise UploadError(f'Chunk {index} must be {expected} bytes')
+                    hasher.update(data)
+                    f.write(data)
+            if written != expected:
+                raise UploadError(f'Chunk {index} must be {expected} bytes, got {written}')
+            if sha256 and hasher.hexdigest() != sha256.lower():
+                raise UploadError(f'Chunk {index} failed its SHA-256 check')
+        finally:
+            with upload.lock:
+                upload._writing.discard(index)
+
+        with upload.lock:
+            upload.received.add(index)
+            upload.last_activity = time.monotonic()
+            upload._advance()
+        return upload
+
+    def complete(self, upload_id, owner=None, **extra):
+        """Finish an upload; returns (record, deduplicated)"""
+        upload = self.get(upload_id, owner)
+        with upload.lock:
+            missing = upload.missing()
+            if missing or upload._writing:
+                raise UploadError(f'Upload is missing {len(missing)} chunk(s)', status=409)
+            upload._advance()
+            digest = upload._hasher.hexdigest()
+            if upload.expected_sha256 and digest != upload.expected_sha256:
+                self._discard(upload)
+                raise UploadError('Uploaded file failed its SHA-256 check', status=422)
+            findings = upload.scanner.finish()
+            with self._lock:
+                self._uploads.pop(upload.id, None)
+
+        return self.registry.add_file(upload.owner, upload.filename, upload.temp_path, digest, upload.size,
+                                      findings=findings, **extra)
+
+    def abort(self, upload_id, owner=None):
+        upload = self.get(upload_id, owner)
+        with upload.lock:
+            self._discard(upload)
+
+    def prune(self):
+        """Drop uploads with no activity for ``stale_after`` seconds"""
+        cutoff = time.monotonic() - self.stale_after
+        with self._lock:
+            stale = [u for u in self._uploads.values() if u.last_activity < cutoff and not u._writing]
+        for upload in stale:
+            with upload.lock:
+                self._discard(upload)
+        return len(stale)
+
+    def temp_paths(self):
+        with self._lock:
+            return {u.temp_path for u in self._uploads.values()}
+
+    def reserved_bytes(self, owner=None):
+        """Disk space promised to in-progress uploads"""
+        with self._lock:
+            return sum(u.size for u in self._uploads.values() if owner is None or u.owner == owner)
+
+    def stats(self):
+        with self._lock:
+            uploads = list(self._uploads.values())
+        return {
+            'active': len(uploads),
+            'reserved_bytes': sum(u.size for u in uploads),
+        }
+
+    def _discard(self, upload):
+        with self._lock:
+            self._uploads.pop(upload.id, None)
+        try:
+            os.remove(upload.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+def _drain(stream):
+    while stream.read(READ_SIZE):
+        pass
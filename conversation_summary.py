@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+# Characters of each message, and of all messages together, put in a summary prompt
+SUMMARY_MESSAGE_CHARS = 1500
+SUMMARY_PROMPT_CHARS = 6000
+
+SUMMARY_INSTRUCTIONS = """Summarize the conversation below so it can be continued without it.
+
+Keep the log files, errors, root causes and debugging steps discussed, what was
+tried and what is still open. Leave out greetings and repetition. Write at most
+150 words.
+
+"""
+
+
+def split_summary(history):
+    """(summary text or None, raw turns) of a conversation history.
+
+    A compacted history starts with a ``{'summary': ...}`` entry standing in
+    for the turns before it.
+    """
+    if history and 'summary' in history[0]:
+        return history[0]['summary'], history[1:]
+    return None, history
+
+
+def build_summary_prompt(summary, turns):
+    """Model prompt folding ``turns`` into the running ``summary``.
+
+    Messages are cut to SUMMARY_MESSAGE_CHARS, and the oldest turns are left
+    out if all of them would exceed SUMMARY_PROMPT_CHARS.
+    """
+    lines, budget = [], SUMMARY_PROMPT_CHARS
+    for turn in reversed(turns):
+        text = (f"User: {turn['user'][:SUMMARY_MESSAGE_CHARS]}\n"
+                f"Assistant: {turn['assistant'][:SUMMARY_MESSAGE_CHARS]}\n")
+        if lines and len(text) > budget:
+            break
+        lines.append(text)
+        budget -= len(text)
+    earlier = f"Summary of the conversation before this:\n{summary}\n\n" if summary else ''
+    return SUMMARY_INSTRUCTIONS + earlier + "Conversation:\n" + '\n'.join(reversed(lines))
+
+
+class ConversationSummarizer:
+    """Compacts long conversations in the background while the model is idle.
+
+    ``request(session_id)`` marks a conversation whose history has grown
+    past the threshold. Every ``interval`` seconds, if ``is_idle()`` reports
+    no requests running or waiting for the model, the oldest marked session
+    is passed to ``compact(session_id)``, which folds its older turns into a
+    running summary (see ``Phi3Chatbot.compact_session``). At most
+    ``max_pending`` sessions wait; beyond that the oldest request is dropped
+    and made again the next time that conversation grows.
+    """
+
+    def __init__(self, compact, is_idle, interval=2.0, max_pending=1000):
+        self.compact = compact
+        self.is_idle = is_idle
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = OrderedDict()  # session_id -> None, oldest request first
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.compacted = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def request(self, session_id):
+        with self._lock:
+            self._pending[session_id] = None
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def run_once(self):
+        """Compact one waiting conversation if the model is idle; returns True if one was compacted"""
+        if not self._pending or not self.is_idle():
+            return False
+        with self._lock:
+            if not self._pending:
+                return False
+            session_id, _ = self._pending.popitem(last=False)
+        started = time.perf_counter()
+        try:
+            compacted = self.compact(session_id)
+        except Exception as e:
+            self.failed += 1
+            metrics.CONVERSATION_COMPACTIONS.labels('failed').inc()
+            print(f"Error summarizing conversation {session_id}: {str(e)}")
+            return False
+        if compacted:
+            self.compacted += 1
+            metrics.CONVERSATION_COMPACTIONS.labels('compacted').inc()
+            metrics.CONVERSATION_SUMMARY_SECONDS.observe(time.perf_counter() - started)
+        else:
+            self.skipped += 1
+            metrics.CONVERSATION_COMPACTIONS.labels('skipped').inc()
+        return compacted
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, name='conversation-summarizer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'compacted': self.compacted,
+            'skipped': self.skipped,
+            'failed': self.failed,
+        }
+
+    def _run_loop(self):
+        while not self._stop.wait(self.interval):
+            # Work through the backlog while the model stays idle
+            while not self._stop.is_set() and self.run_once():
+                pass
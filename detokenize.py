@@ -0,0 +1,250 @@
+import queue
+import re
+
+from transformers.generation.streamers import BaseStreamer
+
+# Chat-format tags that bound the assistant's turn
+ASSISTANT_TAG = "<|assistant|>"
+END_TAGS = ("<|end|>", "<|user|>", "<|system|>")
+SENTENCE_ENDINGS = '.!?:;"\''
+# Where finish_response splits sentences when it drops an unfinished one
+_SENTENCE_END = re.compile(r'[.!?](?=\s)')
+
+
+class IncrementalDetokenizer:
+    """Turns generated token IDs into text as they arrive.
+
+    Each step decodes only a short window of recent tokens and emits the part
+    that is new, so the cost per token does not grow with the response (or
+    the prompt). Text ending in an incomplete multi-byte character is held
+    back until the next token completes it. The concatenated output equals
+    ``tokenizer.decode(all_ids)``.
+    """
+
+    def __init__(self, tokenizer, skip_special_tokens=False):
+        self.tokenizer = tokenizer
+        self.skip_special_tokens = skip_special_tokens
+        self.ids = []
+        self._prefix_offset = 0  # Window start: context so spacing decodes correctly
+        self._read_offset = 0  # Tokens before this have been emitted
+
+    def feed(self, token_ids):
+        """Add tokens; returns the newly completed text (possibly '')"""
+        self.ids.extend(token_ids)
+        prefix_text = self._decode(self.ids[self._prefix_offset:self._read_offset])
+        new_text = self._decode(self.ids[self._prefix_offset:])
+        if len(new_text) > len(prefix_text) and not new_text.endswith('\ufffd'):
+            self._prefix_offset = self._read_offset
+            self._read_offset = len(self.ids)
+            return new_text[len(prefix_text):]
+        return ''
+
+    def flush(self):
+        """Emit whatever is still held back, even an incomplete character"""
+        prefix_text = self._decode(self.ids[self._prefix_offset:self._read_offset])
+        new_text = self._decode(self.ids[self._prefix_offset:])
+        self._prefix_offset = self._read_offset = len(self.ids)
+        return new_text[len(prefix_text):]
+
+    def _decode(self, ids):
+        return self.tokenizer.decode(ids, skip_special_tokens=self.skip_special_tokens) if ids else ''
+
+
+class ResponseCleaner:
+    """Single-pass equivalent of ``Phi3Chatbot.clean_response`` for generated text.
+
+    Feed the generated text in pieces. Each piece is scanned once for chat
+    tags: ``<|assistant|>`` starts the answer over, and any other tag ends it
+    until the next ``<|assistant|>``. ``finish()`` then applies the
+    sentence-completion and line-filtering rules to the kept text only. The
+    result is identical to ``clean_response(prompt + text, prompt)``.
+    """
+
+    _TAGS = (ASSISTANT_TAG,) + END_TAGS
+    _TAG_PATTERN = re.compile('|'.join(re.escape(tag) for tag in _TAGS))
+
+    def __init__(self):
+        self._kept = []
+        self._cut = False
+        self._pending = ''  # Tail that may be the start of a tag
+        self.restarts = 0  # <|assistant|> tags seen; each one discards the kept text
+
+    def feed(self, text):
+        """Add generated text; returns the part newly accepted into the answer"""
+        text = self._pending + text
+        self._pending = ''
+        accepted = []
+        position = 0
+        for match in self._TAG_PATTERN.finditer(text):
+            if not self._cut:
+                accepted.append(text[position:match.start()])
+            if match.group() == ASSISTANT_TAG:
+                self._kept = []
+                accepted = []
+                self._cut = False
+                self.restarts += 1
+            else:
+                self._cut = True
+            position = match.end()
+        rest = text[position:]
+        hold = _partial_tag_length(rest)
+        if hold:
+            self._pending = rest[-hold:]
+            rest = rest[:-hold]
+        if not self._cut:
+            accepted.append(rest)
+        accepted = ''.join(accepted)
+        if accepted:
+            self._kept.append(accepted)
+        return accepted
+
+    def finish(self):
+        """The cleaned response"""
+        if self._pending and not self._cut:
+            self._kept.append(self._pending)
+        self._pending = ''
+        return finish_response(''.join(self._kept))
+
+
+def finish_response(response):
+    """Sentence completion and line filtering of ``clean_response``, applied to
+    the answer text once the chat tags have been handled"""
+    response = response.strip()
+
+    # Check if response seems truncated and try to complete it
+    if response:
+        last_char = response[-1]
+
+        # If it doesn't end with proper punctuation and seems cut off
+        if last_char not in SENTENCE_ENDINGS and len(response.split()) > 10:
+            # Check if it ends mid-word
+            if last_char.isalnum():
+                # Find the last complete sentence
+                sentences = re.split(r'(?<=[.!?])\s+', response)
+                if len(sentences) > 1:
+                    # Keep only complete sentences
+                    response = ' '.join(sentences[:-1])
+                    if not response[-1] in SENTENCE_ENDINGS:
+                        response += '.'
+            else:
+                # Just add a period if it's missing
+                response += '.'
+
+    # Remove any hashtags, @ mentions, or obvious role-playing elements
+    if '#' in response or '@' in response or '|' in response:
+        lines = response.split('\n')
+        cleaned_lines = [line for line in lines if not _dropped_line(line)]
+        response = '\n'.join(cleaned_lines).strip()
+
+    return response
+
+
+def clean_generated_text(text):
+    """Clean the decoded new tokens of one generation"""
+    cleaner = ResponseCleaner()
+    cleaner.feed(text)
+    return cleaner.finish()
+
+
+class CleaningStreamer(BaseStreamer):
+    """generate() streamer that detokenizes and cleans new tokens as they come.
+
+    Iterate over it (from another thread) for the answer text; ``response``
+    holds the fully cleaned text once generation has ended. Line filtering is
+    done as the text arrives: each line is held until its newline and dropped
+    if ``finish_response`` would drop it, and kept text is only passed on up
+    to the end of its last complete sentence, since sentence completion may
+    still cut what follows. Once generation ends the rest of ``response`` is
+    sent, so the pieces add up to ``response``.
+
+    Two cases cannot be undone once streamed: an ``<|assistant|>`` tag in the
+    output, which starts the answer over, and a cut-off answer whose complete
+    sentences are separated by line breaks, which sentence completion joins
+    with spaces. There the pieces differ from ``response`` and the rest is
+    not sent; ``response`` is always the text to keep.
+    """
+
+    def __init__(self, tokenizer, timeout=None):
+        self.detokenizer = IncrementalDetokenizer(tokenizer)
+        self.cleaner = ResponseCleaner()
+        self.response = None
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._skip_prompt = True
+        self._restarts = 0
+        self._line = ''  # Accepted text after the last newline
+        self._ready = ''  # Kept lines not yet sent
+        self._sent = []
+
+    def put(self, value):
+        if self._skip_prompt:
+            # generate() first passes the prompt, which is not part of the answer
+            self._skip_prompt = False
+            return
+        if value.dim() > 1:
+            value = value[0]
+        self._feed(self.detokenizer.feed(value.tolist()))
+
+    def end(self):
+        self._feed(self.detokenizer.flush())
+        self.response = self.cleaner.finish()
+        sent = ''.join(self._sent)
+        if self.response.startswith(sent) and len(self.response) > len(sent):
+            self._queue.put(self.response[len(sent):])
+        self._queue.put(None)
+
+    def _feed(self, text):
+        if not text:
+            return
+        accepted = self.cleaner.feed(text)
+        if self.cleaner.restarts != self._restarts:
+            # The answer started over; what was already sent cannot be taken back
+            self._restarts = self.cleaner.restarts
+            self._line = self._ready = ''
+        self._line += accepted
+        if '\n' not in self._line:
+            return
+        *lines, self._line = self._line.split('\n')
+        self._ready += ''.join(line + '\n' for line in lines if not _dropped_line(line))
+        end = _last_sentence_end(self._ready)
+        text = self._ready[:end]
+        if not self._sent:
+            text = text.lstrip()
+        if text:
+            self._ready = self._ready[end:]
+            self._sent.append(text)
+            self._queue.put(text)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        value = self._queue.get(timeout=self.timeout)
+        if value is None:
+            raise StopIteration()
+        return value
+
+
+def _dropped_line(line):
+    """True for the heading, mention and table lines ``finish_response`` removes"""
+    stripped = line.strip()
+    return stripped.startswith('#') or stripped.startswith('@') or '|' in line
+
+
+def _last_sentence_end(text):
+    """Index just past the last sentence-ending mark that is followed by whitespace"""
+    end = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end()
+    return end
+
+
+def _partial_tag_length(text):
+    """Length of the longest suffix of ``text`` that is a proper prefix of a tag"""
+    longest = 0
+    for tag in ResponseCleaner._TAGS:
+        for length in range(min(len(tag) - 1, len(text)), longest, -1):
+            if text.endswith(tag[:length]):
+                longest = length
+                break
+    return longest
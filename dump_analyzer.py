@@ -0,0 +1,495 @@
+import mmap
+import os
+import re
+import struct
+import time
+
+import numpy as np
+
+FORMAT_MINIDUMP = 'minidump'
+FORMAT_ELF_CORE = 'elf_core'
+FORMAT_BINARY = 'binary'
+DUMP_FORMATS = (FORMAT_MINIDUMP, FORMAT_ELF_CORE, FORMAT_BINARY)
+FORMAT_LABELS = {
+    FORMAT_MINIDUMP: 'Windows minidump',
+    FORMAT_ELF_CORE: 'ELF core dump',
+    FORMAT_BINARY: 'Binary file',
+}
+
+# Bytes at the head of a file looked at to tell a dump from text
+SNIFF_BYTES = 4096
+# Printable runs shorter than this are not counted as strings
+MIN_STRING_LENGTH = 8
+# Strings are extracted this much at a time, so memory use does not grow with the dump
+STRING_CHUNK_BYTES = 16 * 1024 * 1024
+MAX_STRINGS = 20
+MAX_STRING_CHARS = 200
+# Limits on what the summary lists
+MAX_MODULES = 20
+MAX_THREADS = 10
+
+# Strings worth showing to the model; matched against lower-cased text
+DUMP_KEYWORDS = re.compile(
+    rb'error|exception|fail|crash|fatal|abort|assert|panic|segmentation fault|'
+    rb'access violation|out of memory|terminate')
+
+# Minidump streams (MINIDUMP_STREAM_TYPE)
+MD_THREAD_LIST = 3
+MD_MODULE_LIST = 4
+MD_EXCEPTION = 6
+MD_SYSTEM_INFO = 7
+MD_MODULE_SIZE = 108
+MD_THREAD_SIZE = 48
+MD_ARCHITECTURES = {0: 'x86', 5: 'arm', 9: 'amd64', 12: 'arm64'}
+
+# Register offsets in a minidump CONTEXT record; the instruction pointer comes first
+MD_CONTEXTS = {
+    'amd64': ('<Q', {'rip': 0xF8, 'rsp': 0x98, 'rbp': 0xA0, 'rax': 0x78, 'rbx': 0x90,
+                     'rcx': 0x80, 'rdx': 0x88, 'rsi': 0xA8, 'rdi': 0xB0}),
+    'x86': ('<I', {'eip': 0xB8, 'esp': 0xC4, 'ebp': 0xB4, 'eax': 0xB0, 'ebx': 0xA4,
+                   'ecx': 0xAC, 'edx': 0xA8, 'esi': 0xA0, 'edi': 0x9C}),
+    'arm64': ('<Q', {'pc': 0x108, 'sp': 0x100, 'fp': 0xF0, 'lr': 0xF8}),
+}
+
+EXCEPTION_CODES = {
+    0xC0000005: 'EXCEPTION_ACCESS_VIOLATION',
+    0xC0000006: 'EXCEPTION_IN_PAGE_ERROR',
+    0xC000001D: 'EXCEPTION_ILLEGAL_INSTRUCTION',
+    0xC0000094: 'EXCEPTION_INT_DIVIDE_BY_ZERO',
+    0xC00000FD: 'EXCEPTION_STACK_OVERFLOW',
+    0xC0000374: 'STATUS_HEAP_CORRUPTION',
+    0xC0000409: 'STATUS_STACK_BUFFER_OVERRUN',
+    0xC0000420: 'STATUS_ASSERTION_FAILURE',
+    0x80000003: 'EXCEPTION_BREAKPOINT',
+    0xE06D7363: 'C++ exception',
+}
+ACCESS_TYPES = {0: 'reading', 1: 'writing', 8: 'executing'}
+
+# ELF core files
+ET_CORE = 4
+PT_LOAD = 1
+PT_NOTE = 4
+NT_PRSTATUS = 1
+NT_PRPSINFO = 3
+NT_SIGINFO = 0x53494749
+NT_FILE = 0x46494C45
+ELF_MACHINES = {3: 'i386', 40: 'arm', 62: 'x86_64', 183: 'aarch64'}
+
+# Where pr_reg starts in NT_PRSTATUS, the register word format and the
+# registers' indexes in it; the instruction pointer comes first
+ELF_REGISTERS = {
+    'x86_64': (112, 'Q', {'rip': 16, 'rsp': 19, 'rbp': 4, 'rax': 10, 'rbx': 5,
+                          'rcx': 11, 'rdx': 12, 'rsi': 13, 'rdi': 14}),
+    'aarch64': (112, 'Q', {'pc': 32, 'sp': 31, 'fp': 29, 'lr': 30}),
+    'i386': (72, 'I', {'eip': 12, 'esp': 15, 'ebp': 5, 'eax': 6, 'ebx': 0,
+                       'ecx': 1, 'edx': 2, 'esi': 3, 'edi': 4}),
+}
+
+SIGNALS = {4: 'SIGILL', 5: 'SIGTRAP', 6: 'SIGABRT', 7: 'SIGBUS', 8: 'SIGFPE', 9: 'SIGKILL',
+           11: 'SIGSEGV', 13: 'SIGPIPE', 15: 'SIGTERM', 24: 'SIGXCPU', 25: 'SIGXFSZ', 31: 'SIGSYS'}
+CRITICAL_EXCEPTIONS = {
+    'EXCEPTION_ACCESS_VIOLATION': 'Access violation',
+    'EXCEPTION_STACK_OVERFLOW': 'Stack overflow',
+    'STATUS_HEAP_CORRUPTION': 'Heap corruption',
+    'SIGSEGV': 'Segmentation fault',
+    'SIGBUS': 'Bus error',
+}
+
+
+def detect_dump_format(path):
+    """Dump format of a file from its header, or None for text"""
+    with open(path, 'rb') as f:
+        return _sniff(f.read(SNIFF_BYTES))
+
+
+def analyze_dump(path):
+    """Findings for a crash dump, in the shape LogScanner returns.
+
+    The file is memory-mapped: only the headers and streams that are parsed
+    and the pages being scanned for strings are read, so memory stays flat
+    for dumps of any size. Besides the usual keys, ``dump`` holds the parsed
+    structure and ``dump_summary`` the compact text given to the model.
+    """
+    started = time.perf_counter()
+    size = os.path.getsize(path)
+    dump = {'format': FORMAT_BINARY, 'size': size, 'problems': []}
+    strings, string_count = [], 0
+    if size:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            dump['format'] = _sniff(buf[:SNIFF_BYTES]) or FORMAT_BINARY
+            parse = {FORMAT_MINIDUMP: parse_minidump, FORMAT_ELF_CORE: parse_elf_core}.get(dump['format'])
+            if parse:
+                try:
+                    dump.update(parse(buf))
+                except (struct.error, ValueError, IndexError) as e:
+                    dump['problems'].append(f'Header could not be parsed: {e}')
+            strings, string_count = extract_strings(buf)
+    dump['string_count'] = string_count
+    dump['seconds'] = round(time.perf_counter() - started, 3)
+    return _findings(dump, strings)
+
+
+def parse_minidump(buf):
+    """Process, exception, threads and modules of a Windows minidump"""
+    _, _, stream_count, directory_rva = struct.unpack_from('<IIII', buf, 0)
+    (timestamp,) = struct.unpack_from('<I', buf, 20)
+    streams = {}
+    for i in range(stream_count):
+        stream_type, _, rva = struct.unpack_from('<III', buf, directory_rva + 12 * i)
+        streams.setdefault(stream_type, rva)
+
+    info = {'timestamp': _iso(timestamp), 'modules': [], 'threads': []}
+    problems = info['problems'] = []
+    arch = None
+    if MD_SYSTEM_INFO in streams:
+        arch_code, _, _, cpus, _, major, minor, build = struct.unpack_from('<HHHBBIII', buf, streams[MD_SYSTEM_INFO])
+        arch = MD_ARCHITECTURES.get(arch_code, f'0x{arch_code:x}')
+        info['system'] = {'arch': arch, 'processors': cpus, 'os_version': f'{major}.{minor}.{build}'}
+
+    if MD_MODULE_LIST in streams:
+        rva = streams[MD_MODULE_LIST]
+        (count,) = struct.unpack_from('<I', buf, rva)
+        for i in range(count):
+            base, size, _, _, name_rva = struct.unpack_from('<QIIII', buf, rva + 4 + MD_MODULE_SIZE * i)
+            info['modules'].append({'name': _minidump_string(buf, name_rva), 'base': base, 'size': size})
+
+    context = MD_CONTEXTS.get(arch)
+    if MD_THREAD_LIST in streams:
+        rva = streams[MD_THREAD_LIST]
+        (count,) = struct.unpack_from('<I', buf, rva)
+        info['thread_count'] = count
+        for i in range(min(count, MAX_THREADS)):
+            fields = struct.unpack_from('<IIIIQQIIII', buf, rva + 4 + MD_THREAD_SIZE * i)
+            thread = {'id': fields[0]}
+            registers = _context_registers(buf, fields[9], context, problems)
+            if registers:
+                thread['pc'] = next(iter(registers.values()))
+            info['threads'].append(thread)
+
+    if MD_EXCEPTION in streams:
+        rva = streams[MD_EXCEPTION]
+        thread_id, _, code, _, _, address, parameter_count, _ = struct.unpack_from('<IIIIQQII', buf, rva)
+        parameters = struct.unpack_from(f'<{min(parameter_count, 15)}Q', buf, rva + 40)
+        _, context_rva = struct.unpack_from('<II', buf, rva + 160)
+        name = EXCEPTION_CODES.get(code, 'Unknown exception')
+        exception = {'name': name, 'code': f'0x{code:08X}', 'thread_id': thread_id, 'address': address}
+        if code in (0xC0000005, 0xC0000006) and len(parameters) >= 2:
+            exception['detail'] = f"{ACCESS_TYPES.get(parameters[0], 'accessing')} address 0x{parameters[1]:x}"
+        exception['registers'] = _context_registers(buf, context_rva, context, problems)
+        info['exception'] = exception
+    return info
+
+
+def parse_elf_core(buf):
+    """Process, signal, threads and mapped files of an ELF core dump"""
+    is_64 = buf[4] == 2
+    endian = '<' if buf[5] == 1 else '>'
+    (machine_code,) = struct.unpack_from(endian + 'H', buf, 18)
+    machine = ELF_MACHINES.get(machine_code, f'machine {machine_code}')
+    if is_64:
+        (program_headers,) = struct.unpack_from(endian + 'Q', buf, 32)
+        entry_size, entry_count = struct.unpack_from(endian + 'HH', buf, 54)
+    else:
+        (program_headers,) = struct.unpack_from(endian + 'I', buf, 28)
+        entry_size, entry_count = struct.unpack_from(endian + 'HH', buf, 42)
+
+    info = {'system': {'arch': machine}, 'modules': [], 'threads': [], 'problems': []}
+    registers_layout = ELF_REGISTERS.get(machine)
+    mappings = []
+    segments = 0
+    for i in range(entry_count):
+        offset = program_headers + i * entry_size
+        if is_64:
+            segment_type, _, segment_offset, _, _, segment_size = struct.unpack_from(endian + 'IIQQQQ', buf, offset)
+        else:
+            segment_type, segment_offset, _, _, segment_size = struct.unpack_from(endian + 'IIIII', buf, offset)
+        if segment_type == PT_LOAD:
+            segments += 1
+        if segment_type != PT_NOTE:
+            continue
+        for name, note_type, start, size in _iter_notes(buf, segment_offset, segment_size, endian):
+            if name != b'CORE':
+                continue
+            if note_type == NT_PRSTATUS:
+                info['threads'].append(_prstatus(buf, start, size, is_64, endian, registers_layout))
+            elif note_type == NT_PRPSINFO:
+                name_at, args_at = (40, 56) if is_64 else (28, 44)
+                info['process'] = _c_string(buf[start + name_at:start + name_at + 16])
+                info['command_line'] = _c_string(buf[start + args_at:start + args_at + 80])
+            elif note_type == NT_SIGINFO:
+                signal_number, _, signal_code = struct.unpack_from(endian + 'iii', buf, start)
+                (fault_address,) = struct.unpack_from(endian + ('Q' if is_64 else 'I'), buf, start + (16 if is_64 else 12))
+                info['signal'] = {'number': signal_number, 'name': SIGNALS.get(signal_number, f'signal {signal_number}'),
+                                  'code': signal_code, 'address': fault_address}
+            elif note_type == NT_FILE:
+                mappings = _file_mappings(buf, start, size, is_64, endian)
+
+    info['segments'] = segments
+    info['thread_count'] = len(info['threads'])
+    info['threads'] = info['threads'][:MAX_THREADS]
+    # One module per mapped file, from its lowest to its highest mapped address
+    modules = {}
+    for start, end, name in mappings:
+        low, high = modules.get(name, (start, end))
+        modules[name] = (min(low, start), max(high, end))
+    info['modules'] = [{'name': name, 'base': low, 'size': high - low} for name, (low, high) in modules.items()]
+
+    if info['threads']:
+        crashed = info['threads'][0]  # The kernel writes the faulting thread first
+        signal = info.get('signal') or {'number': crashed.get('signal'),
+                                        'name': SIGNALS.get(crashed.get('signal'), f"signal {crashed.get('signal')}")}
+        exception = {'name': signal['name'], 'code': str(signal['number']), 'thread_id': crashed['id'],
+                     'address': crashed.get('pc'), 'registers': crashed.get('registers', {})}
+        if signal.get('address') and signal['name'] in ('SIGSEGV', 'SIGBUS', 'SIGILL', 'SIGFPE'):
+            exception['detail'] = f"fault address 0x{signal['address']:x}"
+        info['exception'] = exception
+    return info
+
+
+def extract_strings(buf, min_length=MIN_STRING_LENGTH, limit=MAX_STRINGS, chunk_bytes=STRING_CHUNK_BYTES):
+    """Count printable ASCII runs and collect the first ``limit`` that mention an error.
+
+    Runs of at least ``min_length`` bytes are found with vectorized
+    operations on each chunk. Only their bytes are gathered, lower-cased and
+    searched for keywords, and only runs with a hit are decoded. Returns
+    ([(offset, text)], run count).
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    size = len(data)
+    found = []
+    count = 0
+    start = 0
+    chunk = None
+    while start < size:
+        chunk = data[start:start + chunk_bytes]
+        printable = ((chunk >= 0x20) & (chunk < 0x7F)) | (chunk == 0x09)
+        length = len(chunk)
+        if start + length < size and printable[-1]:
+            # The last run may go on in the next chunk; leave it for the next one
+            tail = int(np.argmin(printable[::-1]))
+            if tail < length and not printable[length - 1 - tail]:
+                length -= tail
+                printable = printable[:length]
+        starts, ends = _long_runs(printable, min_length)
+        count += len(starts)
+        if len(found) < limit and len(starts):
+            found.extend(_keyword_runs(buf, chunk[:length], start, starts, ends, limit - len(found)))
+        start += length
+    del data, chunk  # Views into the mapping must go before it is closed
+    return found, count
+
+
+def _long_runs(printable, min_length):
+    """Start and end (exclusive) of the printable runs of at least ``min_length``"""
+    # full[i]: the ``width`` bytes from i on are all printable; the width
+    # doubles each step, the last step overlapping to reach min_length
+    full, width = printable, 1
+    while width < min_length:
+        step = min(width, min_length - width)
+        full = full[:len(full) - step] & full[step:]
+        width += step
+    first = np.zeros_like(printable)
+    first[:len(full)] = full
+    first[1:] &= ~printable[:-1]
+    last = np.zeros_like(printable)
+    last[min_length - 1:] = full
+    last[:-1] &= ~printable[1:]
+    return np.flatnonzero(first), np.flatnonzero(last) + 1
+
+
+def _keyword_runs(buf, chunk, offset, starts, ends, limit):
+    # Gather the runs, each followed by a separator so no keyword spans two
+    lengths = ends - starts + 1
+    compact_starts = np.cumsum(lengths) - lengths
+    positions = np.arange(int(lengths.sum())) + np.repeat(starts - compact_starts, lengths)
+    compact = chunk[np.minimum(positions, len(chunk) - 1)]
+    compact[compact_starts + lengths - 1] = 10
+    found = []
+    last = -1
+    for match in DUMP_KEYWORDS.finditer(compact.tobytes().lower()):
+        index = int(np.searchsorted(compact_starts, match.start(), side='right')) - 1
+        if index == last:
+            continue
+        last = index
+        run_start, run_end = int(starts[index]), int(ends[index])
+        text = bytes(buf[offset + run_start:offset + min(run_end, run_start + MAX_STRING_CHARS)])
+        found.append((offset + run_start, text.decode('ascii').strip()))
+        if len(found) >= limit:
+            break
+    return found
+
+
+def build_dump_summary(dump, strings):
+    """Compact text description of a parsed dump for the model prompt"""
+    modules = dump.get('modules', [])
+    system = dump.get('system', {})
+    lines = [f"Format: {FORMAT_LABELS[dump['format']]}"
+             + (f" ({', '.join(f'{k} {v}' for k, v in system.items())})" if system else '')
+             + f", {_size(dump['size'])}"]
+    if dump.get('process'):
+        lines.append(f"Process: {dump['process']}" + (f" ({dump['command_line']})" if dump.get('command_line') else ''))
+    if dump.get('timestamp'):
+        lines.append(f"Written: {dump['timestamp']}")
+    exception = dump.get('exception')
+    if exception:
+        text = f"Exception: {exception['name']} ({exception['code']})"
+        if exception.get('detail'):
+            text += f" {exception['detail']}"
+        if exception.get('address') is not None:
+            text += f" at {_locate(exception['address'], modules)}"
+        lines.append(text + f" in thread {exception['thread_id']}")
+        if exception.get('registers'):
+            lines.append('Registers: ' + ' '.join(f'{k}=0x{v:x}' for k, v in exception['registers'].items()))
+    if dump.get('threads'):
+        shown = ', '.join(f"{t['id']} at {_locate(t['pc'], modules)}" if 'pc' in t else str(t['id'])
+                          for t in dump['threads'])
+        lines.append(f"Threads ({dump.get('thread_count', len(dump['threads']))}): {shown}")
+    if modules:
+        names = [_basename(m['name']) for m in modules[:MAX_MODULES]]
+        more = f' and {len(modules) - MAX_MODULES} more' if len(modules) > MAX_MODULES else ''
+        lines.append(f"Modules ({len(modules)}): {', '.join(names)}{more}")
+    for problem in dump.get('problems', []):
+        lines.append(f"Note: {problem}")
+    if strings:
+        lines.append(f"Strings mentioning errors ({len(strings)} of {dump['string_count']} strings):")
+        lines.extend(f"- {text}" for _, text in strings)
+    return '\n'.join(lines)
+
+
+def _findings(dump, strings):
+    modules = dump.get('modules', [])
+    exception = dump.get('exception')
+    errors = []
+    critical_issues = []
+    stack_traces = []
+    if exception:
+        location = _locate(exception['address'], modules) if exception.get('address') is not None else 'unknown address'
+        errors.append({'offset': None, 'content': f"{exception['name']} at {location}"})
+        issue = CRITICAL_EXCEPTIONS.get(exception['name'])
+        critical_issues.append(f"{issue or exception['name']} at {location}")
+        trace = [f"Thread {exception['thread_id']} crashed at {location}"]
+        if exception.get('registers'):
+            trace.append(' '.join(f'{k}=0x{v:x}' for k, v in exception['registers'].items()))
+        stack_traces.append('\n'.join(trace)[:500])
+    errors.extend({'offset': offset, 'content': text[:200]} for offset, text in strings)
+
+    label = FORMAT_LABELS[dump['format']]
+    if exception:
+        summary = f"{label}: {exception['name']}"
+        if critical_issues:
+            summary += f" including {len(critical_issues)} critical issue(s)"
+    elif strings:
+        summary = f"{label}: found {len(strings)} string(s) mentioning errors"
+    else:
+        summary = f"{label}: no crash information found"
+    return {
+        'total_lines': 0,
+        'errors': errors[:20],
+        'warnings': [],
+        'stack_traces': stack_traces,
+        'timestamps': [dump['timestamp']] if dump.get('timestamp') else [],
+        'critical_issues': critical_issues,
+        'file_paths': [m['name'] for m in modules[:10]],
+        'summary': summary,
+        'format': dump['format'],
+        'dump': dump,
+        'dump_summary': build_dump_summary(dump, strings),
+    }
+
+
+def _sniff(head):
+    if head[:4] == b'MDMP':
+        return FORMAT_MINIDUMP
+    if head[:4] == b'\x7fELF' and len(head) >= 18:
+        endian = '<' if head[5] == 1 else '>'
+        if struct.unpack_from(endian + 'H', head, 16)[0] == ET_CORE:
+            return FORMAT_ELF_CORE
+    if b'\x00' in head:
+        return FORMAT_BINARY
+    return None
+
+
+def _context_registers(buf, rva, context, problems):
+    if context is None or not rva:
+        return {}
+    word, offsets = context
+    try:
+        return {name: struct.unpack_from(word, buf, rva + offset)[0] for name, offset in offsets.items()}
+    except struct.error:
+        problems.append('A thread context is truncated')
+        return {}
+
+
+def _prstatus(buf, start, size, is_64, endian, registers_layout):
+    (signal_number,) = struct.unpack_from(endian + 'h', buf, start + 12)
+    (pid,) = struct.unpack_from(endian + 'i', buf, start + (32 if is_64 else 24))
+    thread = {'id': pid, 'signal': signal_number}
+    if registers_layout:
+        offset, word, indexes = registers_layout
+        width = struct.calcsize(word)
+        if offset + (max(indexes.values()) + 1) * width <= size:
+            thread['registers'] = {name: struct.unpack_from(endian + word, buf, start + offset + index * width)[0]
+                                   for name, index in indexes.items()}
+            thread['pc'] = next(iter(thread['registers'].values()))
+    return thread
+
+
+def _iter_notes(buf, offset, size, endian):
+    end = offset + size
+    while offset + 12 <= end:
+        name_size, desc_size, note_type = struct.unpack_from(endian + 'III', buf, offset)
+        name_start = offset + 12
+        desc_start = name_start + _align4(name_size)
+        if desc_start + desc_size > end:
+            return
+        yield bytes(buf[name_start:name_start + name_size]).rstrip(b'\x00'), note_type, desc_start, desc_size
+        offset = desc_start + _align4(desc_size)
+
+
+def _file_mappings(buf, start, size, is_64, endian):
+    word = 'Q' if is_64 else 'I'
+    width = struct.calcsize(word)
+    count, _ = struct.unpack_from(endian + word * 2, buf, start)
+    table = start + 2 * width
+    names = bytes(buf[table + count * 3 * width:start + size]).split(b'\x00')
+    mappings = []
+    for i in range(min(count, len(names))):
+        low, high, _ = struct.unpack_from(endian + word * 3, buf, table + i * 3 * width)
+        mappings.append((low, high, names[i].decode('utf-8', errors='replace')))
+    return mappings
+
+
+def _minidump_string(buf, rva):
+    (length,) = struct.unpack_from('<I', buf, rva)
+    return bytes(buf[rva + 4:rva + 4 + min(length, 1024)]).decode('utf-16-le', errors='replace')
+
+
+def _locate(address, modules):
+    """``module+0xoffset`` for an address inside a module, else the bare address"""
+    for module in modules:
+        if module['base'] <= address < module['base'] + module['size']:
+            return f"{_basename(module['name'])}+0x{address - module['base']:x}"
+    return f'0x{address:x}'
+
+
+def _basename(name):
+    return name.replace('\\', '/').rsplit('/', 1)[-1]
+
+
+def _c_string(data):
+    return bytes(data).split(b'\x00', 1)[0].decode('utf-8', errors='replace').strip()
+
+
+def _align4(n):
+    return (n + 3) & ~3
+
+
+def _iso(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp)) if timestamp else None
+
+
+def _size(n):
+    for unit in ('bytes', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f'{n} {unit}' if unit == 'bytes' else f'{n:.1f} {unit}'
+        n /= 1024
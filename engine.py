@@ -0,0 +1,624 @@
+import os
+import sys
+import time
+import threading
+import warnings
+import logging
+from datetime import datetime
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig, StoppingCriteria, StoppingCriteriaList
+
+import metrics
+import tracing
+from conversation_summary import build_summary_prompt, split_summary
+from detokenize import CleaningStreamer, clean_generated_text
+from explanation_cache import explanation_signature
+from log_analyzer import ANALYSIS_INSTRUCTIONS, LogAnalyzer, build_analysis_prompt, summarize_findings
+from memory_governor import NORMAL
+from prefix_cache import PrefixCache
+from session_store import SessionStore
+from timeline import build_correlated_prompt
+
+# Suppress warnings
+warnings.filterwarnings("ignore")
+logging.getLogger("transformers").setLevel(logging.ERROR)
+
+# Suppress torch distributed warnings on Windows/MacOS
+os.environ["TORCH_DISTRIBUTED_DEBUG"] = "OFF"
+if sys.platform in ["win32", "darwin"]:
+    os.environ["RANK"] = "-1"
+    os.environ["WORLD_SIZE"] = "1"
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = "29500"
+
+# Returned by complete() when no generation produced any text
+NO_RESPONSE = "I apologize, but I had trouble generating a complete response. Please try asking your question again."
+
+SYSTEM_PROMPT = "You are a helpful assistant specializing in debugging and log analysis. Provide clear, complete answers. Always finish your thoughts and complete all sentences properly. Do not stop mid-sentence."
+
+class StopOnTokens(StoppingCriteria):
+    def __init__(self, stop_token_ids):
+        self.stop_token_ids = stop_token_ids
+
+    def __call__(self, input_ids, scores, **kwargs):
+        for stop_id in self.stop_token_ids:
+            if input_ids[0][-1] == stop_id:
+                return True
+        return False
+
+class StopOnEvent(StoppingCriteria):
+    """Stop generation as soon as the given threading.Event is set"""
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
+
+class FirstTokenTimer(StoppingCriteria):
+    """Never stops generation; records when the first new token was produced"""
+    def __init__(self):
+        self.first_token_at = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return False
+
+class Phi3Chatbot:
+    def __init__(self, model_name="microsoft/Phi-3-mini-4k-instruct", session_store=None, prefix_cache_dir=None,
+                 model=None, tokenizer=None):
+        """Initialize the Phi-3 chatbot with GPU support
+
+        Prefilled prompt prefixes are persisted in ``prefix_cache_dir`` (if
+        set) and reused by later runs. An already loaded ``model`` and
+        ``tokenizer`` (e.g. benchmark models) are used instead of loading
+        ``model_name``.
+        """
+        if model is not None:
+            self.device = model.device.type
+            self.model = model
+            self.tokenizer = tokenizer
+        else:
+            self._load(model_name)
+        
+        # Set up stopping criteria - only stop on specific end tokens
+        stop_tokens = ["<|end|>", "<|user|>"]
+        stop_token_ids = []
+        for token in stop_tokens:
+            if token in self.tokenizer.get_vocab():
+                stop_token_ids.append(self.tokenizer.convert_tokens_to_ids(token))
+        
+        self.stop_token_ids = stop_token_ids
+        self.stop_criteria = StoppingCriteriaList([StopOnTokens(stop_token_ids)])
+        
+        # Generation parameters - increased for better completeness
+        self.max_new_tokens = 400
+        self.temperature = 0.3
+        
+        # Optional MemoryGovernor; lowers generation limits and batch sizes under memory pressure
+        self.memory_governor = None
+        
+        # Optional ExplanationCache; analyses of already-seen failures are reused instead of generated
+        self.explanation_cache = None
+        
+        # Optional ConversationSummarizer. Once a conversation's recent turns exceed
+        # summary_trigger_tokens, all but the last summary_keep_turns are folded into a summary
+        self.summarizer = None
+        self.summary_trigger_tokens = 1536
+        self.summary_keep_turns = 1
+        self.summary_max_tokens = 200
+        
+        # Session storage for conversation histories (bounded, optionally persisted)
+        self.conversations = session_store if session_store is not None else SessionStore()
+        
+        # Log analyzer
+        self.log_analyzer = LogAnalyzer()
+        
+        # Prefill the shared prompt prefix once instead of on every request
+        self.prefix_cache = PrefixCache(self.model, self.tokenizer, prefix_cache_dir, model_id=model_name)
+        self.warm_prefix_cache()
+        
+        print("Model loaded successfully!\n")
+    
+    def _load(self, model_name):
+        """Load the tokenizer and model, 4-bit quantized on a GPU"""
+        print("Loading Phi-3 model... This may take a few minutes on first run.")
+        
+        # Check if CUDA is available
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        if self.device == "cpu":
+            print("WARNING: CUDA not available. Running on CPU. This will be slower.")
+        else:
+            print(f"Using GPU: {torch.cuda.get_device_name(0)}")
+            print(f"CUDA Version: {torch.version.cuda}")
+        
+        # Load tokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            model_name,
+            trust_remote_code=True
+        )
+        
+        # Configure model loading with explicit attention implementation
+        model_kwargs = {
+            "trust_remote_code": True,
+            "low_cpu_mem_usage": True,
+            "attn_implementation": "eager"
+        }
+        
+        if self.device == "cuda":
+            # Use 4-bit quantization for better memory efficiency
+            bnb_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_compute_dtype=torch.float16,
+                bnb_4bit_use_double_quant=True
+            )
+            
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                quantization_config=bnb_config,
+                device_map="auto",
+                torch_dtype=torch.float16,
+                **model_kwargs
+            )
+        else:
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                device_map="auto",
+                torch_dtype=torch.float32,
+                **model_kwargs
+            )
+        print("Note: Using eager attention implementation for compatibility.")
+    
+    def format_prompt(self, user_input, conversation_history):
+        """Format the prompt using Phi-3 instruction format
+
+        The summary of a compacted conversation goes in the system block,
+        after the fixed system prompt so the cached prefix still applies.
+        """
+        summary, turns = split_summary(conversation_history)
+        system = SYSTEM_PROMPT
+        if summary:
+            system += f"\n\nSummary of the earlier conversation:\n{summary}"
+        messages = [f"<|system|>\n{system}<|end|>\n"]
+        
+        # Add conversation history (last 3 turns)
+        for turn in turns[-3:]:
+            messages.append(f"<|user|>\n{turn['user']}<|end|>\n")
+            messages.append(f"<|assistant|>\n{turn['assistant']}<|end|>\n")
+        
+        messages.append(f"<|user|>\n{user_input}<|end|>\n<|assistant|>\n")
+        prompt = "".join(messages)
+        
+        return prompt
+    
+    def warm_prefix_cache(self):
+        """Load or prefill the KV state of the prompt prefix shared by requests"""
+        # The analysis prefix starts with the system block and first user tag,
+        # so chat prompts reuse the leading part of the same entry
+        prefix = f"<|system|>\n{SYSTEM_PROMPT}<|end|>\n<|user|>\n{ANALYSIS_INSTRUCTIONS}"
+        try:
+            started = time.perf_counter()
+            tokens = self.prefix_cache.register(prefix)
+            print(f"Prompt prefix cache ready: {tokens} tokens in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"Prompt prefix cache disabled: {str(e)}")
+            self.prefix_cache = None
+    
+    def generate_response(self, prompt, cancel_event=None, streamer=None, max_new_tokens=None, details=None):
+        """Generate response using the model with better completion handling
+
+        Returns the decoded new tokens only; the prompt is sliced off by token
+        count, never searched for in the text. A ``streamer`` (e.g.
+        CleaningStreamer) receives tokens as they are generated.
+        ``max_new_tokens`` overrides the configured generation limit. If a
+        ``details`` dict is given, ``details['hit_limit']`` tells whether
+        generation stopped on that limit rather than on its own.
+        """
+        first_token_timer = FirstTokenTimer()
+        criteria = list(self.stop_criteria) + [first_token_timer]
+        if cancel_event is not None:
+            criteria.append(StopOnEvent(cancel_event))
+        stopping_criteria = StoppingCriteriaList(criteria)
+        
+        with tracing.span('tokenize'):
+            inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=2048)
+            inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
+        prompt_length = inputs['input_ids'].shape[1]
+        
+        # Start from the cached KV state of the shared prefix; only the rest is prefilled
+        cached_tokens, past_key_values = 0, None
+        if self.prefix_cache is not None and not len(self.prefix_cache) and (
+                self.memory_governor is None or self.memory_governor.level == NORMAL):
+            self.warm_prefix_cache()  # Dropped by the memory governor; pressure is gone
+        if self.prefix_cache is not None:
+            cached_tokens, past_key_values = self.prefix_cache.lookup(inputs['input_ids'])
+        if past_key_values is not None:
+            inputs['past_key_values'] = past_key_values
+        
+        limit = max_new_tokens or self.generation_limit()
+        started = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    **inputs,
+                    max_new_tokens=limit,
+                    temperature=self.temperature,
+                    top_p=0.95,
+                    do_sample=True,
+                    stopping_criteria=stopping_criteria,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    eos_token_id=self.tokenizer.eos_token_id,
+                    min_new_tokens=50,
+                    streamer=streamer,
+                )
+        finished = time.perf_counter()
+        
+        # Record inference metrics
+        generated = outputs.shape[1] - prompt_length
+        metrics.GENERATION_SECONDS.observe(finished - started)
+        metrics.PROMPT_TOKENS.inc(prompt_length)
+        metrics.GENERATED_TOKENS.inc(generated)
+        if details is not None:
+            details['hit_limit'] = generated >= limit
+        if first_token_timer.first_token_at is not None:
+            metrics.TIME_TO_FIRST_TOKEN.observe(first_token_timer.first_token_at - started)
+            decode_time = finished - first_token_timer.first_token_at
+            if generated > 1 and decode_time > 0:
+                metrics.DECODE_TOKENS_PER_SECOND.observe((generated - 1) / decode_time)
+        
+        trace = tracing.current_trace()
+        if trace is not None:
+            first_token_at = first_token_timer.first_token_at or finished
+            trace.add_span('prefill', started, first_token_at, prompt_tokens=prompt_length,
+                           cached_tokens=cached_tokens)
+            trace.add_span('decode', first_token_at, finished, new_tokens=int(generated))
+        
+        with tracing.span('detokenize'):
+            response = self.tokenizer.decode(outputs[0][prompt_length:], skip_special_tokens=False)
+        return response
+    
+    def stream_response(self, prompt, cancel_event=None):
+        """Yield the cleaned response text piece by piece while it is generated.
+
+        New tokens are detokenized incrementally and cleaned in the same pass:
+        filtered lines are never yielded and an unfinished sentence is held
+        back until generation ends (see CleaningStreamer for the two cases
+        where the pieces can still differ). Generation runs on a helper
+        thread; returns (via StopIteration.value) the final cleaned response.
+        """
+        streamer = CleaningStreamer(self.tokenizer)
+        result = {}
+
+        def run():
+            try:
+                self.generate_response(prompt, cancel_event=cancel_event, streamer=streamer)
+            except Exception as e:
+                result['error'] = e
+                streamer.end()
+
+        thread = threading.Thread(target=run, name='generate-stream', daemon=True)
+        thread.start()
+        for text in streamer:
+            yield text
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return streamer.response
+    
+    def generation_limit(self):
+        """max_new_tokens, lowered by the memory governor under pressure"""
+        if self.memory_governor is None:
+            return self.max_new_tokens
+        return self.memory_governor.max_new_tokens(self.max_new_tokens)
+    
+    def generate_batch(self, user_inputs):
+        """Answer independent prompts (no history) with batched generate() calls
+
+        Normally all prompts go in one call; under memory pressure the memory
+        governor splits them into smaller batches.
+        """
+        size = len(user_inputs)
+        if self.memory_governor is not None:
+            size = self.memory_governor.batch_size(size)
+        responses = []
+        for start in range(0, len(user_inputs), max(1, size)):
+            responses.extend(self._generate_batch(user_inputs[start:start + size]))
+        return responses
+    
+    def _generate_batch(self, user_inputs):
+        prompts = [self.format_prompt(text, []) for text in user_inputs]
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        padding_side = self.tokenizer.padding_side
+        # Decoder-only models need left padding so every row ends at the prompt boundary
+        self.tokenizer.padding_side = 'left'
+        try:
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=2048)
+        finally:
+            self.tokenizer.padding_side = padding_side
+        inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
+        prompt_length = inputs['input_ids'].shape[1]
+        
+        started = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            with torch.no_grad():
+                # StopOnTokens only looks at the first row, so stop tokens act as
+                # per-row EOS instead; finished rows are padded until all are done
+                outputs = self.model.generate(
+                    **inputs,
+                    max_new_tokens=self.generation_limit(),
+                    temperature=self.temperature,
+                    top_p=0.95,
+                    do_sample=True,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    eos_token_id=[self.tokenizer.eos_token_id] + list(self.stop_token_ids),
+                    min_new_tokens=50,
+                )
+        metrics.GENERATION_SECONDS.observe(time.perf_counter() - started)
+        metrics.PROMPT_TOKENS.inc(int(inputs['attention_mask'].sum()))
+        metrics.GENERATED_TOKENS.inc((outputs.shape[1] - prompt_length) * len(prompts))
+        
+        responses = []
+        for row in outputs:
+            text = self.tokenizer.decode(row[prompt_length:], skip_special_tokens=False)
+            responses.append(clean_generated_text(text))
+        return responses
+    
+    def clean_response(self, response, prompt):
+        """Extract and clean the assistant's response from a decoded prompt + output"""
+        if prompt in response:
+            response = response.split(prompt)[-1]
+        return clean_generated_text(response)
+    
+    def cached_analysis(self, findings, filename):
+        """The analysis result for ``findings`` from the explanation cache, or None"""
+        if self.explanation_cache is None:
+            return None
+        signature = explanation_signature(findings)
+        explanation = self.explanation_cache.get(signature) if signature else None
+        if explanation is None:
+            return None
+        return {
+            'raw_findings': summarize_findings(findings),
+            'analysis': explanation,
+            'filename': filename,
+            'cached': True
+        }
+    
+    def analyze_log_file(self, file_content, filename, progress=None, cancel_event=None, findings=None,
+                         check_cache=True):
+        """Analyze a log file and generate insights
+
+        ``progress(stage, fraction)`` is called as the analysis moves between
+        stages; setting ``cancel_event`` stops generation early. Pass
+        ``findings`` from an earlier scan to skip scanning ``file_content``.
+        A failure already explained is answered from the explanation cache
+        (unless ``check_cache`` is false), and new explanations are added to it.
+        """
+        try:
+            # Extract key information from the log
+            if findings is None:
+                if progress:
+                    progress('scanning', 0.2)
+                with tracing.span('extract_key_info', chars=len(file_content)):
+                    findings = self.log_analyzer.extract_key_info(file_content)
+            
+            if check_cache:
+                cached = self.cached_analysis(findings, filename)
+                if cached is not None:
+                    return cached
+            
+            # Create a structured prompt for analysis
+            analysis_prompt = build_analysis_prompt(findings, filename)
+            
+            # Generate analysis using the model; each file is analyzed on its
+            # own, so the prompt starts with the cached analysis prefix
+            if progress:
+                progress('generating', 0.4)
+            generation = {}
+            response = self.complete(self.format_prompt(analysis_prompt, []), cancel_event=cancel_event,
+                                     details=generation)
+            
+            # Keep complete explanations for the next log failing the same way. An
+            # answer cut short by the token limit (or by a limit the memory governor
+            # lowered) is not cached, or every later hit would get the short version
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            shortened = generation.get('hit_limit', False) or self.generation_limit() < self.max_new_tokens
+            signature = explanation_signature(findings) if self.explanation_cache is not None else None
+            if signature and not cancelled and not shortened and response != NO_RESPONSE:
+                self.explanation_cache.put(signature, response)
+            
+            return {
+                'raw_findings': summarize_findings(findings),
+                'analysis': response,
+                'filename': filename,
+                'cached': False
+            }
+            
+        except Exception as e:
+            print(f"Error in analyze_log_file: {str(e)}")
+            return {
+                'raw_findings': {'summary': 'Error during analysis', 'error_count': 0},
+                'analysis': f"I encountered an error while analyzing the log file: {str(e)}. Please try again with a smaller file or check the file format.",
+                'filename': filename
+            }
+    
+    def analyze_correlated(self, correlation, file_summaries=None, progress=None, cancel_event=None):
+        """Analyze several logs of one incident in a single generation
+
+        ``correlation`` comes from ``timeline.correlate``; ``file_summaries``
+        maps file names to their own findings summary.
+        """
+        try:
+            if progress:
+                progress('generating', 0.4)
+            response = self.complete(self.format_prompt(build_correlated_prompt(correlation, file_summaries), []),
+                                     cancel_event=cancel_event)
+            return {
+                'raw_findings': summarize_findings(correlation['findings']),
+                'analysis': response,
+                'filenames': correlation['files']
+            }
+
+        except Exception as e:
+            print(f"Error in analyze_correlated: {str(e)}")
+            return {
+                'raw_findings': {'summary': 'Error during analysis', 'error_count': 0},
+                'analysis': f"I encountered an error while analyzing the log files: {str(e)}. Please try again with fewer files.",
+                'filenames': correlation['files']
+            }
+    
+    def complete(self, prompt, cancel_event=None, details=None):
+        """Generate a cleaned response to a formatted prompt, retrying with more
+        tokens (up to 3 attempts) while it looks cut off. ``details`` works as
+        for generate_response and describes the attempt that was returned."""
+        # Try up to 3 times to get a complete response
+        max_new_tokens = self.max_new_tokens
+        best_response = ""
+        best_hit_limit = False
+        for attempt in range(3):
+            if attempt > 0:
+                metrics.CHAT_RETRIES.inc()
+            
+            with tracing.span('attempt', attempt=attempt + 1):
+                # Generate response
+                attempt_details = {}
+                raw_response = self.generate_response(prompt, cancel_event=cancel_event, details=attempt_details)
+                hit_limit = attempt_details.get('hit_limit', False)
+                
+                # Clean response
+                with tracing.span('clean_response'):
+                    response = clean_generated_text(raw_response)
+            
+            # Keep the longest response
+            if len(response) > len(best_response):
+                best_response, best_hit_limit = response, hit_limit
+            
+            # If response seems complete, use it
+            if response and response[-1] in '.!?":;)\']':
+                best_response, best_hit_limit = response, hit_limit
+                break
+            
+            # Don't retry a generation that was cancelled
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            
+            # Otherwise, try with more tokens
+            if attempt < 2:
+                self.max_new_tokens = min(self.max_new_tokens + 100, 600)
+        
+        # Reset to the configured token count
+        self.max_new_tokens = max_new_tokens
+        if details is not None:
+            details['hit_limit'] = best_hit_limit
+        
+        # Use the best response we got
+        return best_response if best_response else NO_RESPONSE
+    
+    def chat(self, user_input, session_id, cancel_event=None):
+        """Process user input and return response with retry logic"""
+        try:
+            # Get or create conversation history for this session
+            if session_id not in self.conversations:
+                self.conversations[session_id] = []
+            
+            conversation_history = self.conversations[session_id]
+            
+            # Format prompt
+            with tracing.span('format_prompt'):
+                prompt = self.format_prompt(user_input, conversation_history)
+            
+            response = self.complete(prompt, cancel_event=cancel_event)
+            
+            self._remember(session_id, conversation_history, user_input, response)
+            return response
+            
+        except Exception as e:
+            return f"I apologize, but I encountered an error: {str(e)}"
+    
+    def chat_stream(self, user_input, session_id, cancel_event=None):
+        """Like chat(), but yields the response text as it is generated.
+
+        Makes a single attempt (streamed text cannot be retried); the cleaned
+        response is what gets stored in the conversation history.
+        """
+        if session_id not in self.conversations:
+            self.conversations[session_id] = []
+        conversation_history = self.conversations[session_id]
+        prompt = self.format_prompt(user_input, conversation_history)
+        response = yield from self.stream_response(prompt, cancel_event=cancel_event)
+        self._remember(session_id, conversation_history, user_input, response)
+        return response
+    
+    def _remember(self, session_id, conversation_history, user_input, response):
+        conversation_history.append({
+            'user': user_input,
+            'assistant': response,
+            'timestamp': datetime.now().isoformat(),
+            'tokens': len(self.tokenizer(user_input + response)['input_ids'])
+        })
+        
+        # Keep history size manageable (and the summary, if any); assigning also queues the write-behind
+        summary, turns = split_summary(conversation_history)
+        turns = turns[-10:]
+        self.conversations[session_id] = conversation_history[:1] + turns if summary else turns
+        
+        # Long conversations are compacted once the model is idle
+        if (self.summarizer is not None and len(turns) > self.summary_keep_turns
+                and self._history_tokens(turns) > self.summary_trigger_tokens):
+            self.summarizer.request(session_id)
+    
+    def _history_tokens(self, turns):
+        """Tokens in ``turns``, recounted only for turns stored without a count"""
+        return sum(turn.get('tokens') or len(self.tokenizer(turn['user'] + turn['assistant'])['input_ids'])
+                   for turn in turns)
+    
+    def compact_session(self, session_id, cancel_event=None):
+        """Fold all but the last ``summary_keep_turns`` turns of a long conversation into its summary
+
+        Returns True if the history was replaced. Nothing changes if the
+        conversation is short enough, or if it changed while the summary
+        was being generated.
+        """
+        if session_id not in self.conversations:
+            return False
+        summary, turns = split_summary(self.conversations[session_id])
+        folded = turns[:len(turns) - self.summary_keep_turns]
+        if not folded or self._history_tokens(turns) <= self.summary_trigger_tokens:
+            return False
+        
+        prompt = self.format_prompt(build_summary_prompt(summary, folded), [])
+        with tracing.span('summarize', turns=len(folded)):
+            text = clean_generated_text(self.generate_response(prompt, cancel_event=cancel_event,
+                                                               max_new_tokens=self.summary_max_tokens))
+        if not text or (cancel_event is not None and cancel_event.is_set()):
+            return False
+        
+        history = self.conversations.get(session_id, [])
+        current_summary, current_turns = split_summary(history)
+        if current_summary != summary or current_turns[:len(folded)] != folded:
+            return False
+        previous = history[0].get('turns', 0) if summary else 0
+        self.conversations[session_id] = [{
+            'summary': text,
+            'turns': previous + len(folded),
+            'timestamp': datetime.now().isoformat()
+        }] + current_turns[len(folded):]
+        return True
+    
+    def clear_session(self, session_id):
+        """Clear conversation history for a session"""
+        if session_id in self.conversations:
+            self.conversations[session_id] = []
+    
+    def get_session_history(self, session_id):
+        """Get conversation history for a session (the turns not folded into its summary)"""
+        return split_summary(self.conversations.get(session_id, []))[1]
+    
+    def get_session_summary(self, session_id):
+        """Summary of the compacted part of a conversation, or None"""
+        return split_summary(self.conversations.get(session_id, []))[0]
@@ -0,0 +1,221 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+# Stack frames kept in a signature: the innermost ones, where the error was raised
+TOP_FRAMES = 3
+# Error lines kept in a signature; build_analysis_prompt shows the model this many
+SIGNATURE_ERRORS = 3
+# Rough per-entry overhead (dict, key, timestamps) on top of the text itself
+ENTRY_OVERHEAD_BYTES = 300
+
+# Parts of a message that change between occurrences of the same error, most specific first
+VOLATILE = [
+    (re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?'), '<ts>'),
+    (re.compile(r'\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b'), '<ts>'),
+    (re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.IGNORECASE), '<id>'),
+    (re.compile(r'\b0x[0-9a-f]+\b', re.IGNORECASE), '<hex>'),
+    (re.compile(r'\b(?=[0-9a-f]*\d)[0-9a-f]{8,}\b', re.IGNORECASE), '<hex>'),
+    # Directories differ between machines and users; the file name is kept
+    (re.compile(r'(?:[A-Za-z]:)?(?:[\\/][\w.~-]+)+[\\/](?=[\w.-]+)'), '.../'),
+    (re.compile(r'\d+(?:\.\d+)*'), '<n>'),
+]
+WHITESPACE = re.compile(r'\s+')
+PYTHON_FRAME = re.compile(r'File "(?:.*[\\/])?([^"\\/]+)", line \d+, in (\S+)')
+JAVA_FRAME = re.compile(r'^\s*at ([\w$.<>/]+)\(')
+
+
+def error_template(text):
+    """``text`` with timestamps, IDs, addresses, directories and numbers replaced by placeholders"""
+    for pattern, placeholder in VOLATILE:
+        text = pattern.sub(placeholder, text)
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def top_frames(trace, limit=TOP_FRAMES):
+    """The ``limit`` innermost frames of a Python or Java-style stack trace"""
+    python = [f'{name}:{func}' for name, func in PYTHON_FRAME.findall(trace)]
+    if python:
+        return python[-limit:]  # Python prints the innermost frame last
+    java = [match.group(1) for match in map(JAVA_FRAME.match, trace.splitlines()) if match]
+    return java[:limit]
+
+
+def explanation_signature(findings):
+    """Key identifying the root cause in ``findings``, or None for a log without errors.
+
+    Built from the message templates of the errors and critical issues the
+    analysis prompt shows, plus the innermost frames of the first stack
+    trace, so the same failure maps to the same key whichever file, host or
+    run it came from.
+    """
+    if findings.get('dump_summary'):
+        parts = {'dump': error_template(findings['dump_summary'])}
+    else:
+        errors = list(dict.fromkeys(error_template(e['content']) for e in findings['errors'][:SIGNATURE_ERRORS]))
+        parts = {
+            'errors': errors,
+            'critical': sorted({error_template(issue) for issue in findings['critical_issues']}),
+            'frames': top_frames(findings['stack_traces'][0]) if findings['stack_traces'] else [],
+        }
+        if not any(parts.values()):
+            return None
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+
+class ExplanationCache:
+    """Model explanations of log failures, keyed by ``explanation_signature``.
+
+    Shared by every file and session, so a failure that keeps coming back
+    is explained by the model once. Holds at most ``max_entries``
+    explanations and roughly ``max_bytes`` of text, evicting the least
+    recently used first. With ``path`` set, the cache is loaded from that
+    JSON file at startup and written back by ``save()``, which also runs at
+    exit.
+    """
+
+    def __init__(self, max_entries=2000, max_bytes=16 * 1024 * 1024, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # signature -> entry, least recently used first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            self._load()
+            atexit.register(self.save)
+
+    def get(self, signature):
+        """The cached explanation for ``signature``, or None"""
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                self.misses += 1
+                metrics.EXPLANATION_CACHE_LOOKUPS.labels('miss').inc()
+                return None
+            self._entries.move_to_end(signature)
+            entry['hits'] += 1
+            self.hits += 1
+            metrics.EXPLANATION_CACHE_LOOKUPS.labels('hit').inc()
+            return entry['explanation']
+
+    def put(self, signature, explanation):
+        with self._lock:
+            self._remove(signature)
+            self._entries[signature] = {'explanation': explanation, 'created': time.time(), 'hits': 0}
+            self._total_bytes += ENTRY_OVERHEAD_BYTES + len(explanation)
+            self._enforce_limits(self.max_bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def shrink(self, target_bytes):
+        """Evict least recently used explanations until memory use is under ``target_bytes``"""
+        with self._lock:
+            return self._enforce_limits(target_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        rate = self.hit_rate()
+        return {
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(rate, 3) if rate is not None else None,
+            'evictions': self.evictions,
+            'persistent': bool(self.path),
+        }
+
+    def save(self):
+        """Write the cache to ``path``, least recently used first"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {'entries': list(self._entries.items())}
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Error saving explanation cache {self.path}: {str(e)}")
+
+    # Internals (callers hold self._lock)
+
+    def _remove(self, signature):
+        entry = self._entries.pop(signature, None)
+        if entry is not None:
+            self._total_bytes -= ENTRY_OVERHEAD_BYTES + len(entry['explanation'])
+
+    def _enforce_limits(self, max_bytes):
+        evicted = 0
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > max_bytes):
+            self._remove(next(iter(self._entries)))
+            evicted += 1
+        if evicted:
+            self.evictions += evicted
+            metrics.EXPLANATION_CACHE_EVICTIONS.inc(evicted)
+        return evicted
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)['entries']
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable explanation cache {self.path}: {str(e)}")
+            return
+        skipped = 0
+        with self._lock:
+            for item in entries if isinstance(entries, list) else ():
+                entry = _loaded_entry(item)
+                if entry is None:
+                    skipped += 1
+                    continue
+                signature, entry = entry
+                self._remove(signature)
+                self._entries[signature] = entry
+                self._total_bytes += ENTRY_OVERHEAD_BYTES + len(entry['explanation'])
+            self._enforce_limits(self.max_bytes)
+        if skipped:
+            print(f"Ignored {skipped} malformed entries in explanation cache {self.path}")
+
+
+def _loaded_entry(item):
+    """A ``(signature, entry)`` pair read from the cache file, or None if it is malformed"""
+    try:
+        signature, entry = item
+        explanation = entry['explanation']
+        created = float(entry.get('created', time.time()))
+        hits = int(entry.get('hits', 0))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+    if not isinstance(signature, str) or not isinstance(explanation, str):
+        return None
+    return signature, {'explanation': explanation, 'created': created, 'hits': hits}
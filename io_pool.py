@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import metrics
+
+
+class IOBusy(Exception):
+    """Raised when an I/O lane already has as many operations as it may hold"""
+    status = 503
+
+
+class IOTimeout(Exception):
+    """Raised when an I/O operation does not finish within its lane's timeout"""
+    status = 504
+
+
+class IOLane:
+    def __init__(self, name, max_workers, max_pending, timeout):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'io-{name}')
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.lock = threading.Lock()
+
+
+class IOPool:
+    """Bounded thread pools for blocking I/O, kept apart from the model and job workers.
+
+    Each lane (e.g. 'fs' for reading log paths, 'bts' for the BTS backend)
+    has its own threads, so a hung NFS mount or backend can only tie up its
+    own lane. ``run()`` waits at most the lane's timeout for the result and
+    then raises ``IOTimeout``, leaving the calling thread free. An operation
+    that timed out still holds its lane slot until it returns, so at most
+    ``max_workers + max_pending`` operations per lane are ever outstanding;
+    beyond that, calls fail at once with ``IOBusy`` instead of queueing.
+    """
+
+    def __init__(self):
+        self.lanes = {}
+
+    def add_lane(self, name, max_workers=4, max_pending=8, timeout=30.0):
+        self.lanes[name] = IOLane(name, max_workers, max_pending, timeout)
+
+    def submit(self, lane_name, fn, *args, **kwargs):
+        """Start ``fn(*args, **kwargs)`` on a lane; returns its Future"""
+        lane = self.lanes[lane_name]
+        with lane.lock:
+            if lane.in_flight >= lane.max_workers + lane.max_pending:
+                lane.rejected += 1
+                metrics.IO_REJECTED.labels(lane.name, 'busy').inc()
+                raise IOBusy(f'Too many {lane.name} operations in progress; please try again later')
+            lane.in_flight += 1
+        started = time.perf_counter()
+
+        def finished(future):
+            metrics.IO_SECONDS.labels(lane.name).observe(time.perf_counter() - started)
+            with lane.lock:
+                lane.in_flight -= 1
+                lane.completed += 1
+
+        try:
+            future = lane.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            with lane.lock:
+                lane.in_flight -= 1
+            raise
+        future.add_done_callback(finished)
+        return future
+
+    def run(self, lane_name, fn, *args, timeout=None, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on a lane and return its result, waiting at most ``timeout``"""
+        lane = self.lanes[lane_name]
+        timeout = lane.timeout if timeout is None else timeout
+        future = self.submit(lane_name, fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()  # Only helps if it has not started yet
+            with lane.lock:
+                lane.timeouts += 1
+            metrics.IO_REJECTED.labels(lane.name, 'timeout').inc()
+            raise IOTimeout(f'{lane.name} operation timed out after {timeout:g}s')
+
+    def in_flight(self):
+        return {name: lane.in_flight for name, lane in self.lanes.items()}
+
+    def stats(self):
+        return {name: {
+            'in_flight': lane.in_flight,
+            'max_workers': lane.max_workers,
+            'max_pending': lane.max_pending,
+            'timeout': lane.timeout,
+            'completed': lane.completed,
+            'rejected': lane.rejected,
+            'timeouts': lane.timeouts,
+        } for name, lane in self.lanes.items()}
+
+    def shutdown(self, wait=True):
+        for lane in self.lanes.values():
+            lane.executor.shutdown(wait=wait)
+
+
+class CancellableReader:
+    """Binary file wrapper whose ``read()`` raises IOTimeout once ``cancel_event`` is set.
+
+    Lets a copy that its caller gave up on stop at the next chunk instead
+    of running to the end.
+    """
+
+    def __init__(self, f, cancel_event):
+        self.f = f
+        self.cancel_event = cancel_event
+
+    def read(self, size=-1):
+        if self.cancel_event.is_set():
+            raise IOTimeout('Read cancelled')
+        return self.f.read(size)
@@ -0,0 +1,185 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue cannot accept more work"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when the job has been cancelled"""
+
+
+class Job:
+    """A unit of background work with status, progress stage and result"""
+
+    def __init__(self, kind, owner=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._finished_monotonic = None
+        self._done_callbacks = []
+        # Guards status changes and the callback list, so no callback is lost or run twice
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def done(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def set_stage(self, stage, progress=None):
+        """Record the current stage (and optionally a 0-1 progress fraction)"""
+        self.stage = stage
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, float(progress)))
+
+    def add_done_callback(self, fn):
+        """Call ``fn(job)`` once the job reaches a terminal state"""
+        with self._lock:
+            if not self.done:
+                self._done_callbacks.append(fn)
+                return
+        fn(self)
+
+    def raise_if_cancelled(self):
+        """Abort the job function early if cancellation was requested"""
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.id)
+
+    def to_dict(self):
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status == 'completed':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded worker pool that runs jobs in the background.
+
+    At most ``max_workers`` jobs run at once and at most ``max_pending`` more
+    may wait; further submissions raise ``JobQueueFull``. Finished jobs are kept
+    for ``retention_seconds`` so clients can still poll their result.
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, retention_seconds=3600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, owner=None, **kwargs):
+        """Queue ``fn(job, *args, **kwargs)`` and return the new Job"""
+        with self._lock:
+            self._prune()
+            if self.unfinished_count() >= self.max_workers + self.max_pending:
+                raise JobQueueFull(f'Job queue is full ({self.max_pending} pending)')
+            job = Job(kind, owner=owner)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation; queued jobs never start, running jobs stop at the next check"""
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel_event.set()
+        # Only if no worker has picked it up yet; a running job stops at its next check
+        self._finish(job, 'cancelled', expected='queued')
+        return True
+
+    def unfinished_count(self):
+        # Counts over a snapshot: other threads add and prune jobs meanwhile,
+        # and submit() calls this with self._lock already held
+        return sum(1 for job in list(self._jobs.values()) if not job.done)
+
+    def pending_count(self):
+        return sum(1 for job in list(self._jobs.values()) if job.status == 'queued')
+
+    def running_count(self):
+        return sum(1 for job in list(self._jobs.values()) if job.status == 'running')
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, fn, args, kwargs):
+        with job._lock:
+            if job.status != 'queued':
+                return  # Cancelled before it started
+            job.status = 'running'
+            job.started_at = datetime.now().isoformat()
+        try:
+            result = fn(job, *args, **kwargs)
+            if job.cancelled:
+                self._finish(job, 'cancelled')
+            else:
+                job.result = result
+                job.progress = 1.0
+                self._finish(job, 'completed')
+        except JobCancelled:
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            print(f"Error in job {job.id}: {str(e)}")
+            job.error = str(e)
+            self._finish(job, 'failed')
+
+    def _finish(self, job, status, expected=None):
+        """Move ``job`` to a terminal ``status`` (only from ``expected``, if given) and run its callbacks"""
+        with job._lock:
+            if job.done or (expected is not None and job.status != expected):
+                return False
+            job.status = status
+            job.stage = status
+            job.finished_at = datetime.now().isoformat()
+            job._finished_monotonic = time.monotonic()
+            callbacks, job._done_callbacks = job._done_callbacks, []
+        for fn in callbacks:
+            try:
+                fn(job)
+            except Exception as e:
+                print(f"Error in done callback for job {job.id}: {str(e)}")
+        return True
+
+    def prune(self, max_age=None):
+        """Drop finished jobs (and their results) older than ``max_age``, default the retention window"""
+        with self._lock:
+            return self._prune(max_age)
+
+    def _prune(self, max_age=None):
+        """Drop finished jobs older than the retention window (caller holds the lock)"""
+        cutoff = time.monotonic() - (self.retention_seconds if max_age is None else max_age)
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job._finished_monotonic is not None and job._finished_monotonic < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
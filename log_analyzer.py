@@ -0,0 +1,352 @@
+import codecs
+import io
+import os
+import re
+import time
+
+import metrics
+from log_formats import FORMAT_SAMPLE_CHARS, FORMAT_SAMPLE_LINES, PARSERS, detect_format
+from rule_packs import RuleSet
+
+# Patterns to look for
+PATTERNS = {
+    'errors': re.compile(r'(error|exception|fail|crash|fatal|critical)', re.IGNORECASE),
+    'warnings': re.compile(r'(warning|warn)', re.IGNORECASE),
+    'stack_traces': re.compile(r'(traceback|stack trace|at .+\(.+:\d+\)|Exception in thread)', re.IGNORECASE),
+    'timestamps': re.compile(r'(\d{4}-\d{2}-\d{2}|\d{2}:\d{2}:\d{2}|\d{2}/\d{2}/\d{4})'),
+    'memory': re.compile(r'(memory|heap|stack overflow|out of memory|oom)', re.IGNORECASE),
+    'segfault': re.compile(r'(segmentation fault|sigsegv|access violation)', re.IGNORECASE),
+    'null_pointer': re.compile(r'(null pointer|nullptr|nullreferenceexception)', re.IGNORECASE),
+    'file_paths': re.compile(r'([A-Za-z]:\\[\w\\\.-]+|/[\w/\.-]+)'),
+    'ip_addresses': re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b'),
+    'urls': re.compile(r'https?://[^\s]+'),
+}
+
+# A stack trace collects at most this many lines after the line that starts it
+STACK_TRACE_LOOKAHEAD = 19
+
+# Critical issues recognized without any rule pack. They only apply to error
+# lines and rank after the packs' rules (lower priority values go first).
+BUILTIN_RULES = [
+    {'id': 'builtin.segfault', 'pattern': PATTERNS['segfault'].pattern, 'severity': 'critical',
+     'only_errors': True, 'priority': 200, 'message': 'Segmentation fault detected at line {line}',
+     'literals': ['segmentation fault', 'sigsegv', 'access violation']},
+    {'id': 'builtin.null_pointer', 'pattern': PATTERNS['null_pointer'].pattern, 'severity': 'critical',
+     'only_errors': True, 'priority': 200, 'message': 'Null pointer exception at line {line}',
+     'literals': ['null pointer', 'nullptr', 'nullreferenceexception']},
+    {'id': 'builtin.memory', 'pattern': PATTERNS['memory'].pattern, 'severity': 'critical',
+     'only_errors': True, 'priority': 200, 'message': 'Memory issue detected at line {line}',
+     'literals': ['memory', 'heap', 'stack overflow', 'oom']},
+]
+# Team rule packs (see rule_packs); picked up again whenever the files change
+RULES_DIR = os.environ.get('LOG_RULES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules'))
+DETECTION_RULES = RuleSet(RULES_DIR, BUILTIN_RULES)
+
+
+def classify_line(line, parser=None):
+    """(level, text, record) for one log line.
+
+    With a format ``parser`` that understands the line, the level comes from
+    its level field and ``text`` is its message; keyword regexes are only
+    the fallback, for unstructured lines and records without a level.
+    ``level`` is 'error', 'warning' or None.
+    """
+    record = parser(line) if parser is not None else None
+    if record is not None:
+        if record.level is not None:
+            return (record.level if record.level != 'info' else None), record.message, record
+        text = record.message or line
+    else:
+        text = line
+    if PATTERNS['errors'].search(text):
+        return 'error', text, record
+    if PATTERNS['warnings'].search(text):
+        return 'warning', text, record
+    return None, text, record
+
+
+class LogScanner:
+    """Incremental log analysis behind LogAnalyzer.extract_key_info and scan_file.
+
+    Text (or bytes) can be fed in arbitrary pieces as it arrives, e.g. while a
+    file is still uploading; ``finish()`` returns the findings, which do not
+    depend on how the content was split. Only the first ``max_lines`` lines
+    are analyzed, and ``done`` turns true once they have all been seen so
+    callers can stop reading early.
+
+    Unless ``log_format`` is given, the format (see ``log_formats``) is
+    detected from the first ``FORMAT_SAMPLE_LINES`` lines (or
+    ``FORMAT_SAMPLE_CHARS``) fed. Structured lines (JSON, logfmt, syslog)
+    are classified by their level field; other lines, and lines that do not
+    parse, by the keyword patterns.
+
+    Lines are also matched against the detection rules of ``rules`` (a
+    RuleSet, default ``DETECTION_RULES``: the built-in rules plus the rule
+    packs), taken once per scan: a matching rule can raise a line to an
+    error or warning, and critical rules add to ``critical_issues``.
+    """
+
+    def __init__(self, max_lines=200, log_format=None, rules=None):
+        self.max_lines = max_lines
+        self.log_format = log_format
+        self._parser = PARSERS.get(log_format)
+        self._rules = (rules or DETECTION_RULES).matcher()
+        self._sample = []  # Text held back until the format is detected
+        self._sample_chars = 0
+        self._sample_lines = 0
+        self.line_count = 0
+        self.bytes_fed = 0
+        self._partial = ''
+        # Same decoding as open(path, 'r', encoding='utf-8', errors='ignore')
+        self._decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder('utf-8')(errors='ignore'), translate=True)
+        self._open_traces = []  # [index into stack_traces, lines so far, lookahead left]
+        self._file_paths = set()
+        self._elapsed = 0.0
+        self._result = None
+        self.findings = {
+            'total_lines': 0,
+            'errors': [],
+            'warnings': [],
+            'stack_traces': [],
+            'timestamps': [],
+            'critical_issues': [],
+            'file_paths': [],
+            'summary': '',
+            'format': log_format
+        }
+
+    @property
+    def done(self):
+        return self.max_lines is not None and self.line_count >= self.max_lines
+
+    def feed_bytes(self, data):
+        """Feed raw bytes; decoded like a text-mode read with errors='ignore'"""
+        self.bytes_fed += len(data)
+        if not self.done:
+            self._feed_text(self._decoder.decode(data))
+
+    def feed(self, text):
+        self.bytes_fed += len(text)
+        if not self.done:
+            self._feed_text(text)
+
+    def feed_line(self, line, log_format=None):
+        """Scan one complete line in the given format, e.g. lines merged from
+        files of different formats"""
+        self.bytes_fed += len(line)
+        if not self.done:
+            self._process_line(line, PARSERS.get(log_format))
+
+    def finish(self):
+        """Flush the trailing partial line and return the findings"""
+        if self._result is not None:
+            return self._result
+        started = time.perf_counter()
+        if not self.done:
+            self._feed_text(self._decoder.decode(b'', final=True))
+        if self.log_format is None:
+            self._feed_text(self._detect_format())
+        if not self.done:
+            self._process_line(self._partial, self._parser)
+        self._partial = ''
+        self._close_traces()
+
+        findings = self.findings
+        findings['total_lines'] = self.line_count
+        findings['format'] = self.log_format
+        # Convert set to list for JSON serialization
+        findings['file_paths'] = list(self._file_paths)[:10]  # Limit to 10 paths
+
+        # Limit the number of errors and warnings to prevent overflow
+        findings['errors'] = findings['errors'][:20]
+        findings['warnings'] = findings['warnings'][:20]
+        findings['stack_traces'] = findings['stack_traces'][:5]
+
+        # Create summary
+        if findings['errors']:
+            findings['summary'] = f"Found {len(findings['errors'])} error(s)"
+            if findings['critical_issues']:
+                findings['summary'] += f" including {len(findings['critical_issues'])} critical issue(s)"
+        elif findings['warnings']:
+            findings['summary'] = f"Found {len(findings['warnings'])} warning(s), no errors detected"
+        else:
+            findings['summary'] = "No obvious errors or warnings found in the log"
+
+        # Record scan throughput
+        self._elapsed += time.perf_counter() - started
+        metrics.LOG_SCAN_BYTES.inc(self.bytes_fed)
+        if self._elapsed > 0 and self.bytes_fed:
+            metrics.LOG_SCAN_MB_PER_SECOND.observe(self.bytes_fed / self._elapsed / (1024 * 1024))
+
+        self._result = findings
+        return findings
+
+    def snapshot(self):
+        """Summary of what has been seen so far, without finishing the scan"""
+        return {
+            'lines_scanned': self.line_count,
+            'errors': len(self.findings['errors']),
+            'warnings': len(self.findings['warnings']),
+            'critical_issues': self.findings['critical_issues'][:5],
+            'format': self.log_format,
+            'complete': self.done or self._result is not None,
+        }
+
+    def _detect_format(self):
+        """Settle the format from the held-back sample; returns the sample"""
+        sample = ''.join(self._sample)
+        self._sample = []
+        self.log_format = detect_format(sample)
+        self._parser = PARSERS.get(self.log_format)
+        return sample
+
+    def _feed_text(self, text):
+        started = time.perf_counter()
+        if self.log_format is None:
+            self._sample.append(text)
+            self._sample_chars += len(text)
+            self._sample_lines += text.count('\n')
+            if self._sample_chars < FORMAT_SAMPLE_CHARS and self._sample_lines <= FORMAT_SAMPLE_LINES:
+                self._elapsed += time.perf_counter() - started
+                return
+            text = self._detect_format()
+        pieces = (self._partial + text).split('\n')
+        self._partial = pieces.pop()
+        for line in pieces:
+            if self.done:
+                self._partial = ''
+                break
+            self._process_line(line, self._parser)
+        self._elapsed += time.perf_counter() - started
+
+    def _close_traces(self):
+        for index, trace_lines, _ in self._open_traces:
+            self.findings['stack_traces'][index] = '\n'.join(trace_lines)[:500]  # Limit stack trace length
+        self._open_traces = []
+
+    def _process_line(self, line, parser):
+        i = self.line_count
+        self.line_count += 1
+        findings = self.findings
+
+        # Extend stack traces started on earlier lines
+        if self._open_traces:
+            still_open = []
+            continues = line.strip() and (line.startswith(' ') or line.startswith('\t') or 'at ' in line)
+            for entry in self._open_traces:
+                index, trace_lines, left = entry
+                if continues and left > 0:
+                    trace_lines.append(line)
+                    entry[2] = left - 1
+                    if entry[2] > 0:
+                        still_open.append(entry)
+                        continue
+                findings['stack_traces'][index] = '\n'.join(trace_lines)[:500]
+            self._open_traces = still_open
+
+        # Check for errors; structured lines go by their level field
+        level, text, record = classify_line(line, parser)
+        rule = self._rules.match(text, level == 'error')
+        if rule is not None and level != 'error':
+            level = 'warning' if rule.severity == 'warning' else 'error'
+        if level == 'error':
+            findings['errors'].append({'line': i+1, 'content': text.strip()[:200]})  # Limit line length
+
+            # Check for specific critical issues
+            if rule is not None and rule.severity == 'critical':
+                findings['critical_issues'].append(rule.issue(i+1))
+
+        # Check for warnings
+        elif level == 'warning':
+            findings['warnings'].append({'line': i+1, 'content': text.strip()[:200]})
+
+        # Check for stack traces
+        if record is not None:
+            if record.trace:
+                findings['stack_traces'].append(record.trace[:500])
+        elif PATTERNS['stack_traces'].search(line):
+            # Capture the following indented / "at ..." lines as they arrive
+            findings['stack_traces'].append('\n'.join([line])[:500])
+            if self.max_lines is None or i + 1 < self.max_lines:
+                self._open_traces.append([len(findings['stack_traces']) - 1, [line], STACK_TRACE_LOOKAHEAD])
+
+        # Extract timestamps
+        timestamp_match = PATTERNS['timestamps'].search(line)
+        if timestamp_match and len(findings['timestamps']) < 5:  # Limit timestamps
+            findings['timestamps'].append(timestamp_match.group())
+
+        # Extract file paths
+        file_match = PATTERNS['file_paths'].search(line)
+        if file_match:
+            self._file_paths.add(file_match.group())
+
+
+class LogAnalyzer:
+    """Analyze error logs and crash dumps"""
+
+    @staticmethod
+    def extract_key_info(content, max_lines=200):
+        """Extract key information from log content"""
+        scanner = LogScanner(max_lines=max_lines)  # Limit lines to prevent token overflow
+        scanner.feed(content)
+        return scanner.finish()
+
+    @staticmethod
+    def scan_file(path, max_lines=200, chunk_size=64 * 1024):
+        """Extract key information from a file, reading only as far as needed"""
+        scanner = LogScanner(max_lines=max_lines)
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            while not scanner.done:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                scanner.feed(chunk)
+        return scanner.finish()
+
+
+def summarize_findings(findings):
+    """Compact, JSON-safe view of the findings returned to clients"""
+    return {
+        'summary': findings['summary'],
+        'error_count': len(findings['errors']),
+        'warning_count': len(findings['warnings']),
+        'critical_issues': findings['critical_issues'][:5],  # Limit to 5
+        'has_stack_traces': len(findings['stack_traces']) > 0,
+        'format': findings['format']
+    }
+
+
+# Fixed lead-in of every analysis prompt; it comes before anything
+# file-specific so its prefill can be cached and shared (see PrefixCache)
+ANALYSIS_INSTRUCTIONS = """Analyze the error log summarized below and provide debugging guidance.
+
+Based on this analysis, provide:
+1. A brief summary of the main issues
+2. The likely root cause
+3. Specific debugging steps to resolve the issues
+4. Any additional recommendations
+
+Keep your response concise and actionable.
+
+"""
+
+
+def build_analysis_prompt(findings, filename):
+    """Model prompt asking for debugging guidance on a scanned log"""
+    if findings.get('dump_summary'):
+        # Crash dumps come with their own compact summary (see dump_analyzer)
+        return ANALYSIS_INSTRUCTIONS + f"Crash dump: '{filename}'\n\n{findings['dump_summary']}"
+    return ANALYSIS_INSTRUCTIONS + f"""Log file: '{filename}'
+
+Summary of findings:
+- Total lines analyzed: {findings['total_lines']}
+- Errors found: {len(findings['errors'])}
+- Warnings found: {len(findings['warnings'])}
+- Critical issues: {', '.join(findings['critical_issues'][:5]) if findings['critical_issues'] else 'None detected'}
+
+Key errors (showing first 3):
+{chr(10).join([f"Line {e['line']}: {e['content']}" for e in findings['errors'][:3]])}
+
+Stack traces found: {len(findings['stack_traces'])}
+{findings['stack_traces'][0] if findings['stack_traces'] else 'No stack traces found'}"""
@@ -0,0 +1,150 @@
+import json
+import re
+from collections import namedtuple
+
+try:
+    import orjson
+except ImportError:  # Optional; only makes JSON-lines parsing faster
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+FORMAT_TEXT = 'text'
+FORMAT_JSON = 'json'
+FORMAT_SYSLOG = 'syslog'
+FORMAT_LOGFMT = 'logfmt'
+
+# Format detection looks at the complete lines in this much of the head of a log
+FORMAT_SAMPLE_CHARS = 4096
+FORMAT_SAMPLE_LINES = 20
+# Share of sampled lines that must parse for a format to be chosen
+FORMAT_MIN_MATCH = 0.8
+
+# A parsed structured line. ``level`` is 'error', 'warning', 'info' or None
+# when the line has no usable level; ``trace`` is a stack trace field, if any.
+LogRecord = namedtuple('LogRecord', ['level', 'message', 'trace'])
+
+LEVELS = {
+    'emerg': 'error', 'emergency': 'error', 'alert': 'error', 'panic': 'error', 'fatal': 'error',
+    'crit': 'error', 'critical': 'error', 'severe': 'error', 'err': 'error', 'error': 'error',
+    'warn': 'warning', 'warning': 'warning',
+    'notice': 'info', 'info': 'info', 'information': 'info', 'debug': 'info', 'trace': 'info',
+    'verbose': 'info', 'fine': 'info',
+}
+LEVEL_KEYS = ('level', 'lvl', 'levelname', 'severity', 'log.level', 'loglevel')
+MESSAGE_KEYS = ('msg', 'message', 'log', 'text', 'event')
+TRACE_KEYS = ('stack', 'stack_trace', 'stacktrace', 'exc_info', 'exception')
+ERROR_KEYS = ('err', 'error')
+
+# RFC 5424: <PRI>1 TIMESTAMP HOST APP PROCID MSGID [SD] MSG
+SYSLOG_5424 = re.compile(r'<(\d{1,3})>1 \S+ \S+ \S+ \S+ \S+ (?:-|(?:\[(?:[^\]"]|"(?:[^"\\]|\\.)*")*\])+) ?(.*)')
+# RFC 3164 (with <PRI> on the wire, without it in files): Mon DD HH:MM:SS host tag[pid]: msg
+SYSLOG_3164 = re.compile(
+    r'(?:<(\d{1,3})>)?(?:[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}|\d{4}-\d{2}-\d{2}T\S+) \S+ [^\s:\[]+(?:\[\d+\])?: ?(.*)')
+LOGFMT_PAIR = re.compile(r'([\w.\-/@]+)=("(?:[^"\\]|\\.)*"|[^\s"]*)')
+
+
+def parse_json(line):
+    """LogRecord for a JSON object line, or None"""
+    line = line.strip()
+    if not line.startswith('{'):
+        return None
+    try:
+        fields = _loads(line)
+    except ValueError:
+        return None
+    if not isinstance(fields, dict):
+        return None
+    return _record(fields)
+
+
+def parse_syslog(line):
+    """LogRecord for an RFC 5424 or RFC 3164 syslog line, or None"""
+    match = SYSLOG_5424.match(line) or SYSLOG_3164.match(line)
+    if not match:
+        return None
+    priority, message = match.groups()
+    level = None
+    if priority is not None:
+        severity = int(priority) & 7
+        level = 'error' if severity <= 3 else 'warning' if severity == 4 else 'info'
+    return LogRecord(level, message, None)
+
+
+def parse_logfmt(line):
+    """LogRecord for a logfmt (key=value ...) line, or None"""
+    if not LOGFMT_PAIR.match(line.lstrip()):
+        return None
+    fields = {key: _unquote(value) for key, value in LOGFMT_PAIR.findall(line)}
+    if len(fields) < 2:
+        return None
+    return _record(fields)
+
+
+PARSERS = {
+    FORMAT_JSON: parse_json,
+    FORMAT_SYSLOG: parse_syslog,
+    FORMAT_LOGFMT: parse_logfmt,
+}
+
+
+def detect_format(sample):
+    """Most likely format of a log, from text at its head.
+
+    A structured format is chosen when it parses at least
+    ``FORMAT_MIN_MATCH`` of the sampled non-empty lines; otherwise 'text'.
+    """
+    lines = sample.split('\n')
+    if len(lines) > 1:
+        lines.pop()  # Cut off, or empty after the final newline
+    lines = [line for line in lines if line.strip()][:FORMAT_SAMPLE_LINES]
+    if not lines:
+        return FORMAT_TEXT
+    for log_format, parser in PARSERS.items():
+        if sum(1 for line in lines if parser(line) is not None) >= FORMAT_MIN_MATCH * len(lines):
+            return log_format
+    return FORMAT_TEXT
+
+
+def detect_file_format(path):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return detect_format(f.read(FORMAT_SAMPLE_CHARS))
+
+
+def normalize_level(value):
+    """'error', 'warning', 'info' or None for a level field value.
+
+    Numbers are read on the bunyan/pino scale (40 warn, 50 error, 60 fatal).
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return 'error' if value >= 50 else 'warning' if value >= 40 else 'info'
+    if isinstance(value, str):
+        return LEVELS.get(value.strip().lower())
+    return None
+
+
+def _record(fields):
+    level = None
+    for key in LEVEL_KEYS:
+        if key in fields:
+            level = normalize_level(fields[key])
+            break
+    message = next((fields[key] for key in MESSAGE_KEYS if isinstance(fields.get(key), str)), '')
+    trace = next((fields[key] for key in TRACE_KEYS if isinstance(fields.get(key), str) and fields[key]), None)
+    for key in ERROR_KEYS:
+        value = fields.get(key)
+        if isinstance(value, dict):  # e.g. pino's err: {type, message, stack}
+            trace = trace or value.get('stack')
+            value = value.get('message')
+        if isinstance(value, str) and value:
+            message = f'{message}: {value}' if message else value
+            break
+    return LogRecord(level, message, trace)
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
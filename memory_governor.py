@@ -0,0 +1,211 @@
+import gc
+import os
+import threading
+import time
+
+import metrics
+from admission import AdmissionRejected
+
+NORMAL, ELEVATED, HIGH, CRITICAL = range(4)
+LEVEL_NAMES = ('normal', 'elevated', 'high', 'critical')
+# Share of the memory limit at which ELEVATED, HIGH and CRITICAL start
+THRESHOLDS = (0.75, 0.85, 0.95)
+# A level is only left once usage is this far below its threshold, so it does not flap
+HYSTERESIS = 0.05
+# Share of their current memory that caches keep when asked to release some
+KEEP_FRACTION = {ELEVATED: 0.75, HIGH: 0.5, CRITICAL: 0.25}
+# max_new_tokens, batch sizes and analysis windows are scaled by this at each level
+SCALE = {NORMAL: 1.0, ELEVATED: 1.0, HIGH: 0.5, CRITICAL: 0.25}
+# Generation limits are never scaled below this
+MIN_NEW_TOKENS = 64
+
+
+class MemoryPressure(AdmissionRejected):
+    """Raised when new work is refused because memory is nearly exhausted"""
+
+
+class Subsystem:
+    def __init__(self, name, usage=None, budget=None, release=None):
+        self.name = name
+        self.usage = usage
+        self.budget = budget
+        self.release = release
+        self.releases = 0
+        self.last_bytes = None
+
+    def measure(self):
+        if self.usage is not None:
+            try:
+                self.last_bytes = self.usage()
+            except Exception as e:
+                print(f"Error measuring memory of {self.name}: {str(e)}")
+        return self.last_bytes
+
+    def shed(self, keep):
+        try:
+            self.release(keep)
+            self.releases += 1
+            metrics.MEMORY_SHED_ACTIONS.labels(f'release_{self.name}').inc()
+        except Exception as e:
+            print(f"Error releasing memory of {self.name}: {str(e)}")
+
+
+class MemoryGovernor:
+    """Coordinates memory use across subsystems and degrades in steps under pressure.
+
+    A background thread polls the process RSS (and CUDA memory, with a CUDA
+    limit) every ``interval`` seconds against ``limit_bytes``. Pressure
+    rises through four levels:
+
+    - elevated (75%): caches are told to release memory, keeping 75% of it
+      (50% at high, 25% at critical), and garbage is collected. This happens
+      on entering each level, then at most every ``release_interval``
+      seconds while the pressure lasts;
+    - high (85%): ``max_new_tokens``, batch sizes and analysis windows are
+      halved;
+    - critical (95%): they are quartered and ``admit()`` refuses new jobs.
+
+    Subsystems are registered with a ``usage()`` callable for reporting and
+    an optional ``budget``. A subsystem above its budget is asked to release
+    memory even when the process as a whole is not under pressure.
+    """
+
+    def __init__(self, limit_bytes, cuda_limit_bytes=None, interval=5.0, release_interval=60.0,
+                 rss=metrics.process_rss_bytes, cuda_usage=None):
+        self.limit_bytes = limit_bytes
+        self.cuda_limit_bytes = cuda_limit_bytes
+        self.interval = interval
+        self.release_interval = release_interval
+        self.rss = rss
+        self.cuda_usage = cuda_usage
+        self.subsystems = {}
+        self.level = NORMAL
+        self.last_poll = None
+        self.last_rss = None
+        self.last_cuda = None
+        self.rejected = 0
+        self._released_at = float('-inf')
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name, usage=None, budget=None, release=None):
+        """Track a subsystem; ``release(keep)`` should free all but ``keep`` (0-1) of its memory"""
+        self.subsystems[name] = Subsystem(name, usage, budget, release)
+
+    @property
+    def level_name(self):
+        return LEVEL_NAMES[self.level]
+
+    # Degradation steps
+
+    def max_new_tokens(self, configured):
+        """Generation limit to use instead of ``configured`` at the current level"""
+        return min(configured, max(MIN_NEW_TOKENS, int(configured * SCALE[self.level])))
+
+    def batch_size(self, requested):
+        return max(1, int(requested * SCALE[self.level]))
+
+    def window_lines(self, requested):
+        """Lines of a log window to hold in memory at once"""
+        return max(1, int(requested * SCALE[self.level]))
+
+    def admit(self):
+        """Raise MemoryPressure if new jobs are being refused"""
+        if self.level >= CRITICAL:
+            self.rejected += 1
+            metrics.MEMORY_SHED_ACTIONS.labels('reject_job').inc()
+            raise MemoryPressure('Server is low on memory; please try again later', retry_after=self.interval * 2)
+
+    # Polling
+
+    def poll(self):
+        """Measure memory, update the pressure level and shed load; returns the level"""
+        with self._lock:
+            self.last_poll = time.time()
+            self.last_rss = self.rss()
+            self.last_cuda = self.cuda_usage() if self.cuda_usage is not None else None
+            ratio = self.pressure()
+            level = sum(1 for threshold in THRESHOLDS if ratio >= threshold)
+            held = sum(1 for threshold in THRESHOLDS if ratio >= threshold - HYSTERESIS)
+            previous = self.level
+            self.level = max(level, min(previous, held))
+            if self.level != previous:
+                print(f"Memory pressure {LEVEL_NAMES[previous]} -> {self.level_name} ({ratio:.0%} of limit)")
+
+            now = time.monotonic()
+            release = self.level >= ELEVATED and (self.level > previous or
+                                                  now - self._released_at >= self.release_interval)
+            for subsystem in self.subsystems.values():
+                used = subsystem.measure()
+                if subsystem.release is None:
+                    continue
+                if release:
+                    subsystem.shed(KEEP_FRACTION[self.level])
+                elif subsystem.budget and used and used > subsystem.budget:
+                    subsystem.shed(subsystem.budget / used)
+            if release:
+                self._released_at = now
+                gc.collect()
+            return self.level
+
+    def pressure(self):
+        """Highest share of a memory limit in use, from the last poll"""
+        ratios = [0.0]
+        if self.last_rss is not None and self.limit_bytes:
+            ratios.append(self.last_rss / self.limit_bytes)
+        if self.last_cuda is not None and self.cuda_limit_bytes:
+            ratios.append(self.last_cuda / self.cuda_limit_bytes)
+        return max(ratios)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll_loop, name='memory-governor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def usage_by_subsystem(self):
+        return {name: subsystem.last_bytes for name, subsystem in self.subsystems.items()
+                if subsystem.last_bytes is not None}
+
+    def stats(self):
+        return {
+            'level': self.level_name,
+            'pressure': round(self.pressure(), 3),
+            'limit_bytes': self.limit_bytes,
+            'rss_bytes': self.last_rss,
+            'cuda_limit_bytes': self.cuda_limit_bytes,
+            'cuda_bytes': self.last_cuda,
+            'rejected_jobs': self.rejected,
+            'subsystems': {name: {'bytes': subsystem.last_bytes, 'budget': subsystem.budget,
+                                  'releases': subsystem.releases}
+                           for name, subsystem in self.subsystems.items()},
+        }
+
+    def _poll_loop(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error polling memory: {str(e)}")
+            if self._stop.wait(self.interval):
+                break
+
+
+def detect_memory_limit():
+    """Memory available to this process: the cgroup limit if set, else physical memory"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # Unlimited: 'max' on cgroup v2, a huge number on v1
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
@@ -0,0 +1,385 @@
+"""Lightweight Prometheus-style metrics.
+
+Counters and histograms are sharded per thread: each thread only ever writes
+to its own cells, so recording a value takes no lock. A scrape sums the
+shards; cells of threads that have exited are folded into a retired total so
+thread churn does not grow the shard list.
+"""
+import os
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Shards:
+    """Per-thread arrays of floats that are summed on read"""
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []  # (thread, cells)
+        self._retired = [0.0] * size
+
+    def cells(self):
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = [0.0] * self._size
+            with self._lock:
+                self._live.append((threading.current_thread(), cells))
+            self._local.cells = cells
+            return cells
+
+    def totals(self):
+        with self._lock:
+            live = []
+            for thread, cells in self._live:
+                if thread.is_alive():
+                    live.append((thread, cells))
+                else:
+                    for i, value in enumerate(cells):
+                        self._retired[i] += value
+            self._live = live
+            totals = list(self._retired)
+            for _, cells in live:
+                for i, value in enumerate(cells):
+                    totals[i] += value
+        return totals
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+        if not self.labelnames:
+            # Unlabelled metrics report zero before their first update
+            self.labels()
+        if registry is None:
+            registry = REGISTRY
+        registry.register(self)
+
+    def labels(self, *labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}')
+        labelvalues = tuple(str(v) for v in labelvalues)
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._children_lock:
+                child = self._children.get(labelvalues)
+                if child is None:
+                    child = self._new_child()
+                    self._children[labelvalues] = child
+        return child
+
+    def _default_child(self):
+        if self.labelnames:
+            raise ValueError(f'{self.name} requires labels {self.labelnames}')
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for name, labels, value in self.samples():
+            lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError('Counters can only increase')
+        self._shards.cells()[0] += amount
+
+    @property
+    def value(self):
+        return self._shards.totals()[0]
+
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default_child().inc(amount)
+
+    @property
+    def value(self):
+        return self._default_child().value
+
+    def samples(self):
+        for labelvalues, child in list(self._children.items()):
+            yield f'{self.name}_total', _format_labels(self.labelnames, labelvalues), child.value
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = float(value)
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or computed at scrape time.
+
+    ``set_function`` takes a callable returning a number, or for labelled
+    gauges a dict mapping label-value tuples to numbers.
+    """
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._function = None
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default_child().set(value)
+
+    def set_function(self, fn):
+        self._function = fn
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                return
+            if value is None:
+                return
+            if isinstance(value, dict):
+                for labelvalues, v in value.items():
+                    if not isinstance(labelvalues, tuple):
+                        labelvalues = (labelvalues,)
+                    yield self.name, _format_labels(self.labelnames, labelvalues), v
+            else:
+                yield self.name, '', value
+            return
+        for labelvalues, child in list(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, labelvalues), child.value
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One cell per bucket, then sum, then count
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value):
+        cells = self._shards.cells()
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                cells[i] += 1
+                break
+        cells[-2] += value
+        cells[-1] += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        totals = self._shards.totals()
+        cumulative = []
+        running = 0.0
+        for count in totals[:-2]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-2], totals[-1]
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values"""
+    type_name = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        buckets = tuple(sorted(float(b) for b in buckets))
+        if buckets[-1] != float('inf'):
+            buckets += (float('inf'),)
+        self.buckets = buckets
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default_child().observe(value)
+
+    def time(self):
+        return self._default_child().time()
+
+    def samples(self):
+        for labelvalues, child in list(self._children.items()):
+            cumulative, total, count = child.snapshot()
+            for bound, value in zip(self.buckets, cumulative):
+                labels = _format_labels(self.labelnames, labelvalues, ('le', _format_value(bound)))
+                yield f'{self.name}_bucket', labels, value
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class Registry:
+    """Collection of metrics rendered together in the text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f'Duplicate metric: {metric.name}')
+            self._metrics.append(metric)
+
+    def get(self, name):
+        for metric in self._metrics:
+            if metric.name == name:
+                return metric
+        return None
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def process_rss_bytes():
+    """Resident set size of this process, or None if it cannot be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+# Inference
+TIME_TO_FIRST_TOKEN = Histogram(
+    'inference_time_to_first_token_seconds', 'Time from generate() call to the first new token',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+DECODE_TOKENS_PER_SECOND = Histogram(
+    'inference_decode_tokens_per_second', 'Decode throughput after the first token',
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200))
+GENERATION_SECONDS = Histogram(
+    'inference_generation_seconds', 'Wall time of a single generate() call',
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+PROMPT_TOKENS = Counter('inference_prompt_tokens', 'Prompt tokens sent to the model')
+GENERATED_TOKENS = Counter('inference_generated_tokens', 'New tokens produced by the model')
+CHAT_RETRIES = Counter('inference_chat_retries', 'Extra generations triggered by incomplete responses in chat()')
+PREFIX_CACHE_LOOKUPS = Counter('inference_prefix_cache_lookups', 'Prompts checked against the prefill cache', ['result'])
+PREFIX_CACHED_TOKENS = Counter('inference_prefix_cached_tokens', 'Prompt tokens taken from the prefill cache instead of prefilled')
+EXPLANATION_CACHE_LOOKUPS = Counter(
+    'inference_explanation_cache_lookups', 'Log analyses checked against cached explanations', ['result'])
+EXPLANATION_CACHE_HIT_RATIO = Gauge('inference_explanation_cache_hit_ratio', 'Share of explanation cache lookups that hit')
+EXPLANATION_CACHE_EVICTIONS = Counter('inference_explanation_cache_evictions', 'Cached explanations evicted to stay within limits')
+CONVERSATION_COMPACTIONS = Counter(
+    'inference_conversation_compactions', 'Background attempts to fold old turns into a summary', ['result'])
+CONVERSATION_SUMMARY_SECONDS = Histogram(
+    'inference_conversation_summary_seconds', 'Wall time of a successful conversation compaction',
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120))
+
+# Load
+QUEUE_DEPTH = Gauge('queue_depth', 'Requests waiting for the model or a job worker', ['queue'])
+ACTIVE_SESSIONS = Gauge('active_sessions', 'Conversation sessions held in memory')
+
+# Log analysis
+LOG_SCAN_MB_PER_SECOND = Histogram(
+    'log_scan_megabytes_per_second', 'LogAnalyzer scan throughput',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+LOG_SCAN_BYTES = Counter('log_scan_bytes', 'Bytes of log content scanned by LogAnalyzer')
+LOG_RULE_MATCHES = Counter('log_rule_matches', 'Log lines attributed to each detection rule', ['rule'])
+LOG_RULE_SECONDS = Counter('log_rule_seconds', 'Time spent matching each detection rule on sampled lines', ['rule'])
+LOG_RULE_SAMPLED_LINES = Counter('log_rule_sampled_lines', 'Log lines timed against every detection rule')
+LOG_RULE_RELOADS = Counter('log_rule_reloads', 'Detection rule pack loads', ['result'])
+
+# Upload storage
+UPLOAD_STORAGE_BYTES = Gauge('upload_storage_bytes', 'Upload store usage', ['kind'])
+UPLOAD_FILES = Gauge('upload_files', 'Files registered in the upload store')
+UPLOAD_EVICTIONS = Counter('upload_evictions', 'Uploads and stray files removed by retention', ['reason'])
+UPLOAD_SWEEP_SECONDS = Histogram(
+    'upload_sweep_seconds', 'Duration of an upload retention sweep',
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 30))
+
+# Process
+PROCESS_RSS_BYTES = Gauge('process_resident_memory_bytes', 'Resident memory size of the server process')
+PROCESS_RSS_BYTES.set_function(process_rss_bytes)
+CUDA_MEMORY_BYTES = Gauge('cuda_memory_bytes', 'CUDA memory held by PyTorch', ['kind'])
+MEMORY_PRESSURE_LEVEL = Gauge('memory_pressure_level', 'Memory governor level (0 normal, 1 elevated, 2 high, 3 critical)')
+MEMORY_SUBSYSTEM_BYTES = Gauge('memory_subsystem_bytes', 'Memory attributed to each subsystem', ['subsystem'])
+MEMORY_SHED_ACTIONS = Counter('memory_shed_actions', 'Load-shedding steps taken under memory pressure', ['action'])
+
+# BTS proxy
+BTS_REQUEST_SECONDS = Histogram(
+    'bts_request_seconds', 'Latency of BTS backend requests', ['endpoint'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10))
+BTS_ERRORS = Counter('bts_errors', 'Failed BTS backend requests', ['endpoint', 'reason'])
+
+# Blocking I/O lanes
+IO_IN_FLIGHT = Gauge('io_in_flight', 'I/O operations running or queued per lane', ['lane'])
+IO_SECONDS = Histogram(
+    'io_operation_seconds', 'Duration of I/O operations per lane', ['lane'],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 120))
+IO_REJECTED = Counter('io_rejected', 'I/O operations refused or abandoned per lane', ['lane', 'reason'])
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+
+import torch
+import transformers
+
+import metrics
+
+# Shorter matches save too little prefill to be worth the lookup
+MIN_PREFIX_TOKENS = 16
+
+
+class PrefixCache:
+    """Prefilled KV state for fixed prompt prefixes, persisted to disk.
+
+    ``register(text)`` prefills a prefix once and saves its key/value tensors
+    under a name derived from the model, its dtype and the prefix tokens, so
+    a restart memory-maps the file instead of prefilling again. ``lookup``
+    finds the registered prefix sharing the longest run of leading tokens
+    with a prompt and returns its KV state cut to that length; with causal
+    attention that slice is exactly what prefilling those tokens would give.
+    The tensors are shared read-only: generate() concatenates new positions
+    onto copies and never writes to them.
+    """
+
+    def __init__(self, model, tokenizer, cache_dir=None, model_id=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.cache_dir = cache_dir
+        config = model.config.to_json_string(use_diff=False)
+        self.fingerprint = '|'.join([
+            model_id or getattr(model.config, '_name_or_path', ''),
+            str(model.dtype),
+            hashlib.sha256(config.encode()).hexdigest(),
+            transformers.__version__,
+        ])
+        self._entries = []  # (input_ids list, past_key_values)
+        self._lock = threading.Lock()
+        self.loaded = 0
+        self.built = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, input_ids):
+        digest = hashlib.sha256(self.fingerprint.encode())
+        digest.update(repr(list(input_ids)).encode())
+        return os.path.join(self.cache_dir, digest.hexdigest()[:32] + '.pt')
+
+    def register(self, text):
+        """Load or prefill the KV state for ``text``; returns its token count"""
+        input_ids = self.tokenizer(text, return_tensors="pt")['input_ids']
+        ids = input_ids[0].tolist()
+        with self._lock:
+            if any(entry_ids == ids for entry_ids, _ in self._entries):
+                return len(ids)
+        past_key_values = self._load(ids) if self.cache_dir else None
+        if past_key_values is None:
+            past_key_values = self._prefill(input_ids)
+            self.built += 1
+            if self.cache_dir:
+                self._save(ids, past_key_values)
+        else:
+            self.loaded += 1
+        with self._lock:
+            if not any(entry_ids == ids for entry_ids, _ in self._entries):
+                self._entries.append((ids, past_key_values))
+        return len(ids)
+
+    def lookup(self, input_ids):
+        """Returns (cached_tokens, past_key_values) for a 1 x n prompt, or (0, None).
+
+        At least one prompt token is always left uncached, since generate()
+        needs the logits of the last one.
+        """
+        ids = input_ids[0].tolist()
+        best_length, best = 0, None
+        with self._lock:
+            entries = list(self._entries)
+        for entry_ids, past_key_values in entries:
+            length = _common_prefix(entry_ids, ids)
+            if length > best_length:
+                best_length, best = length, past_key_values
+        best_length = min(best_length, len(ids) - 1)
+        if best_length < MIN_PREFIX_TOKENS:
+            metrics.PREFIX_CACHE_LOOKUPS.labels('miss').inc()
+            return 0, None
+        metrics.PREFIX_CACHE_LOOKUPS.labels('hit').inc()
+        metrics.PREFIX_CACHED_TOKENS.inc(best_length)
+        return best_length, tuple((key[:, :, :best_length], value[:, :, :best_length]) for key, value in best)
+
+    def clear(self):
+        """Drop the KV state held in memory; files on disk are kept for the next ``register``"""
+        with self._lock:
+            self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def memory_bytes(self):
+        """Size of the cached key/value tensors"""
+        with self._lock:
+            return sum(tensor.element_size() * tensor.nelement()
+                       for _, past_key_values in self._entries for layer in past_key_values for tensor in layer)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'prefixes': len(self._entries),
+                'tokens': [len(ids) for ids, _ in self._entries],
+                'loaded_from_disk': self.loaded,
+                'prefilled': self.built,
+            }
+
+    def _prefill(self, input_ids):
+        with torch.no_grad():
+            outputs = self.model(input_ids.to(self.model.device), use_cache=True)
+        past_key_values = outputs.past_key_values
+        if hasattr(past_key_values, 'to_legacy_cache'):
+            past_key_values = past_key_values.to_legacy_cache()
+        return tuple((key.detach(), value.detach()) for key, value in past_key_values)
+
+    def _save(self, ids, past_key_values):
+        path = self.path_for(ids)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        tensors = [tensor.cpu() for layer in past_key_values for tensor in layer]
+        torch.save({'fingerprint': self.fingerprint, 'input_ids': ids, 'tensors': tensors}, temp_path)
+        os.replace(temp_path, path)
+
+    def _load(self, ids):
+        path = self.path_for(ids)
+        if not os.path.exists(path):
+            return None
+        try:
+            # mmap keeps the tensors in the page cache, shared with other processes
+            data = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+        except Exception as e:
+            print(f"Ignoring unreadable prefix cache file {path}: {str(e)}")
+            return None
+        if data.get('fingerprint') != self.fingerprint or data.get('input_ids') != ids:
+            return None
+        tensors = [tensor.to(self.model.device) for tensor in data['tensors']]
+        return tuple((tensors[i], tensors[i + 1]) for i in range(0, len(tensors), 2))
+
+
+def _common_prefix(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import metrics
+
+try:
+    import yaml
+except ImportError:  # JSON packs still load
+    yaml = None
+
+PACK_EXTENSIONS = ('.yaml', '.yml', '.json')
+SEVERITIES = ('critical', 'error', 'warning')
+DEFAULT_PRIORITY = 100
+# Bump when the cached rule format changes
+CACHE_VERSION = 2
+# Seconds between checks of the rules directory for changes
+RELOAD_CHECK_INTERVAL = 2.0
+# Every this many lines, each rule is timed on its own to estimate its cost
+COST_SAMPLE_EVERY = 64
+
+
+class RulePackError(Exception):
+    """A rule pack could not be read or contains an invalid rule"""
+
+
+class Rule:
+    def __init__(self, spec):
+        self.id = spec['id']
+        self.pack = spec['pack']
+        self.severity = spec['severity']
+        self.only_errors = spec['only_errors']
+        self.message = spec['message']
+        self.priority = spec['priority']
+        self.regex = re.compile(_scoped(spec))
+        self.literals = tuple(spec['literals']) if spec['literals'] else None
+        self.hits = metrics.LOG_RULE_MATCHES.labels(self.id)
+        self.seconds = metrics.LOG_RULE_SECONDS.labels(self.id)
+
+    def issue(self, line_number):
+        return self.message.format(line=line_number)
+
+
+class RuleMatcher:
+    """A merged rule set compiled for matching line after line.
+
+    Python's regex engine gains nothing from joining the rules into one
+    alternation: it still tries every branch at every position. Instead,
+    a rule may list ``literals``, strings one of which any match must
+    contain, and those of all rules are joined into a single lowercase
+    prefilter. Most lines contain none and cost one search; for the rest,
+    only rules whose literals occur are run, in priority order, until one
+    matches. Rules without literals are run on every line.
+    Every ``COST_SAMPLE_EVERY``-th line is instead run through every rule
+    with timing, so each rule's per-line cost can be estimated.
+    """
+
+    def __init__(self, specs, signature=None):
+        self.signature = signature
+        self.rules = [Rule(spec) for spec in specs]
+        # (rules, prefilter, unfiltered) for other lines and for error lines
+        self._plans = (_plan([rule for rule in self.rules if not rule.only_errors]), _plan(self.rules))
+        self._lines = 0
+
+    def match(self, text, error_line):
+        """First rule by priority that matches ``text``, or None.
+
+        Rules marked ``only_errors`` are only tried when ``error_line`` is set.
+        """
+        self._lines += 1
+        if self._lines % COST_SAMPLE_EVERY == 0:
+            return self._match_timed(text, error_line)
+        rules, prefilter, unfiltered = self._plans[error_line]
+        if not rules:
+            return None
+        # Outside ASCII, case-insensitive matching goes beyond str.lower()
+        lowered = text.lower() if text.isascii() else None
+        if lowered is not None and not unfiltered and not prefilter.search(lowered):
+            return None
+        for rule in rules:
+            if lowered is not None and rule.literals and not any(literal in lowered for literal in rule.literals):
+                continue
+            if rule.regex.search(text):
+                rule.hits.inc()
+                return rule
+        return None
+
+    def _match_timed(self, text, error_line):
+        metrics.LOG_RULE_SAMPLED_LINES.inc()
+        matched = None
+        for rule in self.rules:
+            started = time.perf_counter()
+            found = rule.regex.search(text)
+            rule.seconds.inc(time.perf_counter() - started)
+            if found and matched is None and (error_line or not rule.only_errors):
+                matched = rule
+        if matched is not None:
+            matched.hits.inc()
+        return matched
+
+    def stats(self):
+        """Hits and estimated cost per rule, costliest first"""
+        sampled = metrics.LOG_RULE_SAMPLED_LINES.value
+        rows = [{
+            'id': rule.id,
+            'pack': rule.pack,
+            'severity': rule.severity,
+            'priority': rule.priority,
+            'hits': int(rule.hits.value),
+            'sampled_seconds': round(rule.seconds.value, 6),
+            'microseconds_per_line': round(rule.seconds.value / sampled * 1e6, 3) if sampled else None,
+        } for rule in self.rules]
+        rows.sort(key=lambda row: row['sampled_seconds'], reverse=True)
+        return rows
+
+
+class RuleSet:
+    """Rule packs from a directory, merged with built-in rules and kept current.
+
+    Pack files are YAML or JSON: a list of rules, or a mapping with ``pack``
+    (a name) and ``rules``. Rules are merged by ``id`` in file-name order, so
+    a later pack can replace a rule, or drop it with ``enabled: false``. The
+    validated, merged rules are cached on disk by the files' names, sizes and
+    modification times; the cache skips parsing and validation on startup and
+    in every worker process. ``matcher()`` reloads the packs when they change
+    (checked at most every ``check_interval`` seconds). A pack that fails to
+    load leaves the previous rules in place and is reported in ``status()``.
+    """
+
+    def __init__(self, rules_dir, builtin_rules=(), cache_dir=None, check_interval=RELOAD_CHECK_INTERVAL):
+        self.rules_dir = rules_dir
+        self.builtin_rules = list(builtin_rules)
+        self.cache_dir = cache_dir or os.path.join(rules_dir, '.cache')
+        self.check_interval = check_interval
+        self.last_error = None
+        self.loaded_at = None
+        self._matcher = None
+        self._failed_signature = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def matcher(self):
+        """The current RuleMatcher, reloaded first if the packs have changed"""
+        if self._matcher is None or time.monotonic() - self._checked >= self.check_interval:
+            self.reload()
+        return self._matcher
+
+    def reload(self, force=False):
+        """Load the packs if they changed (or ``force``); True if new rules are in use"""
+        with self._lock:
+            self._checked = time.monotonic()
+            files = self._pack_files()
+            signature = self._signature(files)
+            if not force and self._matcher is not None and signature in (self._matcher.signature,
+                                                                          self._failed_signature):
+                return False
+            try:
+                specs = self._load(files, signature)
+                matcher = RuleMatcher(specs, signature)
+            except RulePackError as e:
+                self.last_error = str(e)
+                self._failed_signature = signature
+                metrics.LOG_RULE_RELOADS.labels('error').inc()
+                if self._matcher is None:
+                    # Never start without the built-in rules
+                    self._matcher = RuleMatcher(self._merge([('builtin', self.builtin_rules)]))
+                return False
+            self._matcher = matcher
+            self._failed_signature = None
+            self.last_error = None
+            self.loaded_at = time.time()
+            metrics.LOG_RULE_RELOADS.labels('ok').inc()
+            return True
+
+    def status(self):
+        matcher = self.matcher()
+        return {
+            'rules_dir': self.rules_dir,
+            'packs': sorted({rule.pack for rule in matcher.rules}),
+            'rule_count': len(matcher.rules),
+            'loaded_at': self.loaded_at,
+            'last_error': self.last_error,
+            'rules': matcher.stats(),
+        }
+
+    def _pack_files(self):
+        try:
+            entries = sorted(os.scandir(self.rules_dir), key=lambda entry: entry.name)
+        except FileNotFoundError:
+            return []
+        return [entry for entry in entries
+                if entry.is_file() and entry.name.endswith(PACK_EXTENSIONS) and not entry.name.startswith('.')]
+
+    def _signature(self, files):
+        state = [CACHE_VERSION, self.builtin_rules]
+        for entry in files:
+            stat = entry.stat()
+            state.append([entry.name, stat.st_size, stat.st_mtime_ns])
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _load(self, files, signature):
+        cache_path = os.path.join(self.cache_dir, f'rules-{signature}.json')
+        try:
+            with open(cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+        packs = [('builtin', self.builtin_rules)]
+        packs.extend(_read_pack(entry.path) for entry in files)
+        specs = self._merge(packs)
+        self._save(cache_path, specs)
+        return specs
+
+    def _merge(self, packs):
+        merged = {}
+        for pack, rules in packs:
+            for index, rule in enumerate(rules):
+                spec = _validate(rule, pack, index)
+                if spec is None:
+                    merged.pop(rule['id'], None)
+                else:
+                    merged[spec['id']] = spec
+        # Stable: rules of equal priority keep pack and file order
+        return sorted(merged.values(), key=lambda spec: spec['priority'])
+
+    def _save(self, cache_path, specs):
+        """Write the merged rules atomically and drop older cache files"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(specs, f)
+            os.replace(temp_path, cache_path)
+            for name in os.listdir(self.cache_dir):
+                if name.startswith('rules-') and name.endswith('.json') and os.path.join(self.cache_dir, name) != cache_path:
+                    os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass  # The cache only saves time; a read-only rules directory still works
+
+
+def _read_pack(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    is_json = path.endswith('.json')
+    if not is_json and yaml is None:
+        raise RulePackError(f'{path}: PyYAML is not installed')
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f) if is_json else yaml.safe_load(f)
+    except Exception as e:  # OSError, ValueError or yaml.YAMLError
+        raise RulePackError(f'{path}: {e}')
+    if isinstance(data, dict):
+        name = data.get('pack', name)
+        data = data.get('rules')
+    if not isinstance(data, list):
+        raise RulePackError(f'{path}: expected a list of rules')
+    return name, data
+
+
+def _validate(rule, pack, index):
+    """Normalized rule, or None for a rule that is switched off"""
+    if not isinstance(rule, dict) or not rule.get('id'):
+        raise RulePackError(f'{pack}: rule {index + 1} has no id')
+    rule_id = str(rule['id'])
+    if rule.get('enabled', True) is False:
+        return None
+    if not rule.get('pattern'):
+        raise RulePackError(f'{pack}: rule {rule_id} has no pattern')
+    severity = rule.get('severity', 'error')
+    if severity not in SEVERITIES:
+        raise RulePackError(f"{pack}: rule {rule_id}: severity must be one of {', '.join(SEVERITIES)}")
+    spec = {
+        'id': rule_id,
+        'pack': pack,
+        'pattern': str(rule['pattern']),
+        'ignore_case': bool(rule.get('ignore_case', True)),
+        'severity': severity,
+        'only_errors': bool(rule.get('only_errors', False)),
+        'message': str(rule.get('message', f'{rule_id} at line {{line}}')),
+        'priority': rule.get('priority', DEFAULT_PRIORITY),
+    }
+    if not isinstance(spec['priority'], int):
+        raise RulePackError(f'{pack}: rule {rule_id}: priority must be an integer')
+    literals = rule.get('literals')
+    if literals is not None and not (isinstance(literals, list) and literals
+                                     and all(isinstance(literal, str) and literal for literal in literals)):
+        raise RulePackError(f'{pack}: rule {rule_id}: literals must be a list of non-empty strings')
+    # Matched against the lowercased line, whatever the rule's ignore_case
+    spec['literals'] = sorted({literal.lower() for literal in literals}) if literals else None
+    try:
+        re.compile(_scoped(spec))
+        spec['message'].format(line=1)
+    except re.error as e:
+        raise RulePackError(f'{pack}: rule {rule_id}: invalid pattern: {e}')
+    except (KeyError, IndexError, ValueError) as e:
+        raise RulePackError(f'{pack}: rule {rule_id}: invalid message: {e}')
+    return spec
+
+
+def _scoped(spec):
+    """The rule's pattern as a group carrying its own flags, for use in an alternation"""
+    return f"(?{'i' if spec['ignore_case'] else ''}:{spec['pattern']})"
+
+
+def _plan(rules):
+    literals = {literal for rule in rules if rule.literals for literal in rule.literals}
+    prefilter = re.compile('|'.join(map(re.escape, sorted(literals, key=len, reverse=True)))) if literals else None
+    return rules, prefilter, any(rule.literals is None for rule in rules)
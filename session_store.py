@@ -0,0 +1,269 @@
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+# Rough per-turn overhead (dict, keys, timestamp) on top of the text itself
+TURN_OVERHEAD_BYTES = 200
+
+
+def history_size(history):
+    """Approximate memory footprint of a conversation history in bytes"""
+    size = 0
+    for turn in history:
+        size += TURN_OVERHEAD_BYTES
+        for value in turn.values():
+            if isinstance(value, str):
+                size += len(value)
+    return size
+
+
+class SessionStore(MutableMapping):
+    """Bounded conversation store keyed by session ID.
+
+    Behaves like the plain dict it replaces, but keeps at most
+    ``max_sessions`` histories and roughly ``max_bytes`` of text in memory,
+    evicting the least recently used first, and drops sessions idle for longer
+    than ``idle_ttl`` seconds. Expiry checks are amortized: a compaction pass
+    runs at most every ``compaction_interval`` seconds during normal writes.
+
+    With ``db_path`` set, histories are also persisted to SQLite. Writes are
+    write-behind: assignments only queue a snapshot, and a background thread
+    flushes queued snapshots in one transaction every ``flush_interval``
+    seconds, so the request path never waits on disk. A session that is not in
+    memory is read back from SQLite on first access.
+    """
+
+    def __init__(self, max_sessions=1000, idle_ttl=6 * 3600, max_bytes=64 * 1024 * 1024,
+                 db_path=None, persist_ttl=7 * 24 * 3600, flush_interval=2.0,
+                 compaction_interval=60.0):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.persist_ttl = persist_ttl
+        self.flush_interval = flush_interval
+        self.compaction_interval = compaction_interval
+        self._lock = threading.RLock()
+        self._data = OrderedDict()  # session_id -> history, least recently used first
+        self._sizes = {}
+        self._last_access = {}
+        self._total_bytes = 0
+        self._last_compaction = time.monotonic()
+        self.evictions = 0
+
+        self.db_path = db_path
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._pending = {}  # session_id -> JSON snapshot, or None for deletion
+        self._wakeup = threading.Event()
+        self._closed = False
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            with self._db_lock:
+                self._db.execute('PRAGMA journal_mode=WAL')
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS sessions ('
+                    'session_id TEXT PRIMARY KEY, history TEXT NOT NULL, updated_at REAL NOT NULL)'
+                )
+                self._db.commit()
+            self._writer = threading.Thread(target=self._write_loop, name='session-writer', daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    # Mapping interface
+
+    def __getitem__(self, session_id):
+        with self._lock:
+            if session_id in self._data:
+                self._touch(session_id)
+                return self._data[session_id]
+        history = self._load(session_id)
+        if history is None:
+            raise KeyError(session_id)
+        with self._lock:
+            if session_id not in self._data:
+                self._put(session_id, history)
+            self._touch(session_id)
+            return self._data[session_id]
+
+    def __setitem__(self, session_id, history):
+        with self._lock:
+            self._put(session_id, history)
+            self._touch(session_id)
+            self._queue_write(session_id, history)
+            self._enforce_limits(keep=session_id)
+            self._maybe_compact()
+
+    def __delitem__(self, session_id):
+        with self._lock:
+            found = session_id in self._data
+            if found:
+                self._remove(session_id)
+            if self._db is not None:
+                self._pending[session_id] = None
+                self._wakeup.set()
+            elif not found:
+                raise KeyError(session_id)
+
+    def __contains__(self, session_id):
+        with self._lock:
+            if session_id in self._data:
+                return True
+        try:
+            self[session_id]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._data.keys()))
+
+    def __len__(self):
+        return len(self._data)
+
+    # Maintenance
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def stats(self):
+        return {
+            'sessions': len(self._data),
+            'bytes': self._total_bytes,
+            'max_sessions': self.max_sessions,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'pending_writes': len(self._pending),
+            'persistent': self._db is not None,
+        }
+
+    def compact(self):
+        """Drop idle sessions, enforce caps and purge expired rows on disk"""
+        with self._lock:
+            now = time.monotonic()
+            self._last_compaction = now
+            cutoff = now - self.idle_ttl
+            expired = [sid for sid, seen in self._last_access.items() if seen < cutoff]
+            for session_id in expired:
+                self._remove(session_id)
+                self.evictions += 1
+            self._enforce_limits()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute('DELETE FROM sessions WHERE updated_at < ?', (time.time() - self.persist_ttl,))
+                self._db.commit()
+        return len(expired)
+
+    def shrink(self, target_bytes):
+        """Evict least recently used sessions until memory use is under ``target_bytes``"""
+        with self._lock:
+            evicted = 0
+            while self._data and self._total_bytes > target_bytes:
+                session_id = next(iter(self._data))
+                self._remove(session_id)
+                self.evictions += 1
+                evicted += 1
+            return evicted
+
+    def flush(self):
+        """Write all queued snapshots to disk now"""
+        if self._db is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        now = time.time()
+        with self._db_lock:
+            for session_id, snapshot in pending.items():
+                if snapshot is None:
+                    self._db.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+                else:
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO sessions (session_id, history, updated_at) VALUES (?, ?, ?)',
+                        (session_id, snapshot, now)
+                    )
+            self._db.commit()
+
+    def close(self):
+        if self._db is None or self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+
+    # Internals (callers hold self._lock unless noted)
+
+    def _touch(self, session_id):
+        self._data.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+
+    def _put(self, session_id, history):
+        size = history_size(history)
+        self._total_bytes += size - self._sizes.get(session_id, 0)
+        self._sizes[session_id] = size
+        self._data[session_id] = history
+
+    def _remove(self, session_id):
+        self._data.pop(session_id, None)
+        self._total_bytes -= self._sizes.pop(session_id, 0)
+        self._last_access.pop(session_id, None)
+
+    def _enforce_limits(self, keep=None):
+        while self._data and (len(self._data) > self.max_sessions or self._total_bytes > self.max_bytes):
+            session_id = next(iter(self._data))
+            if session_id == keep:
+                if len(self._data) == 1:
+                    break
+                self._data.move_to_end(session_id)
+                continue
+            self._remove(session_id)
+            self.evictions += 1
+
+    def _maybe_compact(self):
+        if time.monotonic() - self._last_compaction >= self.compaction_interval:
+            # Run outside the caller's critical section
+            threading.Thread(target=self.compact, name='session-compact', daemon=True).start()
+            self._last_compaction = time.monotonic()
+
+    def _queue_write(self, session_id, history):
+        if self._db is not None:
+            # Snapshot now so later in-place edits cannot race the writer
+            self._pending[session_id] = json.dumps(history)
+            self._wakeup.set()
+
+    def _load(self, session_id):
+        """Read a persisted history (no lock held)"""
+        if self._db is None or self._closed:
+            return None
+        with self._lock:
+            if session_id in self._pending:
+                snapshot = self._pending[session_id]
+                return None if snapshot is None else json.loads(snapshot)
+        with self._db_lock:
+            row = self._db.execute(
+                'SELECT history, updated_at FROM sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+        if row is None or row[1] < time.time() - self.persist_ttl:
+            return None
+        return json.loads(row[0])
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wakeup.wait()
+            if self._closed:
+                break
+            # Batch up writes that arrive close together
+            time.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Error persisting sessions: {str(e)}")
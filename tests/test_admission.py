@@ -0,0 +1,110 @@
+import pytest
+import threading
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionController, AdmissionRejected, LANE_INTERACTIVE, LANE_BULK
+
+
+@pytest.fixture
+def controller():
+    """Create a single-slot admission controller with small queues."""
+    return AdmissionController(
+        slots=1,
+        max_queue={LANE_INTERACTIVE: 2, LANE_BULK: 2},
+        session_limits={LANE_INTERACTIVE: 1, LANE_BULK: 2},
+        initial_service_time=5.0
+    )
+
+
+def test_admit_and_release(controller):
+    """Test that a request gets the slot and gives it back."""
+    with controller.admit('s1', LANE_INTERACTIVE):
+        assert controller.stats()['running'] == 1
+    assert controller.stats()['running'] == 0
+
+
+def test_session_limit_rejects(controller):
+    """Test that per-session caps reject extra concurrent requests."""
+    ticket = controller.reserve('s1', LANE_INTERACTIVE)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.reserve('s1', LANE_INTERACTIVE)
+    assert excinfo.value.retry_after > 0
+    ticket.release()
+    controller.reserve('s1', LANE_INTERACTIVE).release()
+
+
+def test_full_queue_rejects_with_retry_after(controller):
+    """Test that a full lane rejects with an estimated wait."""
+    running = controller.admit('a', LANE_BULK)
+    controller.reserve('b', LANE_BULK)
+    controller.reserve('c', LANE_BULK)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.reserve('d', LANE_BULK)
+    assert excinfo.value.retry_after >= 10
+    assert int(excinfo.value.retry_after_header) >= 10
+    running.release()
+
+
+def test_interactive_goes_before_bulk(controller):
+    """Test that a queued interactive request is served before queued bulk work."""
+    running = controller.admit('a', LANE_BULK)
+    bulk = controller.reserve('b', LANE_BULK)
+    interactive = controller.reserve('c', LANE_INTERACTIVE)
+    order = []
+
+    def serve(ticket, name):
+        with ticket.wait(timeout=5):
+            order.append(name)
+
+    threads = [threading.Thread(target=serve, args=(bulk, 'bulk')),
+               threading.Thread(target=serve, args=(interactive, 'interactive'))]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    running.release()
+    for t in threads:
+        t.join(5)
+    assert order == ['interactive', 'bulk']
+
+
+def test_wait_timeout_frees_queue_position(controller):
+    """Test that timing out removes the request from its lane."""
+    running = controller.admit('a', LANE_INTERACTIVE)
+    with pytest.raises(AdmissionRejected):
+        controller.admit('b', LANE_INTERACTIVE, timeout=0.05)
+    assert controller.queue_depth(LANE_INTERACTIVE) == 0
+    running.release()
+
+
+def test_idle_only_without_running_or_queued_requests(controller):
+    """Test that the controller reports idle only when nothing uses or waits for the model."""
+    assert controller.idle()
+    with controller.admit('s1', LANE_INTERACTIVE):
+        assert not controller.idle()
+    running = controller.admit('s1', LANE_BULK)
+    queued = controller.reserve('s2', LANE_BULK)
+    waiter = threading.Thread(target=lambda: queued.wait(timeout=5))
+    waiter.start()
+    time.sleep(0.05)
+    running.release()
+    waiter.join(5)
+    assert not controller.idle()
+    queued.release()
+    assert controller.idle()
+
+
+def test_reserved_tickets_do_not_block_the_lane(controller):
+    """Test that a ticket whose work is not ready for the model neither blocks later tickets nor the idle check."""
+    preparing = controller.reserve('s1', LANE_BULK)
+    assert controller.idle()
+    assert controller.queue_depth(LANE_BULK) == 1
+    ready = controller.reserve('s2', LANE_BULK)
+    with ready.wait(timeout=1):
+        assert not controller.idle()
+    preparing.release()
+    assert controller.idle() and controller.queue_depth(LANE_BULK) == 0
@@ -60,3 +60,161 @@ def test_chat_endpoint_structure(client):
     if response.status_code == 200:
         data = json.loads(response.data)
         assert 'response' in data
+
+def test_job_status_unknown_job(client):
+    """Test that polling an unknown job returns 404."""
+    response = client.get('/jobs/nonexistent')
+    assert response.status_code == 404
+
+def test_metrics_endpoint(client):
+    """Test that the metrics endpoint exposes Prometheus text."""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.data.decode()
+    assert 'inference_time_to_first_token_seconds_bucket' in text
+    assert 'log_scan_megabytes_per_second' in text
+
+def test_chunked_upload_rejects_bad_requests(client):
+    """Test chunked upload validation and unknown upload IDs."""
+    response = client.post('/upload/init', json={'filename': 'core.exe', 'size': 10})
+    assert response.status_code == 400
+    response = client.get('/upload/doesnotexist')
+    assert response.status_code == 404
+    response = client.put('/upload/doesnotexist/chunks/0', data=b'data')
+    assert response.status_code == 404
+
+def test_bts_bugs_filters_pages_and_etags(client):
+    """Test the /bts/bugs query parameters and conditional requests."""
+    import app as app_module
+    from benchmarks.loadtest import FakeBTS, make_bugs
+    bts = FakeBTS(make_bugs(30)).start()
+    saved = app_module.bts_client
+    app_module.bts_client = app_module.create_bts_client(bts.url)
+    try:
+        response = client.get('/bts/bugs?priority=critical&sort=-id&limit=2')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['page'] == 1 and len(data['bugs']) <= 2
+        assert all(bug['priority'] == 'critical' for bug in data['bugs'])
+        assert data['pages'] == (data['total'] + 1) // 2
+        etag = response.headers['ETag']
+        again = client.get('/bts/bugs?priority=critical&sort=-id&limit=2', headers={'If-None-Match': etag})
+        assert again.status_code == 304
+        assert client.get('/bts/bugs?sort=color').status_code == 400
+    finally:
+        app_module.bts_client = saved
+        bts.stop()
+
+def test_bts_similar_endpoint(client):
+    """Test that /bts/similar returns ranked bugs for free text."""
+    import app as app_module
+    from benchmarks.loadtest import FakeBTS, make_bugs
+    bts = FakeBTS(make_bugs(30)).start()
+    saved = app_module.bts_client
+    app_module.bts_client = app_module.create_bts_client(bts.url)
+    try:
+        response = client.post('/bts/similar', json={'text': 'storage crash', 'k': 3})
+        assert response.status_code == 200
+        results = json.loads(response.data)['results']
+        assert 0 < len(results) <= 3
+        assert all('Storage' in bug['title'] for bug in results)
+        assert client.post('/bts/similar', json={}).status_code == 400
+    finally:
+        app_module.bts_client = saved
+        bts.stop()
+
+def test_correlated_analysis_needs_several_files(client):
+    """Test correlated analysis rejects fewer than two files and unknown IDs."""
+    response = client.post('/analyze/correlated', json={'file_ids': ['only-one']})
+    assert response.status_code == 400
+    response = client.post('/analyze/correlated', json={'file_ids': ['missing-a', 'missing-b']})
+    assert response.status_code == 404
+
+def test_analysis_is_refused_under_critical_memory_pressure(client, monkeypatch):
+    """Test that new analysis jobs get 429 with Retry-After when memory is nearly exhausted."""
+    import io
+    import app as app_module
+    from memory_governor import CRITICAL, MemoryGovernor
+    upload = client.post('/upload', data={'file': (io.BytesIO(b'ERROR boom\n'), 'boom.log')},
+                         content_type='multipart/form-data')
+    file_id = json.loads(upload.data)['file']['id']
+    governor = MemoryGovernor(1000, rss=lambda: 990)
+    governor.poll()
+    assert governor.level == CRITICAL
+    monkeypatch.setattr(app_module, 'memory_governor', governor)
+    response = client.post(f'/analyze/{file_id}')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '10'
+    assert governor.stats()['rejected_jobs'] == 1
+
+def test_fetch_log_copies_file_and_times_out_on_slow_paths(client, tmp_path, monkeypatch):
+    """Test /fetch-log for a readable file, a missing one and one whose read hangs."""
+    import time
+    import app as app_module
+    log = tmp_path / 'service.log'
+    log.write_text('ERROR disk failure\n')
+    response = client.post('/fetch-log', json={'path': str(log), 'filename': 'service.log'})
+    assert response.status_code == 200
+    assert json.loads(response.data)['file']['filename'] == 'service.log'
+    missing = client.post('/fetch-log', json={'path': str(tmp_path / 'gone.log'), 'filename': 'gone.log'})
+    assert missing.status_code == 404
+
+    def hang(session_id, file_path, filename, cancel_event):
+        cancel_event.wait(5)
+    monkeypatch.setattr(app_module, 'fetch_into_store', hang)
+    monkeypatch.setattr(app_module.io_pool.lanes['fs'], 'timeout', 0.1)
+    started = time.monotonic()
+    response = client.post('/fetch-log', json={'path': str(log), 'filename': 'service.log'})
+    assert response.status_code == 504
+    assert time.monotonic() - started < 2
+
+def test_bts_similar_reads_uploaded_file_pinned(client, monkeypatch):
+    """Test that /bts/similar with a file_id routes dumps to the dump analyzer and releases the pin."""
+    import io
+    import app as app_module
+    from benchmarks.loadtest import FakeBTS, make_bugs
+    from log_analyzer import LogAnalyzer
+    upload = client.post('/upload', data={'file': (io.BytesIO(b'MDMP....'), 'crash.dmp')},
+                         content_type='multipart/form-data')
+    file_id = json.loads(upload.data)['file']['id']
+    analyzed = []
+    monkeypatch.setattr(app_module, 'detect_dump_format', lambda path: 'minidump')
+    monkeypatch.setattr(app_module, 'analyze_dump',
+                        lambda path: analyzed.append(path) or LogAnalyzer.extract_key_info('ERROR storage crash\n'))
+    bts = FakeBTS(make_bugs(30)).start()
+    saved = app_module.bts_client
+    app_module.bts_client = app_module.create_bts_client(bts.url)
+    try:
+        response = client.post('/bts/similar', json={'file_id': file_id, 'k': 3})
+        assert response.status_code == 200
+        assert len(analyzed) == 1
+        assert app_module.upload_registry.get(file_id).pins == 0
+        assert client.post('/bts/similar', json={'file_id': 'missing'}).status_code == 404
+    finally:
+        app_module.bts_client = saved
+        bts.stop()
+
+def test_memory_pressure_flushes_sessions_without_dropping_them(monkeypatch, tmp_path):
+    """Test that shedding memory writes queued conversations out instead of evicting them."""
+    import types
+    import app as app_module
+    from session_store import SessionStore
+    db_path = str(tmp_path / 'sessions.db')
+    store = SessionStore(db_path=db_path, flush_interval=3600)
+    store['a'] = [{'user': 'remember me', 'assistant': 'ok'}]
+    monkeypatch.setattr(app_module, 'chatbot', types.SimpleNamespace(conversations=store))
+    for subsystem in app_module.memory_governor.subsystems.values():
+        subsystem.shed(0.25)
+    assert store['a'][0]['user'] == 'remember me'
+    restarted = SessionStore(db_path=db_path)
+    assert 'a' in restarted
+    restarted.close()
+    store.close()
+
+def test_import_starts_no_background_threads():
+    """Test that the sweeper, memory governor and summarizer only start with the server."""
+    import app as app_module
+    assert app_module.retention._thread is None
+    assert app_module.memory_governor._thread is None
+    assert app_module.conversation_summarizer._thread is None
@@ -0,0 +1,41 @@
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip('torch')
+pytest.importorskip('tokenizers')
+
+from benchmarks.bench_generation import compare, run_benchmark
+
+
+def test_sweep_runs_offline_on_tiny_model():
+    """Test a small sweep against the random-weight model."""
+    report = run_benchmark(lengths=('system', 256), max_new_tokens=(8,), attentions=('eager', 'no_such_attention'),
+                           repeat=1, warmup=0)
+    measured = [case for case in report['cases'] if 'skipped' not in case]
+    skipped = [case for case in report['cases'] if 'skipped' in case]
+
+    assert [case['length'] for case in measured] == ['system', 256]
+    assert measured[0]['prompt_tokens'] < measured[1]['prompt_tokens'] <= 256
+    for case in measured:
+        assert case['generated_tokens'] == 8
+        assert 0 < case['prefill_ms'] <= case['ttft_ms']
+        assert case['decode_tokens_per_second'] > 0 and case['peak_memory_bytes'] > 0
+    assert len(skipped) == 2 and all(case['attention'] == 'no_such_attention' for case in skipped)
+
+
+def test_comparison_flags_regressions_beyond_threshold():
+    """Test baseline comparison in both directions of 'better'."""
+    case = {'length': 512, 'max_new_tokens': 64, 'dtype': 'float32', 'quantization': 'none', 'attention': 'sdpa'}
+    baseline = {'cases': [{**case, 'prefill_ms': 100.0, 'ttft_ms': 110.0, 'decode_tokens_per_second': 50.0,
+                           'peak_memory_bytes': 1000}]}
+    report = {'cases': [{**case, 'prefill_ms': 105.0, 'ttft_ms': 100.0, 'decode_tokens_per_second': 40.0,
+                         'peak_memory_bytes': 1000}]}
+
+    comparison = compare(report, baseline, max_regression=10)
+
+    assert comparison['cases'][0]['prefill_ms']['change_pct'] == 5.0
+    assert comparison['regressions'] == ['512/64/float32/none/sdpa: decode_tokens_per_second -20.0%']
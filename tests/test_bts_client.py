@@ -0,0 +1,80 @@
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.loadtest import FakeBTS, make_bugs
+from bts_client import BTSClient, BTSError
+
+
+@pytest.fixture
+def bts():
+    """Start a fake BTS backend."""
+    server = FakeBTS(make_bugs(20)).start()
+    yield server
+    server.stop()
+
+
+def test_list_is_cached_and_revalidated(bts):
+    """Test that the list is served from cache, then revalidated with a 304."""
+    client = BTSClient(bts.url, ttl=60)
+    assert len(client.list_bugs()) == 20
+    client.list_bugs()
+    assert bts.requests == ['/api/bugs']
+    client.invalidate()
+    assert len(client.list_bugs()) == 20
+    assert len(bts.requests) == 2
+    assert client.stats()['hits'] == 1
+
+
+def test_get_bug_uses_index_when_fresh(bts):
+    """Test that a detail lookup after a list fetch does not hit the backend."""
+    client = BTSClient(bts.url, ttl=60)
+    client.list_bugs()
+    bug_id = bts.bugs[5]['id']
+    assert client.get_bug(bug_id)['id'] == bug_id
+    assert bts.requests == ['/api/bugs']
+
+
+def test_get_bug_fetches_single_bug(bts):
+    """Test that a cold lookup fetches only the requested bug."""
+    client = BTSClient(bts.url, ttl=60)
+    bug_id = bts.bugs[3]['id']
+    assert client.get_bug(bug_id)['id'] == bug_id
+    assert client.get_bug('BUG-MISSING') is None
+    assert bts.requests == [f'/api/bugs/{bug_id}', '/api/bugs/BUG-MISSING']
+    assert client.supports_single_fetch
+
+
+def test_falls_back_without_single_bug_route():
+    """Test that older backends are served from the indexed list."""
+    bts = FakeBTS(make_bugs(5), single_fetch=False).start()
+    try:
+        client = BTSClient(bts.url, ttl=60)
+        bug_id = bts.bugs[2]['id']
+        assert client.get_bug(bug_id)['id'] == bug_id
+        assert client.supports_single_fetch is False
+        assert client.get_bug(bts.bugs[4]['id']) is not None
+        assert bts.requests == [f'/api/bugs/{bug_id}', '/api/bugs']
+    finally:
+        bts.stop()
+
+
+def test_connection_error_maps_to_503():
+    """Test that an unreachable backend raises a BTSError with status 503."""
+    client = BTSClient('http://127.0.0.1:9/api', timeout=1)
+    with pytest.raises(BTSError) as excinfo:
+        client.list_bugs()
+    assert excinfo.value.status == 503
+
+
+def test_clear_drops_the_cached_list(bts):
+    """Test that lookups after clear() fetch the list again instead of returning nothing."""
+    client = BTSClient(bts.url, ttl=60)
+    client.list_bugs()
+    client.clear()
+    assert not client.fresh and client.stats()['cached_bugs'] == 0
+    assert len(client.list_bugs()) == 20
+    assert bts.requests == ['/api/bugs', '/api/bugs']
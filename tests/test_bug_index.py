@@ -0,0 +1,56 @@
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bug_index import BugIndex
+
+BUGS = [
+    {'id': 'BUG-1', 'title': 'Audio crackles on HDMI', 'description': 'PipeWire underrun',
+     'status': 'new', 'priority': 'low', 'category': 'Audio', 'createdAt': '2025-01-03', 'tags': ['hdmi']},
+    {'id': 'BUG-2', 'title': 'Kernel panic on resume', 'description': 'amdgpu fence timeout',
+     'status': 'open', 'priority': 'critical', 'category': 'Kernel', 'createdAt': '2025-01-01', 'tags': []},
+    {'id': 'BUG-3', 'title': 'Wi-Fi drops', 'description': 'iwlwifi firmware crash',
+     'status': 'closed', 'priority': 'high', 'category': 'Network', 'createdAt': '2025-01-02', 'tags': []},
+    {'id': 'BUG-4', 'title': 'HDMI audio missing after update', 'description': 'No sink listed',
+     'status': 'open', 'priority': 'medium', 'category': 'Audio', 'createdAt': '2025-01-04', 'tags': ['hdmi']},
+]
+
+
+@pytest.fixture
+def index():
+    """Create an index over a small bug list."""
+    return BugIndex(BUGS)
+
+
+def test_facet_filters_are_case_insensitive_and_combine(index):
+    """Test that facet values OR together and facets AND together."""
+    bugs, total = index.query({'category': ['audio']})
+    assert total == 2
+    bugs, total = index.query({'category': ['Audio'], 'status': ['open', 'closed']})
+    assert [b['id'] for b in bugs] == ['BUG-4']
+
+
+def test_text_query_matches_all_terms(index):
+    """Test that every query term must appear in the bug text or tags."""
+    bugs, total = index.query(q='hdmi audio')
+    assert {b['id'] for b in bugs} == {'BUG-1', 'BUG-4'}
+    bugs, total = index.query(q='firmware crash')
+    assert [b['id'] for b in bugs] == ['BUG-3']
+
+
+def test_sort_and_pagination(index):
+    """Test sort keys, descending order and page slicing."""
+    bugs, total = index.query(sort='priority')
+    assert [b['id'] for b in bugs] == ['BUG-2', 'BUG-3', 'BUG-4', 'BUG-1']
+    bugs, total = index.query(sort='-createdAt', page=2, limit=3)
+    assert total == 4
+    assert [b['id'] for b in bugs] == ['BUG-2']
+
+
+def test_invalid_sort_raises(index):
+    """Test that unknown sort keys are rejected."""
+    with pytest.raises(ValueError):
+        index.query(sort='color')
@@ -0,0 +1,66 @@
+import pytest
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bug_similarity import BugSimilarityIndex, findings_to_text
+
+BUGS = [
+    {'id': 'BUG-1', 'title': 'Segmentation fault in libvulkan during shader compile',
+     'description': 'Game crashes with SIGSEGV in vkCreateGraphicsPipelines'},
+    {'id': 'BUG-2', 'title': 'Out of memory when indexing large repositories',
+     'description': 'Indexer is killed by the OOM killer after heap grows past 8GB'},
+    {'id': 'BUG-3', 'title': 'Bluetooth headset disconnects',
+     'description': 'A2DP sink drops every few minutes'},
+]
+
+
+@pytest.fixture
+def index():
+    """Create a similarity index over a few bugs."""
+    index = BugSimilarityIndex()
+    index.sync(BUGS)
+    return index
+
+
+def test_query_ranks_matching_bug_first(index):
+    """Test that free text finds the bug that shares its rare terms."""
+    results = index.query('SIGSEGV in libvulkan while compiling shader', k=2)
+    assert results[0]['id'] == 'BUG-1'
+    assert 0 < results[0]['score'] < 1
+
+
+def test_findings_query(index):
+    """Test that LogAnalyzer findings can be used as the query."""
+    findings = {
+        'summary': 'Found 1 error(s) including 1 critical issue(s)',
+        'critical_issues': ['Memory issue detected at line 3'],
+        'errors': [{'line': 3, 'content': 'FATAL out of memory: heap exhausted in indexer'}],
+        'stack_traces': [],
+    }
+    assert index.query(findings_to_text(findings))[0]['id'] == 'BUG-2'
+
+
+def test_sync_is_incremental(index):
+    """Test that only changed bugs are re-indexed and removed bugs disappear."""
+    changed = [dict(BUGS[0]), dict(BUGS[1], title='Indexer stalls on network drives',
+                                   description='Hangs reading SMB shares')]
+    assert index.sync(changed) == (0, 1, 1)
+    assert index.query('bluetooth a2dp headset') == []
+    assert index.query('out of memory oom killer') == []
+    assert index.query('smb shares hang')[0]['id'] == 'BUG-2'
+
+
+def test_query_cost_does_not_scale_with_unrelated_bugs():
+    """Test that a query with rare terms stays fast on a large index."""
+    index = BugSimilarityIndex()
+    index.sync([{'id': f'BUG-{i}', 'title': f'Widget {i} misaligned', 'description': f'token{i} layout glitch'}
+                for i in range(20000)])
+    index.upsert({'id': 'BUG-X', 'title': 'Kernel panic in zfs arc', 'description': 'zfs arc_reclaim deadlock'})
+    started = time.perf_counter()
+    results = index.query('zfs arc deadlock kernel panic')
+    assert results[0]['id'] == 'BUG-X'
+    assert time.perf_counter() - started < 0.05
@@ -0,0 +1,117 @@
+import pytest
+import hashlib
+import io
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunked_upload import ChunkedUploadManager, UploadError
+from log_analyzer import LogAnalyzer
+from upload_registry import BlobStore, UploadRegistry
+
+DATA = (b'INFO starting\n' + b'ERROR out of memory in worker\n' + b'WARNING slow disk\n') * 50
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """Create a manager with small chunks over a temporary blob store."""
+    registry = UploadRegistry(BlobStore(str(tmp_path)))
+    return ChunkedUploadManager(registry.blob_store, registry, max_bytes=1024 * 1024,
+                                chunk_size=100, max_chunk_size=1000)
+
+
+def send(manager, upload, index, data=DATA, **kwargs):
+    start = index * upload.chunk_size
+    return manager.write_chunk(upload.id, index, io.BytesIO(data[start:start + upload.chunk_size]), **kwargs)
+
+
+def test_out_of_order_chunks_reassemble(manager):
+    """Test that chunks sent in any order produce the original file and digest."""
+    upload = manager.init('s1', 'big.log', len(DATA))
+    for index in reversed(range(upload.chunk_count)):
+        send(manager, upload, index)
+    record, deduplicated = manager.complete(upload.id)
+    assert not deduplicated
+    assert record.digest == hashlib.sha256(DATA).hexdigest()
+    with open(record.filepath, 'rb') as f:
+        assert f.read() == DATA
+    assert manager.registry.get(record.id, owner='s1') is record
+
+
+def test_resume_reports_missing_chunks(manager):
+    """Test that status lists the chunks a resuming client still has to send."""
+    upload = manager.init('s1', 'big.log', len(DATA))
+    send(manager, upload, 0)
+    send(manager, upload, 2)
+    status = upload.to_dict()
+    assert status['received'] == [0, 2]
+    assert status['missing'][0] == 1
+    with pytest.raises(UploadError) as excinfo:
+        manager.complete(upload.id)
+    assert excinfo.value.status == 409
+    for index in status['missing']:
+        send(manager, upload, index)
+    record, _ = manager.complete(upload.id)
+    assert record.size == len(DATA)
+
+
+def test_leading_chunks_are_scanned_before_completion(manager):
+    """Test that findings are available while the upload is still in progress."""
+    upload = manager.init('s1', 'big.log', len(DATA))
+    for index in range(upload.chunk_count - 1):
+        send(manager, upload, index)
+    assert upload.to_dict()['preview']['errors'] > 0
+    send(manager, upload, upload.chunk_count - 1)
+    record, _ = manager.complete(upload.id)
+    assert record.findings == LogAnalyzer.extract_key_info(DATA.decode())
+
+
+def test_retried_chunk_is_idempotent(manager):
+    """Test that resending a received chunk does not change the upload."""
+    upload = manager.init('s1', 'big.log', len(DATA))
+    send(manager, upload, 0)
+    send(manager, upload, 0)
+    assert upload.to_dict()['received'] == [0]
+
+
+def test_bad_chunks_are_rejected(manager):
+    """Test that short chunks and checksum mismatches are not recorded."""
+    upload = manager.init('s1', 'big.log', len(DATA))
+    with pytest.raises(UploadError):
+        manager.write_chunk(upload.id, 0, io.BytesIO(b'short'))
+    with pytest.raises(UploadError):
+        send(manager, upload, 0, sha256='0' * 64)
+    send(manager, upload, 0, sha256=hashlib.sha256(DATA[:100]).hexdigest())
+    assert upload.to_dict()['received'] == [0]
+
+
+def test_uploads_are_scoped_to_owner(manager):
+    """Test that another session cannot see or write to an upload."""
+    upload = manager.init('s1', 'big.log', len(DATA))
+    with pytest.raises(UploadError) as excinfo:
+        send(manager, upload, 0, owner='s2')
+    assert excinfo.value.status == 404
+
+
+def test_size_limit_and_abort(manager):
+    """Test that oversized uploads are refused and aborts remove the temp file."""
+    with pytest.raises(UploadError) as excinfo:
+        manager.init('s1', 'huge.log', 2 * 1024 * 1024)
+    assert excinfo.value.status == 413
+    upload = manager.init('s1', 'big.log', len(DATA))
+    manager.abort(upload.id)
+    assert not os.path.exists(upload.temp_path)
+    assert manager.stats()['active'] == 0
+
+
+def test_init_asks_for_space_first(manager):
+    """Test that a refusing reserve_space hook stops the upload before any disk is used."""
+    def refuse(owner, size):
+        raise RuntimeError('quota')
+    manager.reserve_space = refuse
+    with pytest.raises(RuntimeError):
+        manager.init('s1', 'big.log', len(DATA))
+    assert manager.stats()['active'] == 0
+    assert os.listdir(manager.blob_store.tmp_dir) == []
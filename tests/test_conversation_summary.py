@@ -0,0 +1,85 @@
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_summary import (SUMMARY_PROMPT_CHARS, ConversationSummarizer, build_summary_prompt,
+                                  split_summary)
+
+
+def turn(n, size=20):
+    """One conversation turn with messages of about ``size`` characters."""
+    return {'user': f'question {n} ' + 'x' * size, 'assistant': f'answer {n} ' + 'y' * size}
+
+
+@pytest.fixture(scope='module')
+def chatbot():
+    """A chatbot around a tiny random-weight model."""
+    pytest.importorskip('tokenizers')
+    from benchmarks.tiny_model import tiny_causal_lm, train_tokenizer
+    from engine import Phi3Chatbot
+    tokenizer = train_tokenizer()
+    return Phi3Chatbot(model=tiny_causal_lm(tokenizer, hidden_size=32, layers=1, heads=2), tokenizer=tokenizer)
+
+
+def test_summary_prompt_keeps_newest_turns_within_budget():
+    """Test that the summary prompt keeps the running summary and the newest turns that fit."""
+    assert split_summary([turn(1)]) == (None, [turn(1)])
+    assert split_summary([{'summary': 's'}, turn(1)]) == ('s', [turn(1)])
+
+    prompt = build_summary_prompt('earlier notes', [turn(n, size=2000) for n in range(10)])
+    assert 'earlier notes' in prompt and 'question 9' in prompt and 'question 0' not in prompt
+    assert len(prompt) < SUMMARY_PROMPT_CHARS + 1000
+
+
+def test_summarizer_waits_for_idle_model():
+    """Test that conversations are only compacted while the model is idle, oldest request first."""
+    idle = [False]
+    compacted = []
+    summarizer = ConversationSummarizer(lambda sid: compacted.append(sid) or True, lambda: idle[0])
+    summarizer.request('a')
+    summarizer.request('b')
+    summarizer.request('a')
+
+    assert not summarizer.run_once()
+    idle[0] = True
+    assert summarizer.run_once() and summarizer.run_once() and not summarizer.run_once()
+    assert compacted == ['a', 'b']  # A repeated request keeps its place
+    assert summarizer.stats()['compacted'] == 2
+
+
+def test_long_conversation_is_folded_into_summary(chatbot, monkeypatch):
+    """Test that older turns of a long conversation are replaced by a summary."""
+    summarizer = ConversationSummarizer(chatbot.compact_session, lambda: True)
+    monkeypatch.setattr(chatbot, 'summarizer', summarizer)
+    monkeypatch.setattr(chatbot, 'summary_trigger_tokens', 60)
+    prompts = []
+    monkeypatch.setattr(chatbot, 'generate_response',
+                        lambda prompt, **kwargs: prompts.append(prompt) or 'Discussed questions 1 and 2.')
+    chatbot.clear_session('s')
+    for n in range(1, 4):
+        chatbot._remember('s', chatbot.conversations.get('s', []), turn(n)['user'], turn(n)['assistant'])
+    assert summarizer.pending_count() == 1
+
+    assert summarizer.run_once()
+    assert 'question 1' in prompts[0] and 'question 3' not in prompts[0]
+    assert chatbot.get_session_summary('s') == 'Discussed questions 1 and 2.'
+    assert [t['user'] for t in chatbot.get_session_history('s')] == [turn(3)['user']]
+    prompt = chatbot.format_prompt('next', chatbot.conversations['s'])
+    assert 'Discussed questions 1 and 2.' in prompt and 'question 2' not in prompt and 'question 3' in prompt
+
+
+def test_compaction_is_dropped_if_conversation_changed(chatbot, monkeypatch):
+    """Test that a summary is discarded if the conversation changed while it was written."""
+    monkeypatch.setattr(chatbot, 'summary_trigger_tokens', 10)
+    chatbot.conversations['c'] = [turn(1), turn(2)]
+
+    def clear_meanwhile(prompt, **kwargs):
+        chatbot.clear_session('c')
+        return 'Summary.'
+    monkeypatch.setattr(chatbot, 'generate_response', clear_meanwhile)
+
+    assert not chatbot.compact_session('c')
+    assert chatbot.conversations['c'] == []
@@ -0,0 +1,87 @@
+import pytest
+import os
+import random
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('tokenizers')
+
+from benchmarks.bench_detokenize import legacy_clean_response
+from benchmarks.tiny_model import SAMPLE_ANSWER, train_tokenizer
+from detokenize import CleaningStreamer, IncrementalDetokenizer, ResponseCleaner, clean_generated_text
+
+PIECES = ['The cause is a timeout.', ' Check db.py', '\n# Heading', '\n| a | b |', '\n@someone', ' and',
+          ' retry', ' it', '.', '!', ' ', '\n', '<|end|>', '<|user|>', '<|assistant|>', '<|system|>',
+          '<|', 'end|>', '<|assist', 'Café 🚀', ' word'] + SAMPLE_ANSWER.split()
+
+
+@pytest.fixture(scope='module')
+def tokenizer():
+    return train_tokenizer()
+
+
+def test_cleaner_matches_legacy_clean_response():
+    """Test that streaming cleaning gives the old output for any split of the text."""
+    rng = random.Random(1)
+    prompt = '<|system|>\nBe helpful.<|end|>\n<|user|>\nWhy?<|end|>\n<|assistant|>\n'
+    for _ in range(2000):
+        text = ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 40)))
+        cleaner = ResponseCleaner()
+        position = 0
+        while position < len(text):
+            step = rng.randint(1, 12)
+            cleaner.feed(text[position:position + step])
+            position += step
+        assert cleaner.finish() == legacy_clean_response(prompt + text, prompt), repr(text)
+
+
+def test_incremental_detokenizer_matches_full_decode(tokenizer):
+    """Test that token-by-token text adds up to the full decode, multi-byte characters included."""
+    ids = tokenizer('Café → naïve 🚀 日本語<|end|> ok')['input_ids']
+    detokenizer = IncrementalDetokenizer(tokenizer)
+    pieces = [detokenizer.feed([token_id]) for token_id in ids] + [detokenizer.flush()]
+    assert ''.join(pieces) == tokenizer.decode(ids)
+    assert not any('\ufffd' in piece for piece in pieces)
+
+
+def test_cleaning_streamer_yields_answer_text(tokenizer):
+    """Test that the generate() streamer skips the prompt and stops at the end tag."""
+    prompt_ids = tokenizer('<|user|>\nWhy?<|end|>\n<|assistant|>\n')['input_ids']
+    output_ids = tokenizer('The database timed out. Retry it.<|end|> ignored')['input_ids']
+    streamer = CleaningStreamer(tokenizer)
+    streamer.put(torch.tensor([prompt_ids]))
+    for token_id in output_ids:
+        streamer.put(torch.tensor([token_id]))
+    streamer.end()
+
+    assert ''.join(streamer) == 'The database timed out. Retry it.'
+    assert streamer.response == clean_generated_text(tokenizer.decode(output_ids))
+
+
+def stream(tokenizer, text):
+    """Feed ``text`` to a CleaningStreamer token by token; returns the pieces and the response"""
+    streamer = CleaningStreamer(tokenizer)
+    streamer.put(torch.tensor([tokenizer('<|assistant|>\n')['input_ids']]))
+    for token_id in tokenizer(text)['input_ids']:
+        streamer.put(torch.tensor([token_id]))
+    streamer.end()
+    return list(streamer), streamer.response
+
+
+def test_cleaning_streamer_drops_filtered_lines_as_it_goes(tokenizer):
+    """Test that heading, table and mention lines never reach the stream."""
+    pieces, response = stream(tokenizer, '# Root cause\nThe disk filled up.\n| a | b |\n'
+                                         '@ops please check.\nFree space and restart the service.')
+    assert pieces == ['The disk filled up.', '\nFree space and restart the service.']
+    assert ''.join(pieces) == response
+
+
+def test_cleaning_streamer_holds_back_the_unfinished_sentence(tokenizer):
+    """Test that a sentence cut off by the token limit is never streamed."""
+    pieces, response = stream(tokenizer, 'Memory ran out. Restart the worker\n'
+                                         'with a larger heap so that the next batch')
+    assert pieces == ['Memory ran out.']
+    assert response == 'Memory ran out.'
@@ -0,0 +1,138 @@
+import pytest
+import os
+import random
+import re
+import struct
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dump_analyzer
+from log_analyzer import build_analysis_prompt, summarize_findings
+
+CRASH_ADDRESS = 0x7FF6A0001234
+
+
+class Blob:
+    """Byte buffer that hands out the offset of each piece appended"""
+
+    def __init__(self, size=0):
+        self.data = bytearray(size)
+
+    def put(self, piece):
+        offset = len(self.data)
+        self.data += piece
+        return offset
+
+
+def make_minidump():
+    """Build a small x64 minidump with modules, a thread and an access violation."""
+    blob = Blob(32 + 4 * 12)
+    directory = []
+    directory.append((7, blob.put(struct.pack('<HHHBBIII', 9, 6, 0, 8, 1, 10, 0, 19045) + bytes(36))))
+    names = [blob.put(struct.pack('<I', len(n) * 2) + n.encode('utf-16-le'))
+             for n in ('C:\\app\\app.exe', 'C:\\Windows\\System32\\ntdll.dll')]
+    modules = struct.pack('<I', 2)
+    for base, size, name_rva in ((0x7FF6A0000000, 0x10000, names[0]), (0x7FFB10000000, 0x20000, names[1])):
+        modules += struct.pack('<QIIII', base, size, 0, 0, name_rva) + bytes(108 - 24)
+    directory.append((4, blob.put(modules)))
+    context = bytearray(1232)
+    struct.pack_into('<Q', context, 0xF8, CRASH_ADDRESS)
+    struct.pack_into('<Q', context, 0x98, 0x1000)
+    context_rva = blob.put(bytes(context))
+    directory.append((3, blob.put(struct.pack('<I', 1) + struct.pack('<IIIIQQIIII', 77, 0, 0, 0, 0, 0, 0, 0, 1232, context_rva))))
+    exception = struct.pack('<IIIIQQII', 77, 0, 0xC0000005, 0, 0, CRASH_ADDRESS, 2, 0)
+    exception += struct.pack('<15Q', 1, 0, *([0] * 13)) + struct.pack('<II', 1232, context_rva)
+    directory.append((6, blob.put(exception)))
+    blob.put(b'\x00\x01fatal error: widget table corrupted\x00\xff' + bytes(64))
+    struct.pack_into('<4sIIIIIQ', blob.data, 0, b'MDMP', 0xA793, len(directory), 32, 0, 1748253600, 0)
+    for i, (stream_type, rva) in enumerate(directory):
+        struct.pack_into('<III', blob.data, 32 + 12 * i, stream_type, 0, rva)
+    return bytes(blob.data)
+
+
+def note(note_type, desc):
+    """Pack one ELF core note."""
+    pad = lambda b: b + bytes(-len(b) % 4)
+    return struct.pack('<III', 5, len(desc), note_type) + pad(b'CORE\x00') + pad(desc)
+
+
+def make_elf_core():
+    """Build a small x86-64 ELF core of a process killed by SIGSEGV."""
+    prstatus = bytearray(336)
+    struct.pack_into('<h', prstatus, 12, 11)
+    struct.pack_into('<i', prstatus, 32, 4242)
+    struct.pack_into('<Q', prstatus, 112 + 16 * 8, 0x555555554000 + 0x1139)
+    prpsinfo = bytearray(136)
+    prpsinfo[40:47] = b'crasher'
+    prpsinfo[56:71] = b'./crasher --run'
+    siginfo = bytearray(128)
+    struct.pack_into('<iii', siginfo, 0, 11, 0, 1)
+    struct.pack_into('<Q', siginfo, 16, 0x10)
+    files = struct.pack('<QQ', 2, 4096) + struct.pack('<QQQ', 0x555555554000, 0x555555556000, 0)
+    files += struct.pack('<QQQ', 0x7FFFF7C00000, 0x7FFFF7E00000, 0) + b'/usr/bin/crasher\x00/lib/libc.so.6\x00'
+    notes = note(1, bytes(prstatus)) + note(3, bytes(prpsinfo)) + note(0x53494749, bytes(siginfo)) + note(0x46494C45, files)
+    body = b'\x00\x00assertion failed: queue->head != NULL\x00' + bytes(100)
+    header = struct.pack('<16sHHIQQQIHHHHHH', b'\x7fELF\x02\x01\x01' + bytes(9), 4, 62, 1, 0, 64, 0, 0, 64, 56, 2, 0, 0, 0)
+    note_offset = 64 + 2 * 56
+    phdrs = struct.pack('<IIQQQQQQ', 4, 0, note_offset, 0, 0, len(notes), 0, 4)
+    phdrs += struct.pack('<IIQQQQQQ', 1, 5, note_offset + len(notes), 0x555555554000, 0, len(body), len(body), 4096)
+    return header + phdrs + notes + body
+
+
+def test_minidump(tmp_path):
+    """Test that a minidump is detected and its crash details are extracted."""
+    path = tmp_path / 'app.dmp'
+    path.write_bytes(make_minidump())
+    assert dump_analyzer.detect_dump_format(str(path)) == 'minidump'
+    findings = dump_analyzer.analyze_dump(str(path))
+    dump = findings['dump']
+    assert dump['system']['arch'] == 'amd64'
+    assert [m['name'] for m in dump['modules']] == ['C:\\app\\app.exe', 'C:\\Windows\\System32\\ntdll.dll']
+    assert dump['exception']['detail'] == 'writing address 0x0'
+    assert dump['exception']['registers']['rip'] == CRASH_ADDRESS
+    assert findings['critical_issues'] == ['Access violation at app.exe+0x1234']
+    assert findings['errors'][-1]['content'] == 'fatal error: widget table corrupted'
+    assert 'EXCEPTION_ACCESS_VIOLATION (0xC0000005) writing address 0x0 at app.exe+0x1234 in thread 77' \
+        in findings['dump_summary']
+    prompt = build_analysis_prompt(findings, 'app.dmp')
+    assert findings['dump_summary'] in prompt and 'Total lines analyzed' not in prompt
+    assert summarize_findings(findings)['format'] == 'minidump'
+
+
+def test_elf_core(tmp_path):
+    """Test that an ELF core is detected and its crash details are extracted."""
+    path = tmp_path / 'core.dump'
+    path.write_bytes(make_elf_core())
+    assert dump_analyzer.detect_dump_format(str(path)) == 'elf_core'
+    findings = dump_analyzer.analyze_dump(str(path))
+    dump = findings['dump']
+    assert dump['process'] == 'crasher' and dump['command_line'] == './crasher --run'
+    assert dump['threads'][0]['id'] == 4242
+    assert dump['exception']['detail'] == 'fault address 0x10'
+    assert findings['critical_issues'] == ['Segmentation fault at crasher+0x1139']
+    assert findings['errors'][-1]['content'] == 'assertion failed: queue->head != NULL'
+
+
+def test_text_is_not_a_dump(tmp_path):
+    """Test that a text log with a dump extension is not treated as a dump."""
+    path = tmp_path / 'crash.dmp'
+    path.write_text('2025-05-26 10:00:00 ERROR crashed\n')
+    assert dump_analyzer.detect_dump_format(str(path)) is None
+
+
+def test_strings_match_a_full_scan_across_chunks():
+    """Test that chunked string extraction finds the same strings as one regex scan."""
+    rng = random.Random(0)
+    pieces = []
+    for _ in range(400):
+        pieces.append(bytes(rng.randrange(256) for _ in range(rng.randrange(1, 40))))
+        pieces.append(rng.choice([b'error', b'plain', b'FATAL crash']) * rng.randrange(1, 6))
+    data = b''.join(pieces)
+    expected = [m for m in re.finditer(rb'[\x20-\x7e\t]{8,}', data)]
+    found, count = dump_analyzer.extract_strings(data, limit=1000, chunk_bytes=97)
+    assert count == len(expected)
+    keyword_runs = [(m.start(), m.group().decode().strip()) for m in expected
+                    if dump_analyzer.DUMP_KEYWORDS.search(m.group().lower())]
+    assert found == [(offset, text[:200]) for offset, text in keyword_runs]
@@ -0,0 +1,120 @@
+import pytest
+import json
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from explanation_cache import ENTRY_OVERHEAD_BYTES, ExplanationCache, explanation_signature, top_frames
+from log_analyzer import LogAnalyzer
+
+PYTHON_LOG = """2025-05-26 10:00:0{second} INFO step {step}
+Traceback (most recent call last):
+  File "/home/{user}/train/run.py", line {line}, in main
+    trainer.step()
+  File "/home/{user}/train/trainer.py", line 88, in step
+    loss = model(batch)
+2025-05-26 10:00:0{second} ERROR RuntimeError: CUDA out of memory. Tried to allocate {size} GiB on device 0x7f{addr}
+"""
+
+
+def signature(**values):
+    """Signature of PYTHON_LOG with the given values filled in."""
+    defaults = {'second': 1, 'step': 10, 'user': 'alice', 'line': 12, 'size': '2.00', 'addr': 'a1b2'}
+    return explanation_signature(LogAnalyzer.extract_key_info(PYTHON_LOG.format(**{**defaults, **values})))
+
+
+def test_signature_ignores_what_changes_between_runs():
+    """Test that timestamps, users, line numbers and addresses do not change the signature."""
+    assert signature() is not None
+    assert signature() == signature(second=7, step=99, user='bob', line=40, size='1.50', addr='ffee')
+
+
+def test_signature_differs_for_different_failures():
+    """Test that a different error gives a different signature and a clean log none."""
+    other = LogAnalyzer.extract_key_info(PYTHON_LOG.format(
+        second=1, step=10, user='alice', line=12, size='2.00', addr='a1b2').replace('CUDA out of memory', 'NCCL timeout'))
+    assert explanation_signature(other) != signature()
+    assert explanation_signature(LogAnalyzer.extract_key_info("INFO all good\nWARNING slow disk\n")) is None
+
+
+def test_top_frames_keep_innermost_frames():
+    """Test that the innermost Python and Java frames are kept."""
+    python = 'Traceback\n  File "/a/x.py", line 1, in f\n  File "/a/y.py", line 2, in g\n  File "/b/z.py", line 3, in h'
+    assert top_frames(python, limit=2) == ['y.py:g', 'z.py:h']
+    java = 'java.lang.NullPointerException\n\tat com.acme.A.run(A.java:10)\n\tat com.acme.B.call(B.java:20)'
+    assert top_frames(java, limit=1) == ['com.acme.A.run']
+
+
+def test_lookups_count_hits_and_evict_least_recently_used():
+    """Test hit counting and least recently used eviction."""
+    cache = ExplanationCache(max_entries=2)
+    assert cache.get('a') is None
+    cache.put('a', 'explain a')
+    cache.put('b', 'explain b')
+    assert cache.get('a') == 'explain a'
+    cache.put('c', 'explain c')
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('explain a', 'explain c')
+    assert cache.hit_rate() == pytest.approx(3 / 5)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_limit_and_shrink():
+    """Test that the byte limit and shrink() evict the oldest explanations."""
+    cache = ExplanationCache(max_bytes=3 * (ENTRY_OVERHEAD_BYTES + 10))
+    for name in 'abcd':
+        cache.put(name, name * 10)
+    assert len(cache) == 3 and cache.total_bytes == 3 * (ENTRY_OVERHEAD_BYTES + 10)
+    assert cache.shrink(ENTRY_OVERHEAD_BYTES + 10) == 2
+    assert cache.get('d') == 'd' * 10
+
+
+def test_persisted_cache_survives_restart(tmp_path):
+    """Test that a saved cache is loaded by a new instance."""
+    path = str(tmp_path / 'explanations.json')
+    cache = ExplanationCache(path=path)
+    cache.put('a', 'explain a')
+    cache.save()
+    assert ExplanationCache(path=path).get('a') == 'explain a'
+
+
+def test_malformed_entries_are_skipped_on_load(tmp_path):
+    """Test that a cache file with bad entries loads the good ones instead of failing."""
+    path = tmp_path / 'explanations.json'
+    path.write_text(json.dumps({'entries': [
+        ['a', {'explanation': 'explain a', 'created': 1.0, 'hits': 2}],
+        ['b', {}],
+        ['c', {'explanation': 5}],
+        [1, 2, 3],
+        'd',
+    ]}))
+    cache = ExplanationCache(path=str(path))
+    assert len(cache) == 1
+    assert cache.get('a') == 'explain a'
+
+
+def test_explanation_cut_off_by_token_limit_is_not_cached(monkeypatch):
+    """Test that only answers that ended on their own are kept for later logs."""
+    pytest.importorskip('torch')
+    pytest.importorskip('tokenizers')
+    from benchmarks.tiny_model import tiny_causal_lm, train_tokenizer
+    from engine import Phi3Chatbot
+    tokenizer = train_tokenizer()
+    chatbot = Phi3Chatbot(model=tiny_causal_lm(tokenizer, hidden_size=32, layers=1, heads=2), tokenizer=tokenizer)
+    chatbot.explanation_cache = ExplanationCache()
+    hit_limit = [True]
+
+    def generate_response(prompt, details=None, **kwargs):
+        details['hit_limit'] = hit_limit[0]
+        return 'The GPU ran out of memory.'
+
+    monkeypatch.setattr(chatbot, 'generate_response', generate_response)
+    log = PYTHON_LOG.format(second=1, step=10, user='alice', line=12, size='2.00', addr='a1b2')
+    chatbot.analyze_log_file(log, 'a.log')
+    assert len(chatbot.explanation_cache) == 0
+    hit_limit[0] = False
+    chatbot.analyze_log_file(log, 'a.log')
+    assert len(chatbot.explanation_cache) == 1
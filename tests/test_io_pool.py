@@ -0,0 +1,56 @@
+import pytest
+import io
+import os
+import sys
+import threading
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from io_pool import CancellableReader, IOBusy, IOPool, IOTimeout
+
+
+@pytest.fixture
+def pool():
+    """Create an I/O pool with one small file lane."""
+    pool = IOPool()
+    pool.add_lane('fs', max_workers=1, max_pending=1, timeout=5)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def test_run_returns_results_and_raises_errors(pool):
+    """Test that run() returns results and re-raises errors from the lane."""
+    assert pool.run('fs', sum, [1, 2, 3]) == 6
+    with pytest.raises(FileNotFoundError):
+        pool.run('fs', open, '/nonexistent/path.log')
+    assert pool.stats()['fs']['completed'] == 2
+    assert pool.in_flight() == {'fs': 0}
+
+
+def test_timed_out_operation_keeps_its_slot_until_it_returns(pool):
+    """Test that a timed-out operation holds its lane slot until it actually returns."""
+    release = threading.Event()
+    with pytest.raises(IOTimeout):
+        pool.run('fs', release.wait, timeout=0.05)
+    # Still running: it holds a slot, so one more fits and the next is refused
+    assert pool.in_flight() == {'fs': 1}
+    queued = pool.submit('fs', sum, [1])
+    with pytest.raises(IOBusy):
+        pool.run('fs', sum, [2])
+
+    release.set()
+    assert queued.result(timeout=5) == 1
+    assert pool.run('fs', sum, [3]) == 3
+    stats = pool.stats()['fs']
+    assert (stats['timeouts'], stats['rejected']) == (1, 1)
+
+
+def test_cancellable_reader_stops_at_next_read():
+    """Test that a cancelled reader raises IOTimeout on its next read."""
+    cancel = threading.Event()
+    reader = CancellableReader(io.BytesIO(b'abcdef'), cancel)
+    assert reader.read(3) == b'abc'
+    cancel.set()
+    with pytest.raises(IOTimeout):
+        reader.read(3)
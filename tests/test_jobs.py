@@ -0,0 +1,106 @@
+import pytest
+import threading
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JobQueue, JobQueueFull
+
+
+def wait_for(job, timeout=5):
+    """Poll until the job reaches a terminal state."""
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+@pytest.fixture
+def queue():
+    """Create a small job queue."""
+    q = JobQueue(max_workers=1, max_pending=1)
+    yield q
+    q.shutdown(wait=False)
+
+
+def test_job_completes_with_result(queue):
+    """Test that a job runs in the background and stores its result."""
+    def work(job, value):
+        job.set_stage('working', 0.5)
+        return value * 2
+
+    job = wait_for(queue.submit('test', work, 21))
+    assert job.status == 'completed'
+    assert job.to_dict()['result'] == 42
+    assert job.progress == 1.0
+
+
+def test_job_failure_is_recorded(queue):
+    """Test that exceptions mark the job as failed."""
+    def work(job):
+        raise ValueError('boom')
+
+    job = wait_for(queue.submit('test', work))
+    assert job.status == 'failed'
+    assert job.to_dict()['error'] == 'boom'
+
+
+def test_queue_rejects_when_full(queue):
+    """Test that submissions beyond workers + pending are rejected."""
+    release = threading.Event()
+
+    def work(job):
+        release.wait(5)
+
+    queue.submit('test', work)
+    queue.submit('test', work)
+    with pytest.raises(JobQueueFull):
+        queue.submit('test', work)
+    release.set()
+
+
+def test_cancel_running_job(queue):
+    """Test that a running job observes cancellation."""
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        job.cancel_event.wait(5)
+        job.raise_if_cancelled()
+
+    job = queue.submit('test', work)
+    started.wait(5)
+    assert queue.cancel(job.id)
+    assert wait_for(job).status == 'cancelled'
+    assert not queue.cancel(job.id)
+
+
+def test_callback_added_after_job_finished_still_runs(queue):
+    """Test that a done callback registered after a fast job finished is called once."""
+    job = wait_for(queue.submit('test', lambda job: 'ok'))
+    calls = []
+    job.add_done_callback(calls.append)
+    assert calls == [job]
+
+
+def test_cancel_queued_job_never_starts():
+    """Test that a cancelled queued job is not run and does not finish twice."""
+    q = JobQueue(max_workers=1, max_pending=2)
+    release = threading.Event()
+    ran, calls = [], []
+    try:
+        blocker = q.submit('test', lambda job: release.wait(5))
+        job = q.submit('test', lambda job: ran.append(job))
+        job.add_done_callback(calls.append)
+        assert q.cancel(job.id)
+        release.set()
+        wait_for(blocker)
+        time.sleep(0.05)
+        assert job.status == 'cancelled' and job.started_at is None
+        assert ran == [] and calls == [job]
+    finally:
+        release.set()
+        q.shutdown(wait=False)
@@ -0,0 +1,27 @@
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.loadtest import percentile, run_load_test
+
+
+def test_percentile_nearest_rank():
+    """Test nearest-rank percentiles."""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+
+def test_load_test_runs_offline():
+    """Test an end-to-end run against the stub model and fake BTS."""
+    report = run_load_test(sessions=3, iterations=3, token_latency=0, response_tokens=5,
+                           prefill_latency=0, bts_bugs=10,
+                           mix={'chat': 1, 'analyze': 1, 'bts': 1})
+    assert report['total_requests'] == 9
+    for stats in report['operations'].values():
+        assert stats['errors'] == 0
+        assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms']
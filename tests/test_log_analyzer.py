@@ -102,3 +102,22 @@ def test_analysis_summary_generated(analyzer):
     assert 'summary' in result
     assert isinstance(result['summary'], str)
     assert len(result['summary']) > 0
+
+def test_streaming_scan_matches_extract_key_info():
+    """Test that feeding a log in small byte pieces gives the same findings."""
+    from log_analyzer import LogScanner
+    content = "Traceback (most recent call last):\n  File \"/app/x.py\", line 3\nValueError: bad\n" * 30
+    content += "WARNING disk almost full\nsegmentation fault in worker"
+    expected = LogAnalyzer.extract_key_info(content)
+    scanner = LogScanner()
+    data = content.encode()
+    for start in range(0, len(data), 7):
+        scanner.feed_bytes(data[start:start + 7])
+    assert scanner.finish() == expected
+
+def test_scan_file_reads_only_needed_lines(tmp_path):
+    """Test that scan_file matches extract_key_info on the file contents."""
+    path = tmp_path / 'app.log'
+    content = "ERROR failed to connect\n" * 1000
+    path.write_text(content)
+    assert LogAnalyzer.scan_file(str(path)) == LogAnalyzer.extract_key_info(content)
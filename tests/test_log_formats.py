@@ -0,0 +1,72 @@
+import pytest
+import json
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log_formats
+from log_analyzer import LogAnalyzer, LogScanner
+
+JSON_LOG = '\n'.join(json.dumps(record) for record in [
+    {'time': '2025-05-26T10:00:00Z', 'level': 'info', 'msg': 'no error in config, startup ok'},
+    {'time': '2025-05-26T10:00:01Z', 'level': 'warn', 'msg': 'slow query'},
+    {'time': '2025-05-26T10:00:02Z', 'level': 50, 'msg': 'query failed',
+     'err': {'message': 'out of memory', 'stack': 'Error: out of memory\n    at run (db.js:3:1)'}},
+    {'time': '2025-05-26T10:00:03Z', 'level': 'debug', 'msg': 'retry scheduled after failure'},
+]) + '\n'
+
+LOGFMT_LOG = """time=2025-05-26T10:00:00Z level=info msg="request ok" path=/error-page
+time=2025-05-26T10:00:01Z level=error msg="upstream \\"db\\" timed out" retries=3
+"""
+
+SYSLOG_LOG = """<11>1 2025-05-26T10:00:00Z web01 nginx 123 - - upstream prematurely closed
+<14>May 26 10:00:01 web01 cron[42]: job finished with 0 failures
+"""
+
+
+@pytest.mark.parametrize('content, log_format', [
+    (JSON_LOG, 'json'),
+    (LOGFMT_LOG, 'logfmt'),
+    (SYSLOG_LOG, 'syslog'),
+    ('2025-05-26 10:00:00 ERROR boom\n2025-05-26 10:00:01 INFO user=bob action=login\n', 'text'),
+])
+def test_detect_format(content, log_format):
+    """Test that the log format is detected from the first lines."""
+    assert log_formats.detect_format(content) == log_format
+
+
+def test_structured_lines_are_classified_by_level():
+    """Test that JSON and logfmt lines are classified by their level field."""
+    findings = LogAnalyzer.extract_key_info(JSON_LOG)
+    assert findings['format'] == 'json'
+    assert findings['errors'] == [{'line': 3, 'content': 'query failed: out of memory'}]
+    assert [w['content'] for w in findings['warnings']] == ['slow query']
+    assert findings['critical_issues'] == ['Memory issue detected at line 3']
+    assert findings['stack_traces'][0].startswith('Error: out of memory')
+
+    findings = LogAnalyzer.extract_key_info(LOGFMT_LOG)
+    assert findings['errors'] == [{'line': 2, 'content': 'upstream "db" timed out'}]
+
+    # Syslog severity comes from the priority: 11 is user.err, 14 user.info
+    findings = LogAnalyzer.extract_key_info(SYSLOG_LOG)
+    assert [e['line'] for e in findings['errors']] == [1]
+
+
+def test_unstructured_lines_fall_back_to_keywords():
+    """Test that lines which do not parse are still matched by keyword."""
+    content = JSON_LOG * 3 + 'Traceback (most recent call last):\n  File "x.py", line 1\nValueError: bad\n'
+    findings = LogAnalyzer.extract_key_info(content)
+    assert [e['line'] for e in findings['errors']] == [3, 7, 11, 15]
+    assert any(trace.startswith('Traceback') for trace in findings['stack_traces'])
+
+
+def test_detection_does_not_depend_on_chunking():
+    """Test that feeding a log in small chunks gives the same findings."""
+    content = JSON_LOG * 20
+    scanner = LogScanner(max_lines=None)
+    for i in range(0, len(content), 7):
+        scanner.feed(content[i:i + 7])
+    assert scanner.finish() == LogAnalyzer.extract_key_info(content, max_lines=None)
+    assert scanner.log_format == 'json'
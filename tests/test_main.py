@@ -0,0 +1,45 @@
+import pytest
+import io
+import json
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+
+class EchoChatbot:
+    """Answers each prompt with itself, upper-cased, and records batch sizes."""
+
+    def __init__(self):
+        self.batches = []
+
+    def generate_batch(self, prompts):
+        self.batches.append(len(prompts))
+        return [prompt.upper() for prompt in prompts]
+
+
+def test_read_prompts_accepts_objects_and_strings():
+    """Test that JSONL lines yield ids, prompts and per-line errors."""
+    lines = ['{"id": "a", "prompt": "hello"}\n', '\n', '"plain"\n', '{"text": "x"}\n', 'oops\n']
+    items = list(main.read_prompts(lines))
+    assert items[0] == ('a', 'hello', None)
+    assert items[1] == (3, 'plain', None)
+    assert items[2][0] == 4 and items[2][2]
+    assert items[3][0] == 5 and items[3][2].startswith('Invalid JSON')
+
+
+def test_run_batch_groups_prompts_and_keeps_order():
+    """Test that prompts are answered in batches and written as JSONL."""
+    chatbot = EchoChatbot()
+    lines = [json.dumps({'id': i, 'prompt': f'p{i}'}) + '\n' for i in range(5)]
+    output = io.StringIO()
+
+    answered = main.run_batch(chatbot, lines, output, batch_size=2)
+
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert answered == 5
+    assert chatbot.batches == [2, 2, 1]
+    assert [(r['id'], r['response']) for r in results] == [(i, f'P{i}') for i in range(5)]
@@ -0,0 +1,84 @@
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_governor import CRITICAL, ELEVATED, HIGH, NORMAL, MemoryGovernor, MemoryPressure
+
+
+class FakeMemory:
+    def __init__(self, used):
+        self.used = used
+
+    def __call__(self):
+        return self.used
+
+
+def test_levels_rise_with_pressure_and_fall_with_hysteresis():
+    """Test that levels follow memory use upwards and drop only below the hysteresis band."""
+    rss = FakeMemory(500)
+    governor = MemoryGovernor(1000, rss=rss)
+    levels = []
+    for used in (500, 760, 870, 960, 920, 890, 840, 790, 690):
+        rss.used = used
+        levels.append(governor.poll())
+    assert levels == [NORMAL, ELEVATED, HIGH, CRITICAL, CRITICAL, HIGH, HIGH, ELEVATED, NORMAL]
+
+
+def test_cuda_memory_counts_towards_pressure():
+    """Test that CUDA memory use against its own limit raises the level."""
+    governor = MemoryGovernor(1000, cuda_limit_bytes=100, rss=FakeMemory(100), cuda_usage=FakeMemory(90))
+    assert governor.poll() == HIGH
+    assert governor.stats()['pressure'] == 0.9
+
+
+def test_degradation_steps():
+    """Test that generation limits shrink and new jobs are refused as the level rises."""
+    rss = FakeMemory(0)
+    governor = MemoryGovernor(1000, rss=rss)
+    governor.admit()
+    assert (governor.max_new_tokens(400), governor.batch_size(8), governor.window_lines(400)) == (400, 8, 400)
+
+    rss.used = 900
+    governor.poll()
+    assert (governor.max_new_tokens(400), governor.batch_size(8), governor.window_lines(400)) == (200, 4, 200)
+    assert governor.max_new_tokens(100) == 64
+    assert governor.max_new_tokens(50) == 50
+
+    rss.used = 990
+    governor.poll()
+    assert (governor.max_new_tokens(400), governor.batch_size(3)) == (100, 1)
+    with pytest.raises(MemoryPressure) as e:
+        governor.admit()
+    assert e.value.retry_after_header == '10'
+
+
+def test_caches_are_released_on_each_new_level_and_then_throttled():
+    """Test that caches are released on entering each level, then no more often than the interval."""
+    rss = FakeMemory(800)
+    released = []
+    governor = MemoryGovernor(1000, rss=rss, release_interval=3600)
+    governor.register('cache', usage=FakeMemory(10), release=released.append)
+    governor.register('weights', usage=FakeMemory(500))
+
+    governor.poll()
+    governor.poll()
+    rss.used = 900
+    governor.poll()
+    assert released == [0.75, 0.5]
+    assert governor.stats()['subsystems'] == {
+        'cache': {'bytes': 10, 'budget': None, 'releases': 2},
+        'weights': {'bytes': 500, 'budget': None, 'releases': 0},
+    }
+
+
+def test_subsystem_over_budget_is_trimmed_without_pressure():
+    """Test that only a subsystem over its budget is trimmed when there is no pressure."""
+    released = []
+    governor = MemoryGovernor(1000, rss=FakeMemory(100))
+    governor.register('explanations', usage=FakeMemory(400), budget=100, release=released.append)
+    governor.register('bts', usage=FakeMemory(50), budget=100, release=released.append)
+    assert governor.poll() == NORMAL
+    assert released == [0.25]
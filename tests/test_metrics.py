@@ -0,0 +1,62 @@
+import pytest
+import threading
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+@pytest.fixture
+def registry():
+    """Create an isolated metrics registry."""
+    return Registry()
+
+
+def test_counter_sums_across_threads(registry):
+    """Test that per-thread shards add up to the full total."""
+    counter = Counter('requests', 'Requests', registry=registry)
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.value == 8000
+    assert 'requests_total 8000' in registry.render()
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    """Test histogram exposition format."""
+    histogram = Histogram('latency_seconds', 'Latency', buckets=(0.1, 1), registry=registry)
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_count 3' in text
+
+
+def test_labelled_counter_and_gauge_function(registry):
+    """Test labels and scrape-time gauge callbacks."""
+    errors = Counter('errors', 'Errors', ['reason'], registry=registry)
+    errors.labels('timeout').inc(2)
+    depth = Gauge('depth', 'Depth', ['queue'], registry=registry)
+    depth.set_function(lambda: {'jobs': 3})
+    text = registry.render()
+    assert 'errors_total{reason="timeout"} 2' in text
+    assert 'depth{queue="jobs"} 3' in text
+
+
+def test_duplicate_metric_rejected(registry):
+    """Test that metric names are unique per registry."""
+    Counter('dup', 'First', registry=registry)
+    with pytest.raises(ValueError):
+        Counter('dup', 'Second', registry=registry)
@@ -0,0 +1,93 @@
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+torch = pytest.importorskip('torch')
+tokenizers = pytest.importorskip('tokenizers')
+from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+from prefix_cache import PrefixCache
+
+PREFIX = '<|system|> you are a helpful assistant <|end|> <|user|> ' + ' '.join(f'w{i}' for i in range(30))
+
+
+@pytest.fixture(scope='module')
+def tiny_model():
+    """A randomly initialized two-layer Llama with a word-level tokenizer."""
+    words = ['<unk>', '</s>', '<|system|>', '<|end|>', '<|user|>', 'you', 'are', 'a', 'helpful', 'assistant']
+    words += [f'w{i}' for i in range(100)]
+    backend = tokenizers.Tokenizer(tokenizers.models.WordLevel({w: i for i, w in enumerate(words)}, unk_token='<unk>'))
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.WhitespaceSplit()
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, unk_token='<unk>', eos_token='</s>')
+    tokenizer.model_input_names = ['input_ids', 'attention_mask']
+    torch.manual_seed(0)
+    model = LlamaForCausalLM(LlamaConfig(vocab_size=len(words), hidden_size=32, intermediate_size=64,
+                                         num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=4))
+    return model.eval(), tokenizer
+
+
+def test_cached_prefix_matches_full_prefill(tiny_model):
+    """Test that generating from the cached prefix gives the same logits as a full prefill."""
+    model, tokenizer = tiny_model
+    cache = PrefixCache(model, tokenizer)
+    assert cache.register(PREFIX) == 38
+    # The prompt diverges from the prefix after 20 words, so only that much is reused
+    inputs = tokenizer(PREFIX.rsplit(' ', 10)[0] + ' w90 w91 w92', return_tensors='pt')
+
+    cached, past_key_values = cache.lookup(inputs['input_ids'])
+
+    assert cached == 28
+    with torch.no_grad():
+        full = model(**inputs).logits[0, -1]
+        rest = model(inputs['input_ids'][:, cached:], attention_mask=inputs['attention_mask'],
+                     past_key_values=past_key_values).logits[0, -1]
+    assert torch.allclose(full, rest, atol=1e-5)
+
+
+def test_prefix_state_is_persisted_per_model(tiny_model, tmp_path):
+    """Test that the prefix state is saved to disk and reloaded only for the same model."""
+    model, tokenizer = tiny_model
+    first = PrefixCache(model, tokenizer, str(tmp_path), model_id='tiny')
+    first.register(PREFIX)
+    second = PrefixCache(model, tokenizer, str(tmp_path), model_id='tiny')
+    second.register(PREFIX)
+    other = PrefixCache(model, tokenizer, str(tmp_path), model_id='other')
+    other.register(PREFIX)
+
+    assert first.stats()['prefilled'] == 1
+    assert second.stats()['loaded_from_disk'] == 1
+    assert other.stats()['prefilled'] == 1
+    inputs = tokenizer(PREFIX + ' w99', return_tensors='pt')['input_ids']
+    for (k1, v1), (k2, v2) in zip(first.lookup(inputs)[1], second.lookup(inputs)[1]):
+        assert torch.equal(k1, k2) and torch.equal(v1, v2)
+
+
+def test_short_matches_are_not_used(tiny_model):
+    """Test that prompts sharing too short a prefix are prefilled in full."""
+    model, tokenizer = tiny_model
+    cache = PrefixCache(model, tokenizer)
+    cache.register(PREFIX)
+
+    assert cache.lookup(tokenizer('<|system|> w1 w2', return_tensors='pt')['input_ids']) == (0, None)
+    # The whole prompt is cached: the last token is still left to prefill
+    inputs = tokenizer(PREFIX, return_tensors='pt')['input_ids']
+    assert cache.lookup(inputs)[0] == inputs.shape[1] - 1
+
+
+def test_cleared_state_is_reloaded_from_disk(tiny_model, tmp_path):
+    """Test that clear() frees the in-memory state and register() loads it back from disk."""
+    model, tokenizer = tiny_model
+    cache = PrefixCache(model, tokenizer, str(tmp_path), model_id='tiny')
+    cache.register(PREFIX)
+    cache.clear()
+    assert len(cache) == 0 and cache.memory_bytes() == 0
+    inputs = tokenizer(PREFIX + ' w99', return_tensors='pt')['input_ids']
+    assert cache.lookup(inputs) == (0, None)
+
+    cache.register(PREFIX)
+    assert len(cache) == 1
+    assert cache.stats()['loaded_from_disk'] == 1
+    assert cache.lookup(inputs)[0] == 38
@@ -0,0 +1,133 @@
+import pytest
+import json
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rule_packs
+from log_analyzer import BUILTIN_RULES, RULES_DIR, LogScanner
+from rule_packs import RuleSet
+
+LOG = """2025-05-26 10:00:00 INFO starting trainer
+2025-05-26 10:00:01 RuntimeError: CUDA out of memory. Tried to allocate 2.00 GiB
+2025-05-26 10:00:02 Last State: Terminated, Reason: OOMKilled
+2025-05-26 10:00:03 ERROR Segmentation fault in worker
+"""
+
+
+def scan(content, rules):
+    """Scan ``content`` with the given rule set."""
+    scanner = LogScanner(max_lines=None, rules=rules)
+    scanner.feed(content)
+    return scanner.finish()
+
+
+def write_pack(folder, name, rules):
+    """Write a JSON rule pack."""
+    path = folder / name
+    path.write_text(json.dumps({'rules': rules}))
+    return path
+
+
+def test_repo_packs_extend_builtin_rules(tmp_path):
+    """Test that the shipped packs add critical issues on top of the built-in rules."""
+    rules = RuleSet(RULES_DIR, BUILTIN_RULES, cache_dir=str(tmp_path))
+    findings = scan(LOG, rules)
+
+    assert rules.last_error is None
+    # Every shipped rule is prefiltered by its literals
+    assert all(rule.literals for rule in rules.matcher().rules)
+    assert findings['critical_issues'] == [
+        'CUDA out of memory at line 2',
+        'Container OOMKilled at line 3',
+        'Segmentation fault detected at line 4',
+    ]
+    # OOMKilled has no error keyword; the rule makes it an error
+    assert [e['line'] for e in findings['errors']] == [2, 3, 4]
+
+
+def test_packs_merge_by_id_and_order_by_priority(tmp_path):
+    """Test that later packs replace or disable rules by id and priority decides the match."""
+    write_pack(tmp_path, 'a.json', [
+        {'id': 'disk', 'pattern': 'no space left', 'severity': 'critical', 'message': 'Disk full at line {line}'},
+        {'id': 'slow', 'pattern': 'took \\d+ms', 'severity': 'warning'},
+    ])
+    write_pack(tmp_path, 'b.json', [
+        {'id': 'slow', 'enabled': False},
+        {'id': 'enospc', 'pattern': 'ENOSPC', 'ignore_case': False, 'severity': 'critical', 'priority': 50,
+         'message': 'ENOSPC at line {line}'},
+    ])
+    rules = RuleSet(str(tmp_path), BUILTIN_RULES)
+    findings = scan("write failed: ENOSPC no space left on device\nrequest took 900ms\nenospc\n", rules)
+
+    assert findings['critical_issues'] == ['ENOSPC at line 1']
+    assert findings['warnings'] == []
+    assert [r['id'] for r in rules.status()['rules'] if r['hits'] and r['pack'] != 'builtin'] == ['enospc']
+
+
+def test_literals_prefilter_matches_like_the_regex(tmp_path):
+    """Test that the literals prefilter never changes which rule matches a line."""
+    write_pack(tmp_path, 'p.json', [
+        {'id': 'go.panic', 'pattern': '^(panic|fatal error): ', 'literals': ['panic', 'Fatal error'],
+         'ignore_case': False, 'severity': 'critical'},
+        {'id': 'xid', 'pattern': 'NVRM: Xid \\(PCI:[0-9a-f:.]+\\): (79|48)', 'literals': ['NVRM: Xid (PCI:'],
+         'severity': 'critical'},
+        {'id': 'anything', 'pattern': '[0-9]{5}', 'severity': 'warning'},
+    ])
+    matcher = RuleSet(str(tmp_path)).matcher()
+    literals = {rule.id: rule.literals for rule in matcher.rules}
+    assert literals == {'go.panic': ('fatal error', 'panic'), 'xid': ('nvrm: xid (pci:',), 'anything': None}
+
+    lines = ['panic: boom', 'Panic: boom', 'kernel: nvrm: XID (PCI:0000:3b:00): 79, pid=1',
+             'id 12345', 'fatal error: all goroutines are asleep', 'quiet line', '\u212a (Kelvin sign) 12345']
+    for line in lines:
+        expected = next((rule for rule in matcher.rules if rule.regex.search(line)), None)
+        assert matcher.match(line, True) is expected
+
+
+def test_changed_packs_are_reloaded_and_bad_packs_keep_old_rules(tmp_path):
+    """Test that edited packs are reloaded and a broken pack keeps the previous rules."""
+    pack = write_pack(tmp_path, 'p.json', [{'id': 'one', 'pattern': 'first', 'severity': 'critical'}])
+    rules = RuleSet(str(tmp_path), check_interval=0)
+    assert [rule.id for rule in rules.matcher().rules] == ['one']
+    cache_files = os.listdir(tmp_path / '.cache')
+    assert len(cache_files) == 1
+
+    pack.write_text(json.dumps([{'id': 'two', 'pattern': 'second'}]))
+    os.utime(pack, ns=(0, 10 ** 18))
+    assert [rule.id for rule in rules.matcher().rules] == ['two']
+    assert os.listdir(tmp_path / '.cache') != cache_files
+
+    pack.write_text(json.dumps([{'id': 'bad', 'pattern': '(unclosed'}]))
+    os.utime(pack, ns=(0, 2 * 10 ** 18))
+    assert [rule.id for rule in rules.matcher().rules] == ['two']
+    assert 'bad' in rules.last_error
+
+
+def test_cached_rules_are_used_without_reading_packs(tmp_path, monkeypatch):
+    """Test that unchanged packs are loaded from the rule cache."""
+    write_pack(tmp_path, 'p.json', [{'id': 'one', 'pattern': 'first'}])
+    RuleSet(str(tmp_path)).matcher()
+
+    def fail(path):
+        raise AssertionError('pack read despite cache')
+    monkeypatch.setattr(rule_packs, '_read_pack', fail)
+    assert [rule.id for rule in RuleSet(str(tmp_path)).matcher().rules] == ['one']
+
+
+@pytest.mark.parametrize('rule', [
+    {'pattern': 'x'},
+    {'id': 'x'},
+    {'id': 'x', 'pattern': 'x', 'severity': 'fatal'},
+    {'id': 'x', 'pattern': 'x', 'message': 'at {lineno}'},
+    {'id': 'x', 'pattern': 'x', 'literals': 'x'},
+    {'id': 'x', 'pattern': 'x', 'literals': ['x', '']},
+])
+def test_invalid_rules_are_rejected(tmp_path, rule):
+    """Test that a pack with an invalid rule is rejected."""
+    write_pack(tmp_path, 'p.json', [rule])
+    rules = RuleSet(str(tmp_path), BUILTIN_RULES)
+    assert len(rules.matcher().rules) == len(BUILTIN_RULES)
+    assert rules.last_error
@@ -0,0 +1,70 @@
+import pytest
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import SessionStore
+
+
+def turn(text='hello'):
+    return {'user': text, 'assistant': text, 'timestamp': '2025-05-26T10:00:00'}
+
+
+def test_behaves_like_dict():
+    """Test the dict operations Phi3Chatbot relies on."""
+    store = SessionStore()
+    assert 'a' not in store
+    store['a'] = [turn()]
+    assert 'a' in store
+    assert store.get('a') == [turn()]
+    assert store.get('missing', []) == []
+    assert len(store) == 1
+    del store['a']
+    assert 'a' not in store
+
+
+def test_lru_eviction_by_count():
+    """Test that the least recently used session is evicted first."""
+    store = SessionStore(max_sessions=2)
+    store['a'] = [turn()]
+    store['b'] = [turn()]
+    store['a']  # touch a so b becomes least recently used
+    store['c'] = [turn()]
+    assert set(store) == {'a', 'c'}
+    assert store.evictions == 1
+
+
+def test_memory_cap_evicts_oldest():
+    """Test that the global byte cap is enforced."""
+    store = SessionStore(max_bytes=3000)
+    for name in 'abcde':
+        store[name] = [turn('x' * 400)]
+    assert store.total_bytes <= 3000
+    assert 'e' in store
+    assert 'a' not in store
+
+
+def test_idle_sessions_expire_on_compaction():
+    """Test idle-TTL eviction."""
+    store = SessionStore(idle_ttl=0.05)
+    store['a'] = [turn()]
+    time.sleep(0.1)
+    store['b'] = [turn()]
+    assert store.compact() == 1
+    assert list(store) == ['b']
+
+
+def test_sqlite_write_behind_survives_restart(tmp_path):
+    """Test that histories are persisted and read back after a restart."""
+    db_path = str(tmp_path / 'sessions.db')
+    store = SessionStore(db_path=db_path, flush_interval=0.01)
+    store['a'] = [turn('remember me')]
+    store.close()
+
+    restarted = SessionStore(db_path=db_path)
+    assert 'a' in restarted
+    assert restarted['a'][0]['user'] == 'remember me'
+    restarted.close()
@@ -0,0 +1,111 @@
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import timeline
+
+APP_LOG = """2025-05-26 10:00:00 INFO request 1 served
+2025-05-26 10:00:30 INFO request 2 served
+2025-05-26 10:02:05 ERROR upstream call failed: connection reset
+Traceback (most recent call last):
+  File "/srv/app/client.py", line 12, in call
+2025-05-26 10:02:06 INFO retrying
+2025-05-26 10:20:00 INFO request 3 served
+"""
+
+DB_LOG = """2025-05-26T09:59:50Z db ready
+2025-05-26T10:02:01Z WARNING checkpoint taking long
+2025-05-26T10:02:03Z ERROR too many connections, dropping client
+2025-05-26T10:30:00Z db shutting down
+"""
+
+
+@pytest.fixture
+def logs(tmp_path):
+    """Write an application log and a database log with overlapping times."""
+    app_log = tmp_path / 'app.log'
+    db_log = tmp_path / 'db.log'
+    app_log.write_text(APP_LOG)
+    db_log.write_text(DB_LOG)
+    return [(str(app_log), 'app.log'), (str(db_log), 'db.log')]
+
+
+def test_parse_timestamp_formats():
+    """Test that ISO, offset, access-log and syslog timestamps parse to the same time."""
+    base = timeline.parse_timestamp('2025-05-26 10:00:00 INFO')
+    assert timeline.parse_timestamp('2025-05-26T10:00:00.250Z x') == base + 0.25
+    assert timeline.parse_timestamp('2025-05-26T12:00:00+02:00 x') == base
+    assert timeline.parse_timestamp('10.0.0.1 - - [26/May/2025:10:00:00 +0000] "GET /"') == base
+    assert timeline.parse_timestamp('May 26 10:00:00 host sshd[1]: x', year=2025) == base
+    assert timeline.parse_timestamp('  File "/srv/app.py", line 3') is None
+
+
+def test_times_round_to_whole_milliseconds():
+    """Test that fractional seconds are printed as milliseconds, carrying into the next second."""
+    base = timeline.parse_timestamp('2024-05-26T09:59:59Z x')
+    assert timeline._time_or_none(base) == '2024-05-26T09:59:59Z'
+    assert timeline._time_or_none(base + 0.25) == '2024-05-26T09:59:59.250Z'
+    assert timeline._time_or_none(base + 0.9996) == '2024-05-26T10:00:00Z'
+    assert timeline._time_or_none(float('-inf')) is None
+
+
+def test_merge_orders_lines_across_files(logs):
+    """Test that lines from several files are merged in time order."""
+    merged, _ = timeline.merge_timelines([path for path, _ in logs])
+    entries = list(merged)
+    assert [e[0] for e in entries] == sorted(e[0] for e in entries)
+    # Untimestamped trace lines stay right after the line they belong to
+    texts = [e[3] for e in entries]
+    assert texts.index('Traceback (most recent call last):') == texts.index(
+        '2025-05-26 10:02:05 ERROR upstream call failed: connection reset') + 1
+
+
+def test_correlate_window_around_first_failure(logs):
+    """Test that correlation keeps the window around the first failure across files."""
+    result = timeline.correlate(logs, before=10, after=60)
+    failure = result['first_failure']
+    assert failure['source'] == 'db.log' and failure['line'] == 3
+    assert failure['time'] == '2025-05-26T10:02:03Z'
+    lines = [(line['source'], line['line']) for line in result['window']['lines']]
+    assert lines == [('db.log', 2), ('db.log', 3), ('app.log', 3), ('app.log', 4), ('app.log', 5), ('app.log', 6)]
+    assert result['window']['line_counts'] == {'app.log': 4, 'db.log': 2}
+    # Reading stops at the first line past the window
+    assert result['lines_read'] < len(APP_LOG.splitlines()) + len(DB_LOG.splitlines())
+    assert result['findings']['errors'][0]['content'].startswith('[db.log]')
+
+    prompt = timeline.build_correlated_prompt(result, {'app.log': 'Found 1 error(s)'})
+    assert prompt.startswith(timeline.ANALYSIS_INSTRUCTIONS)
+    assert 'First failure: [db.log] line 3' in prompt
+    assert '- app.log: Found 1 error(s)' in prompt
+
+
+def test_correlate_without_failure(tmp_path):
+    """Test correlation of logs without any error lines."""
+    path = tmp_path / 'quiet.log'
+    path.write_text('2025-05-26 10:00:00 INFO a\n2025-05-26 10:05:00 INFO b\n')
+    result = timeline.correlate([(str(path), 'quiet.log')], before=60)
+    assert result['first_failure'] is None
+    assert [line['text'] for line in result['window']['lines']] == ['2025-05-26 10:05:00 INFO b']
+    assert 'No error lines were found' in timeline.build_correlated_prompt(result)
+
+
+def test_busy_log_before_failure_leaves_room_for_what_follows(tmp_path):
+    """Test that lines before the failure cannot fill the window and cut off the lines after it."""
+    app_log = tmp_path / 'app.log'
+    db_log = tmp_path / 'db.log'
+    busy = ''.join(f'2025-05-26 10:01:{i // 10:02d}.{i % 10}00 INFO request {i} served\n' for i in range(500))
+    app_log.write_text(busy + '2025-05-26 10:02:00 ERROR request failed\n'
+                       'Traceback (most recent call last):\n'
+                       '  File "/srv/app/client.py", line 12, in call\n')
+    db_log.write_text('2025-05-26T10:02:00.500Z db connection reset\n')
+    result = timeline.correlate([(str(app_log), 'app.log'), (str(db_log), 'db.log')],
+                                before=600, max_window_lines=400)
+    texts = [line['text'] for line in result['window']['lines']]
+    assert result['failure_index'] == 100
+    assert texts[100] == '2025-05-26 10:02:00 ERROR request failed'
+    assert texts[101:] == ['Traceback (most recent call last):', '  File "/srv/app/client.py", line 12, in call',
+                           '2025-05-26T10:02:00.500Z db connection reset']
+
@@ -0,0 +1,59 @@
+import pytest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing
+
+
+def test_span_without_trace_is_noop():
+    """Test that spans outside a trace do nothing."""
+    with tracing.span('idle') as trace:
+        assert trace is None
+    assert tracing.current_trace() is None
+
+
+def test_nested_spans_are_recorded():
+    """Test that spans record names, depth and attributes."""
+    with tracing.traced('request') as trace:
+        with tracing.span('outer'):
+            with tracing.span('inner', tokens=5):
+                pass
+    data = trace.to_dict()
+    names = [(s['name'], s['depth']) for s in data['spans']]
+    assert ('outer', 0) in names
+    assert ('inner', 1) in names
+    inner = next(s for s in data['spans'] if s['name'] == 'inner')
+    assert inner['attrs'] == {'tokens': 5}
+    assert tracing.current_trace() is None
+
+
+def test_profiler_captures_armed_count(tmp_path):
+    """Test that the profiler saves exactly the armed number of captures."""
+    profiler = tracing.ProfilerCapture(str(tmp_path))
+    profiler.arm(2)
+    for i in range(3):
+        with profiler.capture(f'req {i}'):
+            sum(range(1000))
+    assert len(profiler.saved) == 2
+    assert all(path.endswith('.prof') and os.path.exists(path) for path in profiler.saved)
+    assert profiler.status()['remaining'] == 0
+
+
+def test_profiler_remembers_only_recent_captures(tmp_path, monkeypatch):
+    """Test that the list of saved captures stays bounded."""
+    monkeypatch.setattr(tracing.ProfilerCapture, 'MAX_SAVED', 2)
+    profiler = tracing.ProfilerCapture(str(tmp_path))
+    profiler.arm(3)
+    paths = [profiler.end(profiler.begin(f'req {i}')) for i in range(3)]
+    assert list(profiler.saved) == paths[1:]
+    assert profiler.status()['saved'] == paths[1:]
+
+
+def test_profiler_rejects_unknown_mode(tmp_path):
+    """Test that invalid modes are rejected."""
+    profiler = tracing.ProfilerCapture(str(tmp_path))
+    with pytest.raises(ValueError):
+        profiler.arm(1, mode='perf')
@@ -0,0 +1,111 @@
+import pytest
+import io
+import json
+import os
+import sys
+import tarfile
+import zipfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import triage
+
+FAILING = 'INFO boot\nERROR Segmentation fault in renderer\nWARNING retrying\n'
+PASSING = 'INFO boot\nINFO all tests passed\n'
+
+
+class FakeChatbot:
+    """Records batched prompts and answers each with its batch position."""
+
+    def __init__(self):
+        self.batches = []
+
+    def generate_batch(self, prompts):
+        self.batches.append(prompts)
+        return [f'analysis {i}' for i in range(len(prompts))]
+
+
+@pytest.fixture
+def logs(tmp_path):
+    """Create a log tree with a failing, a passing and a non-log file."""
+    root = tmp_path / 'logs'
+    (root / 'nested').mkdir(parents=True)
+    (root / 'a.log').write_text(FAILING)
+    (root / 'nested' / 'b.txt').write_text(PASSING)
+    (root / 'ignored.png').write_bytes(b'\x89PNG')
+    return root
+
+
+def read_records(path):
+    """Read the NDJSON records written by a triage run."""
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_directory_triage_writes_ndjson(logs, tmp_path):
+    """Test that a directory is triaged into one NDJSON record per log file."""
+    out_path = tmp_path / 'out.ndjson'
+    chatbot = FakeChatbot()
+    with open(out_path, 'w') as out:
+        summary = triage.run_triage([str(logs)], out, chatbot=chatbot, workers=2, batch_size=4)
+
+    records = {r['filename']: r for r in read_records(out_path)}
+    assert set(records) == {'a.log', 'b.txt'}
+    assert summary['files'] == 2 and summary['with_errors'] == 1 and summary['analyzed'] == 1
+    assert records['a.log']['findings']['error_count'] == 1
+    assert records['a.log']['analysis'] == 'analysis 0'
+    assert 'analysis' not in records['b.txt']
+    assert records['a.log']['timing']['scan_seconds'] >= 0
+    # Only failing logs are sent to the model
+    assert len(chatbot.batches) == 1 and 'a.log' in chatbot.batches[0][0]
+
+
+def test_archives_are_scanned_member_by_member(tmp_path):
+    """Test that archive members are scanned one by one, skipping non-logs and unsafe paths."""
+    zip_path = tmp_path / 'run.zip'
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr('../escape/a.log', FAILING)
+        archive.writestr('notes.md', FAILING)
+    tar_path = tmp_path / 'run.tar.gz'
+    with tarfile.open(tar_path, 'w:gz') as archive:
+        data = PASSING.encode()
+        info = tarfile.TarInfo('logs/b.log')
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+
+    out = io.StringIO()
+    summary = triage.run_triage([str(zip_path), str(tar_path)], out, workers=1)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+
+    assert summary['files'] == 2
+    assert sorted(r['key'] for r in records) == sorted([f'{zip_path}!../escape/a.log', f'{tar_path}!logs/b.log'])
+    assert not (tmp_path / 'escape').exists()
+
+
+def test_checkpoint_resumes_without_repeating_files(logs, tmp_path):
+    """Test that a resumed run skips files already in the checkpoint."""
+    out_path = tmp_path / 'out.ndjson'
+    checkpoint = str(out_path) + '.checkpoint'
+    with open(out_path, 'a') as out:
+        triage.run_triage([str(logs / 'a.log')], out, checkpoint, workers=1)
+    with open(out_path, 'a') as out:
+        summary = triage.run_triage([str(logs)], out, checkpoint, workers=1)
+
+    assert summary['skipped'] == 1 and summary['files'] == 1
+    assert sorted(r['filename'] for r in read_records(out_path)) == ['a.log', 'b.txt']
+
+
+def test_bug_drafts_are_posted_for_failing_logs(logs, monkeypatch):
+    """Test that bug drafts are posted to the BTS for failing logs only."""
+    posted = []
+    monkeypatch.setattr(triage, 'post_bug_drafts', lambda url, drafts: posted.append((url, drafts)))
+
+    summary = triage.run_triage([str(logs)], io.StringIO(), workers=1, bts_url='http://bts/api')
+
+    assert summary['bugs_posted'] == 1
+    url, drafts = posted[0]
+    assert url == 'http://bts/api'
+    assert drafts[0]['id'].startswith('BUG-TRIAGE-')
+    assert drafts[0]['tags'] == ['triage'] and drafts[0]['status'] == 'new'
+    assert 'Segmentation fault' in drafts[0]['title']
@@ -0,0 +1,68 @@
+import pytest
+import hashlib
+import io
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_registry import BlobStore, UploadRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """Create a registry backed by a temporary blob store."""
+    return UploadRegistry(BlobStore(str(tmp_path)))
+
+
+def test_content_is_hashed_while_saving(registry):
+    """Test that the stored blob is addressed by its SHA-256."""
+    data = b'ERROR something failed\n' * 100
+    record, deduplicated = registry.add_stream('s1', 'app.log', io.BytesIO(data))
+    assert not deduplicated
+    assert record.digest == hashlib.sha256(data).hexdigest()
+    assert record.size == len(data)
+    with open(record.filepath, 'rb') as f:
+        assert f.read() == data
+
+
+def test_duplicate_content_is_stored_once(registry):
+    """Test that identical files share one blob."""
+    first, _ = registry.add_stream('s1', 'a.log', io.BytesIO(b'same'))
+    second, deduplicated = registry.add_stream('s2', 'b.log', io.BytesIO(b'same'))
+    assert deduplicated
+    assert first.id != second.id
+    assert first.filepath == second.filepath
+    assert registry.refcount(first.digest) == 2
+    again, _ = registry.add_stream('s1', 'a.log', io.BytesIO(b'same'))
+    assert again.id == first.id
+
+
+def test_lookup_is_scoped_to_owner(registry):
+    """Test that other sessions cannot see a file."""
+    record, _ = registry.add_stream('s1', 'a.log', io.BytesIO(b'data'))
+    assert registry.get(record.id, owner='s1') is record
+    assert registry.get(record.id, owner='s2') is None
+    assert 'filepath' not in record.to_dict()
+
+
+def test_blob_deleted_with_last_reference(registry):
+    """Test reference-counted blob deletion."""
+    first, _ = registry.add_stream('s1', 'a.log', io.BytesIO(b'data'))
+    second, _ = registry.add_stream('s2', 'a.log', io.BytesIO(b'data'))
+    registry.remove(first.id)
+    assert os.path.exists(second.filepath)
+    registry.remove(second.id)
+    assert not os.path.exists(second.filepath)
+
+
+def test_blob_survives_removal_while_copy_is_hashed(registry):
+    """Test that removing the last reference while the same content is being saved keeps the blob."""
+    first, _ = registry.add_stream('s1', 'a.log', io.BytesIO(b'data'))
+    temp_path, digest, size = registry.blob_store.write_temp(io.BytesIO(b'data'))
+    registry.remove(first.id)
+    record, deduplicated = registry.add_file('s2', 'a.log', temp_path, digest, size)
+    assert not deduplicated
+    assert os.path.exists(record.filepath)
+    assert registry.refcount(digest) == 1
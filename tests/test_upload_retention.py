@@ -0,0 +1,95 @@
+import pytest
+import io
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_registry import BlobStore, UploadRegistry
+from upload_retention import QuotaExceeded, RetentionManager
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """Create a registry backed by a temporary blob store."""
+    return UploadRegistry(BlobStore(str(tmp_path)))
+
+
+def add(registry, owner, name, size, age=0):
+    record, _ = registry.add_stream(owner, name, io.BytesIO(name.encode().ljust(size, b'.')))
+    record.last_used -= age
+    return record
+
+
+def test_session_quota_evicts_oldest_file_of_that_session(registry):
+    """Test that a new upload pushes out the same session's least recently used file."""
+    retention = RetentionManager(registry, max_total_bytes=10000, max_session_bytes=250)
+    old = add(registry, 's1', 'old.log', 100, age=60)
+    recent = add(registry, 's1', 'recent.log', 100, age=10)
+    other = add(registry, 's2', 'other.log', 100, age=120)
+    new = add(registry, 's1', 'new.log', 100)
+    assert retention.enforce('s1', keep=new.id)
+    assert registry.get(old.id) is None
+    assert registry.get(recent.id) is not None
+    assert registry.get(other.id) is not None
+    assert registry.usage_for('s1') == 200
+
+
+def test_global_quota_prefers_idle_sessions(registry):
+    """Test that files of sessions without a live conversation go first."""
+    retention = RetentionManager(registry, max_total_bytes=250, max_session_bytes=10000,
+                                 active_owners=lambda: {'active'})
+    active_old = add(registry, 'active', 'a.log', 100, age=500)
+    idle_recent = add(registry, 'idle', 'b.log', 100, age=5)
+    retention.reserve('new', 100)
+    assert registry.get(idle_recent.id) is None
+    assert registry.get(active_old.id) is not None
+    assert registry.stored_bytes == 100
+
+
+def test_pinned_files_are_never_evicted(registry):
+    """Test that files in use by jobs survive quota pressure."""
+    retention = RetentionManager(registry, max_total_bytes=150, max_session_bytes=10000)
+    pinned = add(registry, 's1', 'busy.log', 100, age=500)
+    registry.pin(pinned.id)
+    with pytest.raises(QuotaExceeded):
+        retention.reserve('s2', 100)
+    assert registry.get(pinned.id) is not None
+    registry.unpin(pinned.id)
+    retention.reserve('s2', 100)
+    assert registry.get(pinned.id) is None
+
+
+def test_oversized_request_is_refused(registry):
+    """Test that a file larger than the session quota is rejected outright."""
+    retention = RetentionManager(registry, max_total_bytes=10000, max_session_bytes=100)
+    with pytest.raises(QuotaExceeded):
+        retention.reserve('s1', 101)
+
+
+def test_sweep_expires_idle_files_and_orphans(registry):
+    """Test that the sweeper removes old files, unknown blobs and stray temp files."""
+    retention = RetentionManager(registry, max_age=3600, orphan_grace=60,
+                                 active_owners=lambda: {'live'})
+    expired = add(registry, 'gone', 'old.log', 100, age=7200)
+    kept = add(registry, 'live', 'old.log', 100, age=7200)
+    fresh = add(registry, 'gone', 'fresh.log', 100)
+    store = registry.blob_store
+    orphan = store.path_for('ab' * 32)
+    os.makedirs(os.path.dirname(orphan), exist_ok=True)
+    stray = store.new_temp_path()
+    for path in (orphan, stray):
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        os.utime(path, (time.time() - 120, time.time() - 120))
+    # Same content as the expired file, so its blob must survive
+    shared = registry.get(kept.id).digest == expired.digest
+    assert retention.sweep() == 3
+    assert registry.get(expired.id) is None
+    assert registry.get(kept.id) is not None
+    assert registry.get(fresh.id) is not None
+    assert shared and os.path.exists(kept.filepath)
+    assert not os.path.exists(orphan)
+    assert not os.path.exists(stray)
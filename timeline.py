@@ -0,0 +1,213 @@
+import calendar
+import heapq
+import re
+import time
+from collections import deque
+from operator import itemgetter
+
+from log_analyzer import ANALYSIS_INSTRUCTIONS, LogScanner, classify_line
+from log_formats import PARSERS, detect_file_format
+
+MONTHS = {name: number for number, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+
+# 2025-05-26 10:00:01, 2025-05-26T10:00:01.123Z, 2025-05-26 10:00:01,123 +02:00
+ISO_TIMESTAMP = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,9}))?\s?(Z|[+-]\d{2}:?\d{2})?')
+# [26/May/2025:10:00:01 +0000] (Apache/nginx access logs)
+CLF_TIMESTAMP = re.compile(r'\[(\d{2})/([A-Za-z]{3})/(\d{4}):(\d{2}):(\d{2}):(\d{2})(?: ([+-]\d{4}))?\]')
+# May 26 10:00:01 (syslog; no year)
+SYSLOG_TIMESTAMP = re.compile(r'^([A-Za-z]{3}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2})')
+
+# Timestamps are looked for this far into a line
+TIMESTAMP_SEARCH_CHARS = 80
+
+# Lines of the merged window quoted in the model prompt, and their max length
+PROMPT_LINES_BEFORE = 15
+PROMPT_LINES_AFTER = 45
+PROMPT_LINE_CHARS = 300
+# Share of a correlation window's lines kept from before the first failure; the rest is for after it
+BEFORE_SHARE = 0.25
+
+
+def _zone_offset(zone):
+    if not zone or zone == 'Z':
+        return 0
+    sign = -1 if zone[0] == '-' else 1
+    digits = zone[1:].replace(':', '')
+    return sign * (int(digits[:2]) * 3600 + int(digits[2:4]) * 60)
+
+
+def parse_timestamp(line, year=None):
+    """Seconds since the epoch for the timestamp near the start of ``line``, or None.
+
+    Times without a zone are read as UTC; all that matters for merging is
+    that the files of one incident use the same zone. Syslog times have no
+    year and get ``year`` (default: the current one).
+    """
+    head = line[:TIMESTAMP_SEARCH_CHARS]
+    match = ISO_TIMESTAMP.search(head)
+    if match:
+        y, mo, d, h, mi, s, fraction, zone = match.groups()
+        seconds = calendar.timegm((int(y), int(mo), int(d), int(h), int(mi), int(s)))
+        if fraction:
+            seconds += int(fraction) / 10 ** len(fraction)
+        return seconds - _zone_offset(zone)
+    match = CLF_TIMESTAMP.search(head)
+    if match:
+        d, mon, y, h, mi, s, zone = match.groups()
+        month = MONTHS.get(mon.lower())
+        if month:
+            return calendar.timegm((int(y), month, int(d), int(h), int(mi), int(s))) - _zone_offset(zone)
+    match = SYSLOG_TIMESTAMP.match(head)
+    if match:
+        mon, d, h, mi, s = match.groups()
+        month = MONTHS.get(mon.lower())
+        if month:
+            y = year or time.gmtime().tm_year
+            return calendar.timegm((y, month, int(d), int(h), int(mi), int(s)))
+    return None
+
+
+def iter_timeline(path, source, year=None):
+    """Yield (timestamp, source, line number, text) for each line of ``path``.
+
+    Lines without a timestamp (stack frames, wrapped messages) take the one
+    of the line before, so they stay next to it in the merge. A timestamp
+    earlier than the previous one is raised to it, keeping the stream sorted
+    as the merge requires; lines before the first timestamp sort first.
+    """
+    last = float('-inf')
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            timestamp = parse_timestamp(line, year)
+            if timestamp is not None and timestamp > last:
+                last = timestamp
+            yield last, source, number, line
+
+
+def merge_timelines(paths, year=None):
+    """Lazily k-way merge the lines of ``paths`` by timestamp.
+
+    Holds one pending line per file, whatever the file sizes. Returns the
+    merged iterator and the per-file iterators (close them to release the
+    files early).
+    """
+    streams = [iter_timeline(path, source, year) for source, path in enumerate(paths)]
+    return heapq.merge(*streams, key=itemgetter(0)), streams
+
+
+def correlate(files, before=60.0, after=300.0, max_window_lines=400, before_lines=None, year=None):
+    """Find the cross-file window around the first failure in several logs.
+
+    ``files`` is a list of (path, name). The files are merged by timestamp
+    and read only until the window is complete: up to ``before`` seconds of
+    lines before the first error line and ``after`` seconds after it, at most
+    ``max_window_lines`` lines. At most ``before_lines`` of them (default
+    ``BEFORE_SHARE`` of the window) come from before the failure, so a busy
+    log cannot crowd out the trace and context after it. Without a failure,
+    every line is read and the window is the end of the merged timeline.
+    Each file's format is detected from its head, so structured lines are
+    judged by their level field. The window is scanned with LogScanner, each
+    finding tagged with its file name.
+    """
+    names = [name for _, name in files]
+    formats = [detect_file_format(path) for path, _ in files]
+    parsers = [PARSERS.get(log_format) for log_format in formats]
+    merged, streams = merge_timelines([path for path, _ in files], year)
+    if before_lines is None:
+        before_lines = int(max_window_lines * BEFORE_SHARE)
+    before_lines = max(0, min(before_lines, max_window_lines - 1))
+    recent = deque(maxlen=max_window_lines)
+    window = None
+    failure = None
+    lines_read = 0
+    try:
+        for entry in merged:
+            lines_read += 1
+            timestamp = entry[0]
+            if window is None:
+                recent.append(entry)
+                while recent[0][0] < timestamp - before:
+                    recent.popleft()
+                if classify_line(entry[3], parsers[entry[1]])[0] == 'error':
+                    failure = entry
+                    window = list(recent)[-(before_lines + 1):]
+                continue
+            if timestamp > failure[0] + after or len(window) >= max_window_lines:
+                break
+            window.append(entry)
+    finally:
+        for stream in streams:
+            stream.close()
+    if window is None:
+        window = list(recent)
+        failure_index = None
+    else:
+        failure_index = window.index(failure)
+
+    scanner = LogScanner(max_lines=len(window) or 1)
+    for _, source, _, text in window:
+        scanner.feed_line(text, formats[source])
+    findings = scanner.finish()
+    for item in findings['errors'] + findings['warnings']:
+        item['content'] = f"[{names[window[item['line'] - 1][1]]}] {item['content']}"
+
+    return {
+        'files': names,
+        'formats': dict(zip(names, formats)),
+        'lines_read': lines_read,
+        'first_failure': _entry_dict(failure, names) if failure else None,
+        'failure_index': failure_index,
+        'window': {
+            'start': _time_or_none(window[0][0]) if window else None,
+            'end': _time_or_none(window[-1][0]) if window else None,
+            'lines': [_entry_dict(entry, names) for entry in window],
+            'line_counts': {name: sum(1 for entry in window if entry[1] == source)
+                            for source, name in enumerate(names)},
+        },
+        'findings': findings,
+    }
+
+
+def build_correlated_prompt(correlation, file_summaries=None):
+    """Model prompt for a correlated incident; starts with the shared analysis instructions"""
+    window = correlation['window']
+    lines = window['lines']
+    failure = correlation['first_failure']
+    parts = [f"These {len(correlation['files'])} log files are from the same incident: "
+             f"{', '.join(correlation['files'])}. Their lines are merged by timestamp below.\n"]
+    if failure:
+        parts.append(f"First failure: [{failure['source']}] line {failure['line']} at "
+                     f"{failure['time'] or 'unknown time'}: {failure['text'][:PROMPT_LINE_CHARS]}\n")
+    else:
+        parts.append("No error lines were found in the merged logs.\n")
+    if file_summaries:
+        parts.append("Per-file findings:")
+        parts.extend(f"- {name}: {summary}" for name, summary in file_summaries.items())
+        parts.append('')
+    findings = correlation['findings']
+    parts.append(f"In the merged window: {len(findings['errors'])} error(s), {len(findings['warnings'])} warning(s), "
+                 f"critical issues: {', '.join(findings['critical_issues'][:5]) or 'None detected'}\n")
+
+    index = correlation['failure_index'] or 0
+    start = max(0, index - PROMPT_LINES_BEFORE)
+    excerpt = lines[start:index + PROMPT_LINES_AFTER]
+    parts.append(f"Merged timeline around the first failure ({len(excerpt)} of {len(lines)} lines):")
+    for line in excerpt:
+        parts.append(f"{line['time'] or '-'} [{line['source']}] {line['text'][:PROMPT_LINE_CHARS]}")
+    return ANALYSIS_INSTRUCTIONS + '\n'.join(parts)
+
+
+def _time_or_none(timestamp):
+    if timestamp == float('-inf'):
+        return None
+    # Round to whole milliseconds first, so e.g. 59.9996s carries into the next second
+    seconds, ms = divmod(round(timestamp * 1000), 1000)
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds)) + (f'.{ms:03d}' if ms else '') + 'Z'
+
+
+def _entry_dict(entry, names):
+    timestamp, source, number, text = entry
+    return {'time': _time_or_none(timestamp), 'source': names[source], 'line': number, 'text': text}
@@ -0,0 +1,207 @@
+"""Per-request trace spans and on-demand profiler capture.
+
+Tracing is opt-in per request. When no trace is active, ``span()`` costs a
+single context-variable lookup, so instrumentation can stay in hot paths.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Trace:
+    """Collects timed spans for one request or job"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.finished = None
+        self.spans = []
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, end, depth=None, **attrs):
+        """Record a span from two ``time.perf_counter()`` readings"""
+        span = {
+            'name': name,
+            'start_ms': round((start - self.started) * 1000, 3),
+            'duration_ms': round((end - start) * 1000, 3),
+            'depth': self._depth if depth is None else depth,
+        }
+        if attrs:
+            span['attrs'] = attrs
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+        return self
+
+    def to_dict(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s['start_ms'])
+        return {
+            'name': self.name,
+            'duration_ms': round((end - self.started) * 1000, 3),
+            'spans': spans,
+        }
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def start_trace(name):
+    """Begin a trace in the current context; returns (trace, token) for ``end_trace``"""
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is not None:
+        trace.finish()
+    return trace
+
+
+@contextmanager
+def traced(name):
+    """Run a block inside a new trace and yield it"""
+    trace, token = start_trace(name)
+    try:
+        yield trace
+    finally:
+        end_trace(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block as a span of the active trace (no-op when not tracing)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    depth = trace._depth
+    trace._depth += 1
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace._depth = depth
+        trace.add_span(name, start, time.perf_counter(), depth=depth, **attrs)
+
+
+class ProfilerCapture:
+    """Profile the next N units of work and save each profile to disk.
+
+    ``mode`` is ``'cprofile'`` (a ``.prof`` file per capture, readable with
+    pstats or snakeviz) or ``'torch'`` (a Chrome trace ``.json`` per capture).
+    torch.profiler is process-wide, so only one torch capture runs at a time;
+    work that starts while another capture is active is not profiled.
+    """
+
+    MODES = ('cprofile', 'torch')
+    # Paths of recent captures remembered for status(); the files themselves stay on disk
+    MAX_SAVED = 100
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.mode = 'cprofile'
+        self.remaining = 0
+        self.saved = deque(maxlen=self.MAX_SAVED)
+        self._lock = threading.Lock()
+        self._torch_active = False
+
+    def arm(self, count, mode='cprofile'):
+        if mode not in self.MODES:
+            raise ValueError(f'Unknown profiler mode: {mode}')
+        if count < 1:
+            raise ValueError('count must be at least 1')
+        if mode == 'torch':
+            import torch.profiler  # noqa: F401  (fail early if unavailable)
+        with self._lock:
+            self.mode = mode
+            self.remaining = count
+
+    def disarm(self):
+        with self._lock:
+            self.remaining = 0
+
+    def status(self):
+        return {
+            'mode': self.mode,
+            'remaining': self.remaining,
+            'output_dir': self.output_dir,
+            'saved': list(self.saved)[-20:],
+        }
+
+    def begin(self, label):
+        """Start profiling if armed; returns a handle for ``end`` or None"""
+        if self.remaining <= 0:
+            return None
+        with self._lock:
+            if self.remaining <= 0:
+                return None
+            if self.mode == 'torch' and self._torch_active:
+                return None
+            self.remaining -= 1
+            mode = self.mode
+            if mode == 'torch':
+                self._torch_active = True
+        try:
+            if mode == 'torch':
+                import torch
+                activities = [torch.profiler.ProfilerActivity.CPU]
+                if torch.cuda.is_available():
+                    activities.append(torch.profiler.ProfilerActivity.CUDA)
+                profiler = torch.profiler.profile(activities=activities)
+                profiler.start()
+            else:
+                import cProfile
+                profiler = cProfile.Profile()
+                profiler.enable()
+        except Exception as e:
+            print(f"Could not start {mode} profiler: {str(e)}")
+            if mode == 'torch':
+                self._torch_active = False
+            return None
+        return (mode, label, profiler)
+
+    def end(self, handle):
+        """Stop a capture started by ``begin`` and write it to disk"""
+        if handle is None:
+            return None
+        mode, label, profiler = handle
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_label = ''.join(c if c.isalnum() or c in '-_' else '_' for c in label).strip('_') or 'request'
+        stem = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{safe_label}"
+        try:
+            if mode == 'torch':
+                profiler.stop()
+                path = os.path.join(self.output_dir, f'{stem}.json')
+                profiler.export_chrome_trace(path)
+            else:
+                profiler.disable()
+                path = os.path.join(self.output_dir, f'{stem}.prof')
+                profiler.dump_stats(path)
+        finally:
+            if mode == 'torch':
+                self._torch_active = False
+        self.saved.append(path)
+        return path
+
+    @contextmanager
+    def capture(self, label):
+        handle = self.begin(label)
+        try:
+            yield handle
+        finally:
+            self.end(handle)
@@ -0,0 +1,327 @@
+"""Bulk triage of log files.
+
+Scans a directory, glob or archive of logs with LogAnalyzer in a process
+pool, asks the model for an analysis of each failing log in batches, and
+streams one JSON object per file to an NDJSON output. Finished files are
+recorded in a checkpoint, so an interrupted run picks up where it stopped.
+
+Usage:
+    python triage.py nightly/ --output results.ndjson
+    python triage.py 'runs/*/failures/*.log' --output results.ndjson --batch-size 8
+    python triage.py failures.tar.gz --no-llm --output findings.ndjson
+    python triage.py nightly/ --output results.ndjson --post-bugs --bts-url http://localhost:3001/api
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from dump_analyzer import analyze_dump, detect_dump_format
+from log_analyzer import LogAnalyzer, build_analysis_prompt, summarize_findings
+
+LOG_EXTENSIONS = ('.txt', '.log', '.dmp', '.dump', '.err', '.out', '.crash', '.trace', '.logs')
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+
+class TriageItem:
+    """One log to triage; ``path`` may be a temp file extracted from an archive"""
+
+    def __init__(self, key, path, filename, temporary=False):
+        self.key = key
+        self.path = path
+        self.filename = filename
+        self.temporary = temporary
+
+
+def is_log(name):
+    return name.lower().endswith(LOG_EXTENSIONS)
+
+
+def is_archive(name):
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def iter_items(inputs, done, extract_dir):
+    """Yield TriageItems for every log under ``inputs``, skipping keys in ``done``.
+
+    Archive members are extracted one at a time, only when they are needed.
+    """
+    for source in inputs:
+        if os.path.isdir(source):
+            paths = []
+            for root, _, names in os.walk(source):
+                paths.extend(os.path.join(root, name) for name in names)
+            paths.sort()
+        elif os.path.isfile(source):
+            paths = [source]
+        else:
+            paths = sorted(glob.glob(source, recursive=True))
+        for path in paths:
+            if is_archive(path):
+                yield from iter_archive(path, done, extract_dir)
+            elif is_log(path):
+                key = os.path.abspath(path)
+                if key not in done:
+                    yield TriageItem(key, path, os.path.basename(path))
+
+
+def iter_archive(path, done, extract_dir):
+    archive_key = os.path.abspath(path)
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_log(info.filename):
+                    continue
+                key = f'{archive_key}!{info.filename}'
+                if key in done:
+                    continue
+                with archive.open(info) as member:
+                    yield _extract(key, info.filename, member, extract_dir)
+    else:
+        with tarfile.open(path) as archive:
+            for info in archive:
+                if not info.isfile() or not is_log(info.name):
+                    continue
+                key = f'{archive_key}!{info.name}'
+                if key in done:
+                    continue
+                yield _extract(key, info.name, archive.extractfile(info), extract_dir)
+
+
+def _extract(key, member_name, stream, extract_dir):
+    # Never trust member paths; write to a fresh flat temp file instead
+    fd, temp_path = tempfile.mkstemp(dir=extract_dir, suffix='_' + os.path.basename(member_name))
+    with os.fdopen(fd, 'wb') as out:
+        shutil.copyfileobj(stream, out, 1024 * 1024)
+    return TriageItem(key, temp_path, os.path.basename(member_name), temporary=True)
+
+
+def scan_item(path, max_lines):
+    """Process-pool worker: scan one file; returns (findings, size, seconds)"""
+    started = time.perf_counter()
+    if detect_dump_format(path):
+        findings = analyze_dump(path)
+    else:
+        findings = LogAnalyzer.scan_file(path, max_lines=max_lines)
+    return findings, os.path.getsize(path), time.perf_counter() - started
+
+
+def scan_all(pool, items, max_lines, window):
+    """Scan items in parallel with at most ``window`` in flight; yields (item, result, error)"""
+    pending = {}
+    items = iter(items)
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < window:
+            item = next(items, None)
+            if item is None:
+                exhausted = True
+                break
+            pending[pool.submit(scan_item, item.path, max_lines)] = item
+        if not pending:
+            break
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            item = pending.pop(future)
+            if item.temporary:
+                os.remove(item.path)
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+
+
+def needs_analysis(findings):
+    return bool(findings['errors'] or findings['critical_issues'])
+
+
+def bug_draft(record, index):
+    """BTS bug draft for a triaged file with errors"""
+    findings = record['findings']
+    first_error = record['first_error'] or findings['summary']
+    if findings['critical_issues']:
+        priority = 'critical'
+    elif findings['error_count'] > 5:
+        priority = 'high'
+    else:
+        priority = 'medium'
+    return {
+        # The bulk endpoint stores bugs as given, so IDs are assigned here
+        'id': f"BUG-TRIAGE-{int(time.time() * 1000)}-{index}",
+        'title': f"[triage] {record['filename']}: {first_error}"[:150],
+        'description': (
+            f"**Source:** {record['key']}\n\n"
+            f"**Findings:** {findings['summary']}\n"
+            + ''.join(f"- {issue}\n" for issue in findings['critical_issues'])
+            + (f"\n**Analysis:**\n{record['analysis']}\n" if record.get('analysis') else '')
+        ),
+        'status': 'new',
+        'priority': priority,
+        'category': 'Other',
+        'createdAt': datetime.now().isoformat(),
+        'tags': ['triage'],
+    }
+
+
+def post_bug_drafts(bts_url, drafts, timeout=30):
+    import requests
+    response = requests.post(f"{bts_url.rstrip('/')}/bugs/bulk", json={'bugs': drafts}, timeout=timeout)
+    response.raise_for_status()
+
+
+class Checkpoint:
+    """Append-only file of finished keys"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {line.rstrip('\n') for line in f if line.strip()}
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+
+    def add(self, keys):
+        if self._file is None:
+            return
+        for key in keys:
+            self._file.write(key + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def run_triage(inputs, output, checkpoint_path=None, chatbot=None, workers=None, batch_size=4,
+               max_lines=200, bts_url=None, log=None):
+    """Triage every log under ``inputs``, writing NDJSON records to ``output``.
+
+    With ``chatbot`` set, files with errors are analyzed in batches of
+    ``batch_size`` through ``chatbot.generate_batch``. With ``bts_url`` set,
+    a bug draft is posted for each of them. Returns a summary dict.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    extract_dir = tempfile.mkdtemp(prefix='triage_')
+    workers = workers or os.cpu_count() or 1
+    summary = {'files': 0, 'skipped': len(checkpoint.done), 'with_errors': 0, 'failed': 0,
+               'analyzed': 0, 'bugs_posted': 0}
+    started = time.perf_counter()
+    batch = []
+    post_index = 0
+
+    def flush(records):
+        nonlocal post_index
+        if chatbot is not None:
+            to_analyze = [r for r in records if r.pop('_findings', None) is not None and r['needs_analysis']]
+            if to_analyze:
+                llm_started = time.perf_counter()
+                responses = chatbot.generate_batch([r.pop('_prompt') for r in to_analyze])
+                per_file = (time.perf_counter() - llm_started) / len(to_analyze)
+                for record, response in zip(to_analyze, responses):
+                    record['analysis'] = response
+                    record['timing']['llm_seconds'] = round(per_file, 4)
+                summary['analyzed'] += len(to_analyze)
+        if bts_url:
+            drafts = []
+            for record in records:
+                if record.get('needs_analysis'):
+                    post_index += 1
+                    drafts.append(bug_draft(record, post_index))
+            if drafts:
+                post_bug_drafts(bts_url, drafts)
+                summary['bugs_posted'] += len(drafts)
+        for record in records:
+            record.pop('_prompt', None)
+            record.pop('_findings', None)
+            record['timing']['total_seconds'] = round(
+                record['timing']['scan_seconds'] + record['timing'].get('llm_seconds', 0.0), 4)
+            output.write(json.dumps(record) + '\n')
+        output.flush()
+        # Only mark files done once their records are safely written
+        checkpoint.add(r['key'] for r in records)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            items = iter_items(inputs, checkpoint.done, extract_dir)
+            for item, result, error in scan_all(pool, items, max_lines, window=workers * 4):
+                summary['files'] += 1
+                record = {'key': item.key, 'filename': item.filename}
+                if error is not None:
+                    summary['failed'] += 1
+                    record.update({'error': str(error), 'timing': {'scan_seconds': 0.0}})
+                    batch.append(record)
+                else:
+                    findings, size, seconds = result
+                    flagged = needs_analysis(findings)
+                    summary['with_errors'] += flagged
+                    record.update({
+                        'size': size,
+                        'findings': summarize_findings(findings),
+                        'first_error': findings['errors'][0]['content'] if findings['errors'] else None,
+                        'needs_analysis': flagged,
+                        'timing': {'scan_seconds': round(seconds, 4)},
+                        '_findings': findings,
+                        '_prompt': build_analysis_prompt(findings, item.filename),
+                    })
+                    batch.append(record)
+                if log:
+                    log(f"[{summary['files']}] {item.key}: {record.get('error') or record['findings']['summary']}")
+                if sum(1 for r in batch if r.get('needs_analysis')) >= batch_size or len(batch) >= 64:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+    finally:
+        checkpoint.close()
+        shutil.rmtree(extract_dir, ignore_errors=True)
+
+    summary['wall_seconds'] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze a directory, glob or archive of logs in bulk.')
+    parser.add_argument('inputs', nargs='+', help='Directories, files, glob patterns or .zip/.tar(.gz) archives')
+    parser.add_argument('--output', '-o', default='-', help='NDJSON output file (default: stdout)')
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: <output>.checkpoint)')
+    parser.add_argument('--workers', type=int, default=None, help='Scanner processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=4, help='Logs per batched model call')
+    parser.add_argument('--max-lines', type=int, default=200, help='Lines scanned per log')
+    parser.add_argument('--no-llm', action='store_true', help='Only scan; skip model analysis')
+    parser.add_argument('--stub-model', action='store_true', help='Use the fixed-latency stub model (dry runs)')
+    parser.add_argument('--model', default='microsoft/Phi-3-mini-4k-instruct', help='Model to load')
+    parser.add_argument('--post-bugs', action='store_true', help='Post bug drafts to the BTS bulk endpoint')
+    parser.add_argument('--bts-url', default=os.environ.get('BTS_API_URL', 'http://localhost:3001/api'))
+    args = parser.parse_args(argv)
+
+    checkpoint = args.checkpoint or (None if args.output == '-' else args.output + '.checkpoint')
+    chatbot = None
+    if args.stub_model:
+        from benchmarks.stub_model import StubChatbot
+        chatbot = StubChatbot()
+    elif not args.no_llm:
+        from engine import Phi3Chatbot
+        chatbot = Phi3Chatbot(model_name=args.model)
+
+    log = lambda message: print(message, file=sys.stderr)
+    if args.output == '-':
+        summary = run_triage(args.inputs, sys.stdout, checkpoint, chatbot, args.workers, args.batch_size,
+                             args.max_lines, args.bts_url if args.post_bugs else None, log=log)
+    else:
+        with open(args.output, 'a', encoding='utf-8') as output:
+            summary = run_triage(args.inputs, output, checkpoint, chatbot, args.workers, args.batch_size,
+                                 args.max_lines, args.bts_url if args.post_bugs else None, log=log)
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobStore:
+    """Content-addressed file store: each distinct content is kept once.
+
+    Blobs live at ``<root>/blobs/<first two hex digits>/<sha256>``. Content is
+    hashed while it is written, so storing a file costs a single pass.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path_for(digest))
+
+    def new_temp_path(self):
+        """A fresh path under the store's tmp dir (same filesystem as the blobs)"""
+        fd, path = tempfile.mkstemp(dir=self.tmp_dir, prefix='part_')
+        os.close(fd)
+        return path
+
+    def write_temp(self, stream, max_bytes=None):
+        """Copy a binary stream to a temp file, hashing it; returns (temp_path, digest, size)"""
+        temp_path = self.new_temp_path()
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError(f'File exceeds the {max_bytes} byte limit')
+                    hasher.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, hasher.hexdigest(), size
+
+    def adopt(self, temp_path, digest):
+        """Move an already-hashed temp file into place, or drop it if the blob exists"""
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            os.remove(temp_path)
+            return path, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return path, True
+
+    def delete(self, digest):
+        try:
+            os.remove(self.path_for(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class FileRecord:
+    """A user-visible upload: a name and owner pointing at a blob"""
+
+    def __init__(self, owner, filename, digest, filepath, size, source='upload', original_path=None,
+                 findings=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.owner = owner
+        self.filename = filename
+        self.digest = digest
+        self.filepath = filepath
+        self.size = size
+        self.source = source
+        self.original_path = original_path
+        self.findings = findings  # Scan results gathered while the file was uploaded, if any
+        self.timestamp = datetime.now().isoformat()
+        self.last_used = time.time()
+        self.pins = 0  # Running jobs that need the file; pinned files are never evicted
+
+    def to_dict(self):
+        """Client-facing description (no server paths)"""
+        data = {
+            'id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'sha256': self.digest,
+            'timestamp': self.timestamp,
+            'source': self.source,
+        }
+        if self.original_path:
+            data['original_path'] = self.original_path
+        return data
+
+
+class UploadRegistry:
+    """Server-side index of uploaded files, keyed by file ID.
+
+    Replaces the file list that used to live in the signed session cookie.
+    Lookups by ID are O(1), and records are scoped to the session that created
+    them. Uploading the same content under the same name again in a session
+    returns the existing record instead of storing another copy.
+    """
+
+    def __init__(self, blob_store):
+        self.blob_store = blob_store
+        self._records = {}
+        self._by_owner = {}
+        self._refcounts = {}
+        self._blob_sizes = {}
+        self._owner_bytes = {}
+        self._stored_bytes = 0
+        self._lock = threading.Lock()
+
+    def add_stream(self, owner, filename, stream, max_bytes=None, **extra):
+        """Store a stream's content and register it; returns (record, deduplicated)"""
+        temp_path, digest, size = self.blob_store.write_temp(stream, max_bytes=max_bytes)
+        return self.add_file(owner, filename, temp_path, digest, size, **extra)
+
+    def add_file(self, owner, filename, temp_path, digest, size, **extra):
+        """Move an already-hashed temp file into the store and register it;
+        returns (record, deduplicated).
+
+        Adopting the blob and counting the new reference happen under the
+        lock, so a concurrent ``remove()`` of the last reference to the same
+        content cannot delete the blob in between.
+        """
+        with self._lock:
+            path, is_new = self.blob_store.adopt(temp_path, digest)
+            for file_id in self._by_owner.get(owner, ()):
+                record = self._records[file_id]
+                if record.digest == digest and record.filename == filename:
+                    record.last_used = time.time()
+                    return record, not is_new
+            record = FileRecord(owner, filename, digest, path, size, **extra)
+            self._records[record.id] = record
+            self._by_owner.setdefault(owner, []).append(record.id)
+            self._owner_bytes[owner] = self._owner_bytes.get(owner, 0) + size
+            if digest not in self._refcounts:
+                self._blob_sizes[digest] = size
+                self._stored_bytes += size
+            self._refcounts[digest] = self._refcounts.get(digest, 0) + 1
+            return record, not is_new
+
+    def get(self, file_id, owner=None):
+        record = self._records.get(file_id)
+        if record is None or (owner is not None and record.owner != owner):
+            return None
+        record.last_used = time.time()
+        return record
+
+    def pin(self, file_id):
+        """Protect a file from eviction until the matching ``unpin``"""
+        with self._lock:
+            record = self._records.get(file_id)
+            if record is not None:
+                record.pins += 1
+            return record is not None
+
+    def unpin(self, file_id):
+        with self._lock:
+            record = self._records.get(file_id)
+            if record is not None and record.pins > 0:
+                record.pins -= 1
+                record.last_used = time.time()
+
+    def records(self):
+        """Snapshot of all records"""
+        with self._lock:
+            return list(self._records.values())
+
+    def usage_for(self, owner):
+        """Bytes uploaded by ``owner``, counting shared blobs in full"""
+        return self._owner_bytes.get(owner, 0)
+
+    @property
+    def stored_bytes(self):
+        """Bytes on disk after deduplication"""
+        return self._stored_bytes
+
+    def has_blob(self, digest):
+        return digest in self._refcounts
+
+    def list_for(self, owner):
+        with self._lock:
+            return [self._records[file_id] for file_id in self._by_owner.get(owner, ())]
+
+    def remove(self, file_id):
+        """Forget a record; deletes the blob when nothing else references it"""
+        with self._lock:
+            record = self._records.pop(file_id, None)
+            if record is None:
+                return False
+            owned = self._by_owner.get(record.owner, [])
+            if file_id in owned:
+                owned.remove(file_id)
+            if not owned:
+                self._by_owner.pop(record.owner, None)
+            owner_bytes = self._owner_bytes.get(record.owner, 0) - record.size
+            if owner_bytes > 0:
+                self._owner_bytes[record.owner] = owner_bytes
+            else:
+                self._owner_bytes.pop(record.owner, None)
+            remaining = self._refcounts.get(record.digest, 1) - 1
+            if remaining > 0:
+                self._refcounts[record.digest] = remaining
+                return True
+            self._refcounts.pop(record.digest, None)
+            self._stored_bytes -= self._blob_sizes.pop(record.digest, 0)
+            self.blob_store.delete(record.digest)
+        return True
+
+    def refcount(self, digest):
+        return self._refcounts.get(digest, 0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._records),
+                'blobs': len(self._refcounts),
+                'logical_bytes': sum(self._owner_bytes.values()),
+                'stored_bytes': self._stored_bytes,
+                'pinned': sum(1 for r in self._records.values() if r.pins),
+            }
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+
+import metrics
+
+
+class QuotaExceeded(Exception):
+    """Raised when an upload cannot fit in its session's or the global quota"""
+
+
+class RetentionManager:
+    """Keeps the upload store within byte quotas and age limits.
+
+    Files are evicted least recently used first. Pinned files (needed by a
+    running job) are never evicted, and files owned by sessions that
+    ``active_owners()`` reports as live are only evicted after every other
+    candidate is gone. A background sweeper thread also expires idle files,
+    stale chunked uploads, and blobs or temp files left on disk by a previous
+    run.
+    """
+
+    def __init__(self, registry, chunked_uploads=None, max_total_bytes=50 * 1024 ** 3,
+                 max_session_bytes=20 * 1024 ** 3, max_age=24 * 3600, sweep_interval=60.0,
+                 orphan_grace=3600, active_owners=None):
+        self.registry = registry
+        self.chunked_uploads = chunked_uploads
+        self.max_total_bytes = max_total_bytes
+        self.max_session_bytes = max_session_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self.orphan_grace = orphan_grace
+        self.active_owners = active_owners or set
+        self.last_sweep = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Quotas
+
+    def reserve(self, owner, size):
+        """Make room for ``size`` incoming bytes, evicting ``owner``'s and then
+        other idle files as needed; raises QuotaExceeded if they cannot fit"""
+        if size > self.max_session_bytes:
+            raise QuotaExceeded(f'File exceeds the per-session quota of {self.max_session_bytes} bytes')
+        if size > self.max_total_bytes:
+            raise QuotaExceeded(f'File exceeds the upload store quota of {self.max_total_bytes} bytes')
+        with self._lock:
+            self._evict_session(owner, self.max_session_bytes - size)
+            self._evict_global(self.max_total_bytes - size)
+            if self._session_usage(owner) + size > self.max_session_bytes:
+                raise QuotaExceeded('Session upload quota is full; files in use by running jobs cannot be removed')
+            if self._total_usage() + size > self.max_total_bytes:
+                raise QuotaExceeded('Upload storage is full; try again when running analyses finish')
+
+    def enforce(self, owner=None, keep=None):
+        """Evict down to the quotas after a write of unknown size.
+
+        ``keep`` (a file ID) is evicted last, so a fresh upload pushes out
+        older files rather than itself. Returns False if the quotas still
+        cannot be met without evicting ``keep``.
+        """
+        with self._lock:
+            if owner is not None:
+                self._evict_session(owner, self.max_session_bytes, keep=keep)
+            self._evict_global(self.max_total_bytes, keep=keep)
+            within = self._total_usage() <= self.max_total_bytes
+            if owner is not None:
+                within = within and self._session_usage(owner) <= self.max_session_bytes
+            return within
+
+    # Sweeping
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sweep_loop, name='upload-sweeper', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def sweep(self):
+        """One retention pass; returns the number of files and blobs removed"""
+        started = time.perf_counter()
+        removed = 0
+        if self.chunked_uploads is not None:
+            removed += self.chunked_uploads.prune()
+        with self._lock:
+            cutoff = time.time() - self.max_age
+            active = self.active_owners()
+            for record in self.registry.records():
+                if record.last_used < cutoff and not record.pins and record.owner not in active:
+                    removed += self._evict(record, 'age')
+            removed += self._evict_global(self.max_total_bytes)
+        removed += self._remove_orphans()
+        self.last_sweep = time.time()
+        metrics.UPLOAD_SWEEP_SECONDS.observe(time.perf_counter() - started)
+        return removed
+
+    def stats(self):
+        return {
+            'stored_bytes': self.registry.stored_bytes,
+            'reserved_bytes': self._reserved(),
+            'max_total_bytes': self.max_total_bytes,
+            'max_session_bytes': self.max_session_bytes,
+            'max_age': self.max_age,
+            'last_sweep': self.last_sweep,
+        }
+
+    # Internals (callers hold self._lock unless noted)
+
+    def _reserved(self, owner=None):
+        return self.chunked_uploads.reserved_bytes(owner) if self.chunked_uploads is not None else 0
+
+    def _total_usage(self):
+        return self.registry.stored_bytes + self._reserved()
+
+    def _session_usage(self, owner):
+        return self.registry.usage_for(owner) + self._reserved(owner)
+
+    def _candidates(self, records, keep=None):
+        """Evictable records in eviction order: idle sessions first, then LRU"""
+        active = self.active_owners()
+        evictable = [r for r in records if not r.pins and r.id != keep]
+        evictable.sort(key=lambda r: (r.owner in active, r.last_used))
+        if keep is not None:
+            evictable.extend(r for r in records if r.id == keep and not r.pins)
+        return evictable
+
+    def _evict_session(self, owner, limit, keep=None):
+        removed = 0
+        if self._session_usage(owner) <= limit:
+            return removed
+        for record in self._candidates(self.registry.list_for(owner), keep=keep):
+            if record.id == keep:
+                break
+            removed += self._evict(record, 'session_quota')
+            if self._session_usage(owner) <= limit:
+                break
+        return removed
+
+    def _evict_global(self, limit, keep=None):
+        removed = 0
+        if self._total_usage() <= limit:
+            return removed
+        for record in self._candidates(self.registry.records(), keep=keep):
+            if record.id == keep:
+                break
+            removed += self._evict(record, 'global_quota')
+            if self._total_usage() <= limit:
+                break
+        return removed
+
+    def _evict(self, record, reason):
+        if not self.registry.remove(record.id):
+            return 0
+        metrics.UPLOAD_EVICTIONS.labels(reason).inc()
+        return 1
+
+    def _remove_orphans(self):
+        """Delete blobs no record points at and abandoned temp files (no lock held)"""
+        store = self.registry.blob_store
+        cutoff = time.time() - self.orphan_grace
+        removed = 0
+        for prefix in _listdir(store.blob_dir):
+            for digest in _listdir(os.path.join(store.blob_dir, prefix)):
+                path = store.path_for(digest)
+                if not self.registry.has_blob(digest) and _older_than(path, cutoff):
+                    removed += _remove(path, 'orphan_blob')
+        in_progress = self.chunked_uploads.temp_paths() if self.chunked_uploads is not None else set()
+        for name in _listdir(store.tmp_dir):
+            path = os.path.join(store.tmp_dir, name)
+            if path not in in_progress and _older_than(path, cutoff):
+                removed += _remove(path, 'orphan_temp')
+        return removed
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping uploads: {str(e)}")
+
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except FileNotFoundError:
+        return []
+
+
+def _older_than(path, cutoff):
+    try:
+        return os.path.getmtime(path) < cutoff
+    except OSError:
+        return False
+
+
+def _remove(path, reason):
+    try:
+        os.remove(path)
+    except OSError:
+        return 0
+    metrics.UPLOAD_EVICTIONS.labels(reason).inc()
+    return 1